@@ -1,26 +1,35 @@
-from flask import Flask
+from flask import Flask, jsonify, request, g, Response
 from flask_cors import CORS
 import os
 import datetime
+import time
 from werkzeug.security import generate_password_hash
-from database_connection import db, college_users_collection, super_admins_collection
+from database_connection import db, college_users_collection, super_admins_collection, ensure_indexes
 from blueprints.auth import auth_bp
 from blueprints.admin import admin_bp
 from blueprints.user import user_bp
-from blueprints.file_manager import file_bp
+from blueprints.file_manager import file_bp, MAX_UPLOAD_BYTES
 from blueprints.change_password import change_password_bp
 from blueprints.chatbot import chatbot_bp
+from blueprints.middlewares import metrics_token_required
+from notebook.ingest import start_website_refresher
+from notebook.job_queue import start_workers, enqueue_question_backfill
+from notebook.executors import start_executors, stage_timings
+from notebook import metrics, warmup
 from flask import Flask, send_from_directory  # Add send_from_directory here
 
 # Initialize Flask app
 app = Flask(__name__, static_folder='../chatbot', static_url_path='')
  
 # CORS setup
-CORS(app, resources={r"/api/*": {"origins": "http://localhost:4200"}}, supports_credentials=True)
+CORS(app, resources={r"/api/*": {"origins": "http://localhost:4200"}}, supports_credentials=True, expose_headers=["Retry-After", "ETag"])
  
 # App configs
 app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY', 'devsecret')
 app.config['UPLOAD_FOLDER'] = 'uploads'
+# Werkzeug rejects larger bodies before parsing them; the margin covers the multipart framing and form fields,
+# and save_upload still enforces MAX_UPLOAD_BYTES on the file itself
+app.config['MAX_CONTENT_LENGTH'] = MAX_UPLOAD_BYTES + 1024 * 1024
 os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
  
 # MongoDB collections
@@ -36,10 +45,23 @@ app.register_blueprint(file_bp, url_prefix='/api')
 app.register_blueprint(change_password_bp, url_prefix='/api')
 app.register_blueprint(chatbot_bp)
  
+@app.errorhandler(413)
+def request_too_large(e):
+    return jsonify({'error': f'Request exceeds the {MAX_UPLOAD_BYTES // (1024 * 1024)} MB upload limit'}), 413
+
+@app.before_request
+def start_timer():
+    g.request_started = time.perf_counter()
+
 @app.after_request
 def after_request(response):
     response.headers.add('Access-Control-Allow-Headers', 'Content-Type,Authorization')
     response.headers.add('Access-Control-Allow-Methods', 'GET,POST,PUT,DELETE,OPTIONS')
+    # Streamed responses are measured up to the first byte
+    started = g.get('request_started')
+    if started is not None:
+        metrics.observe('http_request_seconds', time.perf_counter() - started,
+                        endpoint=request.endpoint or 'unknown', status=str(response.status_code))
     return response
  
 # Initialize default super admin if not exists
@@ -68,7 +90,50 @@ def chatbot_index():
 def chatbot_script():
     return send_from_directory(app.static_folder, 'chatbot.js')
 
-# Run the app
-if __name__ == '__main__':
+# Per-stage timings (extraction, parsing, uploads, loading, retrieval, generation) since startup.
+# Operational data: the METRICS_TOKEN bearer or a super admin's JWT, like /metrics
+@app.route('/stage-timings')
+@metrics_token_required
+def stage_timings_view():
+    return jsonify(stage_timings())
+
+# Prometheus scrape target: stage latency histograms and cache hit/miss counters, tagged by tenant id
+@app.route('/metrics')
+@metrics_token_required
+def metrics_view():
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+# Liveness: the process is up and serving requests
+@app.route('/healthz')
+def healthz():
+    return jsonify({'status': 'ok'})
+
+# Readiness: 503 until the warm state (tenant indexes, RAG engine) is loaded in this worker
+@app.route('/readyz')
+def readyz():
+    state = warmup.readiness()
+    return jsonify(state), 200 if state['ready'] else 503
+
+# One-time startup work; gunicorn.conf.py runs it in the master before forking workers
+def init_once():
+    ensure_indexes()
     init_super_admin()
+    warmup.preload()
+    enqueue_question_backfill()
+
+# Per-process background work; gunicorn.conf.py runs it in every worker after the fork
+def init_worker(website_refresher=True):
+    start_executors()
+    start_workers()
+    if website_refresher:
+        start_website_refresher()
+    warmup.warm_engine()
+
+# Development server; production runs `gunicorn app:app` (see gunicorn.conf.py).
+# The debug reloader re-runs this module in a child process that does the serving; only that one starts
+# the workers and refresher, instead of both processes running them.
+if __name__ == '__main__':
+    if os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        init_once()
+        init_worker()
     app.run(debug=True)
\ No newline at end of file
@@ -0,0 +1,116 @@
+# Asyncio-native serving path for /api/chatbot/*; admin APIs stay on the Flask app in app.py.
+# Run with an ASGI server, e.g. `hypercorn asgi_chatbot:app --bind 0.0.0.0:5001`.
+# Each conversation awaits Mongo (motor) and Gemini instead of holding a worker thread.
+import os
+import asyncio
+import traceback
+from quart import Quart, Blueprint, request, jsonify, g, Response, current_app, stream_with_context
+from quart_cors import cors
+from blueprints.chatbot import (
+    GREETING_REPLY, NO_DATA_REPLY, EMPTY_MESSAGE_REPLY, ERROR_REPLY, RATE_LIMITED_REPLY, build_reply, sse
+)
+from notebook.college_ragv1 import agenerate_response_from_rag, astream_response_from_rag
+from notebook.lru_cache import LRUCache
+from blueprints import rate_limit
+from blueprints.principal_cache import aget_user_by_access_key
+from notebook import metrics
+from notebook.executors import timed
+
+# In-flight questions per tenant; further questions wait for a slot
+MAX_CONCURRENT_PER_TENANT = int(os.getenv("MAX_CONCURRENT_PER_TENANT", "8"))
+_tenant_slots = LRUCache(int(os.getenv("MAX_WARM_TENANTS", "64")) * 4)
+# In-flight questions across all tenants in this process (see rate_limit.CHAT_MAX_CONCURRENT)
+_global_slots = asyncio.Semaphore(rate_limit.CHAT_MAX_CONCURRENT)
+
+async_chatbot_bp = Blueprint('async_chatbot', __name__, url_prefix='/api/chatbot')
+
+
+def too_many_requests(reason, wait):
+    metrics.inc("rate_limited_total", reason=reason)
+    return jsonify(RATE_LIMITED_REPLY), 429, {"Retry-After": str(rate_limit.retry_after(wait))}
+
+
+def tenant_slots(tenant):
+    return _tenant_slots.get_or_create(tenant, lambda: asyncio.Semaphore(MAX_CONCURRENT_PER_TENANT))
+
+
+# Middleware to check init_key; the key's owner is the tenant whose documents answer the chat
+@async_chatbot_bp.before_request
+async def check_init_key():
+    init_key = request.headers.get("Authorization")
+    with timed("auth"):
+        user = await aget_user_by_access_key(init_key)
+    if not user:
+        current_app.logger.warning(f"Unauthorized access attempt with key: {init_key}")
+        return jsonify({"error": "Unauthorized"}), 401
+    g.tenant = user["email"]
+    metrics.tenant_label.set(g.tenant)
+
+    if request.endpoint in ('async_chatbot.message', 'async_chatbot.message_stream'):
+        wait = rate_limit.buckets.take(init_key)
+        if wait:
+            return too_many_requests("rate", wait)
+        # Waiting for a tenant slot is fine, but a full process sheds load
+        if _global_slots.locked():
+            return too_many_requests("concurrency", rate_limit.CHAT_BUSY_RETRY_AFTER)
+
+
+@async_chatbot_bp.route('/greeting', methods=['GET'])
+async def greeting():
+    return jsonify(GREETING_REPLY)
+
+
+@async_chatbot_bp.route('/message', methods=['POST'])
+async def message():
+    try:
+        data = await request.get_json()
+        if not data:
+            return jsonify(NO_DATA_REPLY), 400
+
+        user_message = data.get("message", "").strip()
+        if not user_message:
+            return jsonify(EMPTY_MESSAGE_REPLY), 400
+
+        async with _global_slots, tenant_slots(g.tenant):
+            response, source = await agenerate_response_from_rag(user_message, g.tenant, data.get("session_id"))
+        with timed("serialize"):
+            return jsonify(build_reply(response, source))
+
+    except Exception:
+        current_app.logger.error("❌ Exception occurred in async /message endpoint:")
+        traceback.print_exc()
+        return jsonify(ERROR_REPLY), 500
+
+
+@async_chatbot_bp.route('/message/stream', methods=['POST'])
+async def message_stream():
+    data = await request.get_json(silent=True)
+    user_message = (data or {}).get("message", "").strip()
+    if not user_message:
+        return jsonify(EMPTY_MESSAGE_REPLY), 400
+
+    tenant, session_id = g.tenant, data.get("session_id")
+
+    @stream_with_context
+    async def events():
+        try:
+            async with _global_slots, tenant_slots(tenant):
+                async for event, payload in astream_response_from_rag(user_message, tenant, session_id):
+                    if event == "token":
+                        yield sse("token", {"html": payload})
+                    else:
+                        yield sse("done", {"source": payload})
+        except Exception:
+            current_app.logger.error("❌ Exception occurred in async /message/stream endpoint:")
+            traceback.print_exc()
+            yield sse("error", ERROR_REPLY)
+
+    return Response(events(), mimetype="text/event-stream", headers={
+        "Cache-Control": "no-cache",
+        "X-Accel-Buffering": "no"
+    })
+
+
+app = Quart(__name__)
+app = cors(app, allow_origin="http://localhost:4200", allow_credentials=True, expose_headers=["Retry-After"])
+app.register_blueprint(async_chatbot_bp)
@@ -0,0 +1,223 @@
+# Offline throughput/latency benchmark of the /api/chatbot/message pipeline with fake Gemini and in-memory Mongo.
+# Usage (from backend/):
+#   python -m benchmarks.chatbot_pipeline [--corpus 4x2 16x8 64x32] [--concurrency 1 4 16] [--requests 200] [--json out.json]
+#   python -m benchmarks.chatbot_pipeline --compare before.json after.json
+# Corpus sizes are PDFSxPAGES. Each size runs in a fresh subprocess so peak RSS covers only that corpus;
+# concurrency levels run in increasing order within it, so their max_rss_kb is cumulative.
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import resource
+import tempfile
+import threading
+import subprocess
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+TENANT = "bench@college.edu"
+ACCESS_KEY = "bench-access-key"
+ENDPOINTS = {"message": "/api/chatbot/message", "stream": "/api/chatbot/message/stream"}
+
+
+def percentile(sorted_values: list, p: float) -> float:
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(round(p * (len(sorted_values) - 1))))]
+
+
+def seed_tenant(corpus: dict, base_url: str) -> None:
+    """Inserts the tenant and its corpus, then ingests everything synchronously (no job queue)."""
+    from database_connection import college_users_collection, KM_documents_collection, KM_URLs_collection
+    from notebook.ingest import ingest_pdf, ingest_url
+    from notebook.text_cache import file_sha256
+
+    college_users_collection.insert_one({"email": TENANT, "access_key": ACCESS_KEY, "role": "collegeUser"})
+    for pdf in corpus["pdfs"]:
+        doc_id = KM_documents_collection.insert_one({
+            **pdf, "email": TENANT, "sha256": file_sha256(pdf["path"]), "status": "pending"
+        }).inserted_id
+        ingest_pdf(doc_id)
+        KM_documents_collection.update_one({"_id": doc_id}, {"$set": {"status": "indexed", "progress": 100}})
+    for page in corpus["pages"]:
+        doc_id = KM_URLs_collection.insert_one({
+            "url": f"{base_url}/{page['name']}", "description": page["description"], "email": TENANT, "status": "pending"
+        }).inserted_id
+        ingest_url(doc_id)
+        KM_URLs_collection.update_one({"_id": doc_id}, {"$set": {"status": "indexed", "progress": 100}})
+
+
+def succeeded(endpoint: str, response) -> bool:
+    """A 200 can still carry a failure: the pipeline answers generation errors with source "Error"."""
+    from blueprints.chatbot import ERROR_REPLY
+    if response.status_code != 200:
+        return False
+    body = response.get_data(as_text=True)
+    if endpoint == "stream":
+        frames = [frame.split("\n", 1) for frame in body.split("\n\n") if frame.startswith("event: ")]
+        events = {event[len("event: "):]: data[len("data: "):] for event, data in frames}
+        return "error" not in events and "done" in events and json.loads(events["done"]).get("source") != "Error"
+    reply = response.get_json(silent=True) or {}
+    return reply.get("source") != "Error" and reply.get("reply") != ERROR_REPLY["reply"]
+
+
+def run_level(app, endpoint: str, questions: list, concurrency: int) -> dict:
+    local = threading.local()
+
+    def ask(question):
+        client = getattr(local, "client", None) or app.test_client()
+        local.client = client
+        started = time.perf_counter()
+        response = client.post(ENDPOINTS[endpoint], json={"message": question}, headers={"Authorization": ACCESS_KEY})
+        response.get_data()  # drain streamed bodies
+        return time.perf_counter() - started, succeeded(endpoint, response)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(ask, questions))
+    wall = time.perf_counter() - started
+
+    latencies = sorted(seconds for seconds, _ in results)
+    return {
+        "concurrency": concurrency,
+        "requests": len(results),
+        "errors": sum(1 for _, ok in results if not ok),
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 2),
+        "p95_ms": round(percentile(latencies, 0.95) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 2),
+        "rps": round(len(results) / wall, 2),
+        "max_rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+    }
+
+
+def child(pdfs: int, pages: int, levels: list, requests: int, endpoint: str, mongo_uri: str) -> None:
+    sys.path.insert(0, str(BACKEND_DIR))
+    from benchmarks import fakes, corpus as synthetic
+
+    workdir = Path(tempfile.mkdtemp(prefix="chatbot-bench-"))
+    os.chdir(workdir)  # uploads/ and cache/ defaults are relative to the working directory
+    fakes.install(mongo_uri)
+
+    data = synthetic.make_corpus(workdir / "corpus", pdfs, pages)
+    server, base_url = synthetic.serve_site(workdir / "corpus" / "site")
+    started = time.perf_counter()
+    seed_tenant(data, base_url)
+    ingest_s = time.perf_counter() - started
+
+    from app import app
+    questions = synthetic.questions(requests)
+    run_level(app, endpoint, questions[:min(10, requests)], 1)  # warm imports, pools and the tenant context
+
+    for concurrency in levels:
+        row = {"pdfs": pdfs, "pages": pages, "ingest_s": round(ingest_s, 3), **run_level(app, endpoint, questions, concurrency)}
+        print(json.dumps(row), flush=True)
+    server.shutdown()
+
+
+def measure(pdfs: int, pages: int, args) -> list:
+    env = {
+        **os.environ,
+        "EMBEDDER": "hashing",
+        "PYTHONPATH": str(BACKEND_DIR),
+        # Unique answers by default, so every request exercises retrieval and generation
+        "ANSWER_CACHE_SIZE": os.environ.get("ANSWER_CACHE_SIZE", "256" if args.answer_cache else "0"),
+        # All load comes from one access key, so admission control would answer most of it with 429s
+        "CHAT_RATE_PER_MINUTE": "1000000000",
+        "CHAT_BURST": "1000000000",
+        "CHAT_MAX_CONCURRENT": "1000000",
+    }
+    command = [
+        sys.executable, "-m", "benchmarks.chatbot_pipeline", "--child", str(pdfs), str(pages),
+        "--concurrency", *map(str, args.concurrency), "--requests", str(args.requests), "--endpoint", args.endpoint,
+    ]
+    if args.mongo_uri:
+        command += ["--mongo-uri", args.mongo_uri]
+    out = subprocess.run(command, cwd=BACKEND_DIR, env=env, capture_output=True, text=True)
+    if out.returncode != 0:
+        sys.stderr.write(out.stderr)
+        raise SystemExit(f"benchmark child failed for corpus {pdfs}x{pages}")
+    return [json.loads(line) for line in out.stdout.splitlines() if line.startswith("{")]
+
+
+def git_revision() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def compare(base_path: str, new_path: str) -> None:
+    """Prints per-row deltas between two result files produced by this script."""
+    def rows(path):
+        return {(r["pdfs"], r["pages"], r["concurrency"]): r for r in json.loads(Path(path).read_text())["results"]}
+
+    base, new = rows(base_path), rows(new_path)
+    print(f"{'corpus':>10} {'conc':>5} {'p50 ms':>18} {'p95 ms':>18} {'rps':>18}")
+    for key in sorted(base.keys() & new.keys()):
+        cells = []
+        for metric in ("p50_ms", "p95_ms", "rps"):
+            old, cur = base[key][metric], new[key][metric]
+            change = (cur - old) / old * 100 if old else 0.0
+            cells.append(f"{cur:>9.1f} ({change:+6.1f}%)")
+        print(f"{key[0]:>4}x{key[1]:<5} {key[2]:>5} " + " ".join(cells))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Offline benchmark of the chatbot message pipeline")
+    parser.add_argument("--corpus", nargs="+", default=["4x2", "16x8", "64x32"], help="PDFSxPAGES sizes")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--requests", type=int, default=200, help="requests per concurrency level")
+    parser.add_argument("--endpoint", choices=sorted(ENDPOINTS), default="message")
+    parser.add_argument("--answer-cache", action="store_true", help="keep the answer cache enabled")
+    parser.add_argument("--mongo-uri", help="use this Mongo (e.g. a local mongod) instead of mongomock")
+    parser.add_argument("--json", help="write results to this file")
+    parser.add_argument("--compare", nargs=2, metavar=("BASE", "NEW"), help="diff two result files and exit")
+    parser.add_argument("--child", nargs=2, type=int, metavar=("PDFS", "PAGES"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        return
+    if args.child:
+        child(*args.child, args.concurrency, args.requests, args.endpoint, args.mongo_uri)
+        return
+
+    from benchmarks import fakes
+    results = []
+    for size in args.corpus:
+        pdfs, pages = (int(n) for n in size.lower().split("x"))
+        for row in measure(pdfs, pages, args):
+            results.append(row)
+            print(f"{pdfs:>4} pdfs {pages:>4} pages  c={row['concurrency']:<3} p50 {row['p50_ms']:8.1f} ms  "
+                  f"p95 {row['p95_ms']:8.1f} ms  p99 {row['p99_ms']:8.1f} ms  {row['rps']:7.1f} rps  "
+                  f"rss {row['max_rss_kb'] / 1024:7.1f} MB  errors {row['errors']}")
+
+    if args.json:
+        report = {
+            "meta": {
+                "revision": git_revision(),
+                "python": platform.python_version(),
+                "endpoint": args.endpoint,
+                "requests_per_level": args.requests,
+                "answer_cache": args.answer_cache,
+                "mongo": "external" if args.mongo_uri else "mongomock",
+                "fake_llm_latency_ms": fakes.FAKE_LLM_LATENCY_MS,
+                "fake_llm_chunk_ms": fakes.FAKE_LLM_CHUNK_MS,
+                "fake_upload_latency_ms": fakes.FAKE_UPLOAD_LATENCY_MS,
+            },
+            "results": results,
+        }
+        Path(args.json).write_text(json.dumps(report, indent=2, sort_keys=True))
+
+    # Latencies of failed requests (e.g. rejected ones) say nothing about the pipeline
+    failed = [r for r in results if r["errors"]]
+    if failed:
+        raise SystemExit(f"{sum(r['errors'] for r in failed)} request(s) failed across {len(failed)} run(s); results are not comparable")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+# Synthetic college corpus: question-paper PDFs, institutional web pages served locally, and questions about both.
+import random
+import threading
+from functools import partial
+from pathlib import Path
+from http.server import ThreadingHTTPServer, SimpleHTTPRequestHandler
+
+SUBJECTS = [
+    "Artificial Intelligence", "Object Oriented Programming", "Data Structures", "Operating Systems",
+    "Computer Networks", "Database Management Systems", "Machine Learning", "Compiler Design",
+]
+TOPICS = [
+    "agents", "search algorithms", "inheritance", "polymorphism", "linked lists", "binary trees", "scheduling",
+    "deadlocks", "routing", "normalization", "transactions", "regression", "parsing", "code generation",
+]
+WEBSITE_SECTIONS = {
+    "admissions": "The admission process requires an entrance exam rank and counselling; eligibility is 45% in PUC.",
+    "fees": "The annual tuition fee is {amount} rupees, with hostel fees of {hostel} rupees per semester.",
+    "placements": "The highest salary package in the last placement drive was {lpa} LPA, offered by {recruiter}.",
+    "campus": "The campus has a central library, hostels, sports facilities and transport from the city.",
+}
+RECRUITERS = ["Infosys", "Bosch", "Amazon", "Accenture", "Deloitte"]
+
+
+def make_question_paper(path: Path, subject: str, rng: random.Random, pages: int = 4, per_page: int = 12) -> None:
+    import fitz
+    doc = fitz.open()
+    n = 1
+    for _ in range(pages):
+        lines = [f"{subject} - Semester Examination"]
+        for _ in range(per_page):
+            marks = rng.choice([2, 5, 10, 12])
+            lines.append(f"Q{n}. Explain {rng.choice(TOPICS)} in {subject} with an example. ({marks} marks)")
+            n += 1
+        doc.new_page().insert_text((36, 36), "\n".join(lines), fontsize=8)
+    doc.save(path)
+    doc.close()
+
+
+def make_page(path: Path, college: str, rng: random.Random) -> None:
+    paragraphs = [
+        text.format(amount=rng.randrange(80, 200) * 1000, hostel=rng.randrange(30, 90) * 1000,
+                    lpa=rng.randrange(8, 45), recruiter=rng.choice(RECRUITERS))
+        for text in WEBSITE_SECTIONS.values()
+    ]
+    body = "".join(f"<p>{college}: {p}</p>" for p in paragraphs)
+    path.write_text(f"<html><head><title>{college}</title></head><body>{body}</body></html>", encoding="utf-8")
+
+
+def make_corpus(root: Path, pdfs: int, pages: int, seed: int = 7) -> dict:
+    """Writes `pdfs` question papers and `pages` website pages under root; returns their paths/names."""
+    rng = random.Random(seed)
+    (root / "pdfs").mkdir(parents=True, exist_ok=True)
+    (root / "site").mkdir(parents=True, exist_ok=True)
+    corpus = {"pdfs": [], "pages": []}
+    for i in range(pdfs):
+        subject = SUBJECTS[i % len(SUBJECTS)]
+        path = root / "pdfs" / f"paper-{i}.pdf"
+        make_question_paper(path, subject, rng)
+        corpus["pdfs"].append({"path": str(path), "filename": path.name, "description": f"{subject} question paper"})
+    for i in range(pages):
+        name = f"college-{i}.html"
+        make_page(root / "site" / name, f"College {i}", rng)
+        corpus["pages"].append({"name": name, "description": f"College {i} website"})
+    return corpus
+
+
+def questions(count: int, seed: int = 11) -> list:
+    """A mix of academic (PDF-routed) and institutional (website-routed) questions."""
+    rng = random.Random(seed)
+    templates = [
+        lambda: f"Give me important questions on {rng.choice(TOPICS)} from {rng.choice(SUBJECTS)}",
+        lambda: f"Provide 10-mark questions from the {rng.choice(SUBJECTS)} exam paper",
+        lambda: "What is the fee structure of the college?",
+        lambda: "What is the highest salary package in placements?",
+        lambda: f"Tell me about admission eligibility and {rng.choice(['hostel', 'transport', 'library'])} facilities",
+    ]
+    return [rng.choice(templates)() for _ in range(count)]
+
+
+class _QuietHandler(SimpleHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+def serve_site(directory: Path):
+    """Serves `directory` on a free localhost port in a daemon thread; returns (server, base_url)."""
+    server = ThreadingHTTPServer(("127.0.0.1", 0), partial(_QuietHandler, directory=str(directory)))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
@@ -0,0 +1,86 @@
+# Peak-RSS comparison of whole-document vs streaming PDF extraction as page count grows.
+# Usage (from backend/): python -m benchmarks.extraction_rss [--pages 50 200 500 1000] [--json out.json]
+# Each measurement runs in a fresh subprocess so ru_maxrss reflects only that extraction.
+import os
+import sys
+import json
+import argparse
+import resource
+import subprocess
+import tempfile
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+LINE = "Question {n}. Explain the working of the algorithm with a neat diagram and an example. (10 marks)"
+
+
+def make_pdf(path: Path, pages: int, lines_per_page: int = 45) -> None:
+    import fitz
+    doc = fitz.open()
+    for p in range(pages):
+        page = doc.new_page()
+        text = "\n".join(LINE.format(n=p * lines_per_page + i) for i in range(lines_per_page))
+        page.insert_text((36, 36), text, fontsize=7)
+    doc.save(path)
+    doc.close()
+
+
+def child(mode: str, pdf_path: str) -> None:
+    sys.path.insert(0, str(BACKEND_DIR))
+    if mode == "joined":
+        # The pre-streaming behaviour: every page's text, joined, then encoded into a buffer
+        from io import BytesIO
+        import fitz
+        doc = fitz.open(pdf_path)
+        full_text = "\n".join([page.get_text() for page in doc])
+        doc.close()
+        buffer = BytesIO(full_text.encode("utf-8"))
+        chunks = len(full_text.split())
+        del buffer
+    else:
+        from notebook import text_cache
+        from notebook.vector_index import iter_chunks
+        entry = text_cache.ensure_pdf_text_cached(pdf_path)
+        chunks = sum(1 for _ in iter_chunks(text_cache.iter_cached_text(entry)))
+    print(json.dumps({"max_rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss, "units": chunks}))
+
+
+def measure(mode: str, pdf_path: Path, cache_dir: str) -> int:
+    env = {**os.environ, "TEXT_CACHE_DIR": cache_dir}
+    out = subprocess.run(
+        [sys.executable, "-m", "benchmarks.extraction_rss", "--child", mode, str(pdf_path)],
+        cwd=BACKEND_DIR, env=env, capture_output=True, text=True, check=True,
+    )
+    return json.loads(out.stdout.strip().splitlines()[-1])["max_rss_kb"]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--pages", type=int, nargs="+", default=[50, 200, 500, 1000])
+    parser.add_argument("--json", help="write results to this file")
+    parser.add_argument("--child", nargs=2, metavar=("MODE", "PDF"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child(*args.child)
+        return
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for pages in args.pages:
+            pdf_path = Path(tmp) / f"synthetic-{pages}.pdf"
+            make_pdf(pdf_path, pages)
+            row = {"pages": pages, "pdf_bytes": pdf_path.stat().st_size}
+            for mode in ("joined", "streaming"):
+                # Fresh cache dir so streaming always extracts instead of hitting a previous entry
+                row[f"{mode}_max_rss_kb"] = measure(mode, pdf_path, tempfile.mkdtemp(dir=tmp))
+            results.append(row)
+            print(f"{pages:>6} pages  joined {row['joined_max_rss_kb'] / 1024:8.1f} MB  "
+                  f"streaming {row['streaming_max_rss_kb'] / 1024:8.1f} MB")
+
+    if args.json:
+        Path(args.json).write_text(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
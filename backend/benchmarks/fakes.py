@@ -0,0 +1,182 @@
+# Deterministic stand-ins for Atlas, Gemini and the LangChain chat model, for offline benchmarks.
+# install() must run before any backend module is imported, since those bind MongoClient/genai at import time.
+import os
+import sys
+import time
+import types
+import hashlib
+import datetime
+import itertools
+
+# Simulated model latency: a fixed cost per call plus a cost per streamed chunk
+FAKE_LLM_LATENCY_MS = float(os.getenv("FAKE_LLM_LATENCY_MS", "50"))
+FAKE_LLM_CHUNK_MS = float(os.getenv("FAKE_LLM_CHUNK_MS", "5"))
+FAKE_UPLOAD_LATENCY_MS = float(os.getenv("FAKE_UPLOAD_LATENCY_MS", "20"))
+FAKE_ANSWER_CHUNKS = 8
+
+
+def _prompt_digest(parts) -> str:
+    if not isinstance(parts, (list, tuple)):
+        parts = [parts]
+    digest = hashlib.sha1()
+    for part in parts:
+        digest.update(repr(part).encode("utf-8"))
+    return digest.hexdigest()[:12]
+
+
+class FakeResponse:
+    def __init__(self, text: str):
+        self.text = text
+
+
+class FakeGenerativeModel:
+    """Answers with an HTML paragraph derived from the prompt, after a fixed simulated latency."""
+
+    def __init__(self, model_name: str = "fake", system_instruction: str = None, **kwargs):
+        self.model_name = model_name
+        self.cached_content = None
+
+    @classmethod
+    def from_cached_content(cls, cached_content, **kwargs):
+        model = cls(cached_content.model)
+        model.cached_content = cached_content
+        return model
+
+    def _chunks(self, parts):
+        digest = _prompt_digest(parts)
+        return [f"<p>Answer {digest} part {i}.</p>" for i in range(FAKE_ANSWER_CHUNKS)]
+
+    def generate_content(self, parts, stream: bool = False, **kwargs):
+        time.sleep(FAKE_LLM_LATENCY_MS / 1000)
+        chunks = self._chunks(parts)
+        if not stream:
+            return FakeResponse("".join(chunks))
+
+        def iterate():
+            for chunk in chunks:
+                time.sleep(FAKE_LLM_CHUNK_MS / 1000)
+                yield FakeResponse(chunk)
+        return iterate()
+
+    async def generate_content_async(self, parts, stream: bool = False, **kwargs):
+        import asyncio
+        await asyncio.sleep(FAKE_LLM_LATENCY_MS / 1000)
+        chunks = self._chunks(parts)
+        if not stream:
+            return FakeResponse("".join(chunks))
+
+        async def iterate():
+            for chunk in chunks:
+                await asyncio.sleep(FAKE_LLM_CHUNK_MS / 1000)
+                yield FakeResponse(chunk)
+        return iterate()
+
+
+class FakeFile:
+    def __init__(self, name: str):
+        self.name = f"files/{name}"
+        self.uri = f"https://fake.invalid/{self.name}"
+        self.expiration_time = datetime.datetime.utcnow() + datetime.timedelta(hours=48)
+
+
+_uploads = itertools.count()
+
+
+def _upload_file(source, mime_type: str = "text/plain", **kwargs) -> FakeFile:
+    time.sleep(FAKE_UPLOAD_LATENCY_MS / 1000)
+    return FakeFile(f"bench-{next(_uploads)}")
+
+
+class FakeCachedContent:
+    """In-memory stand-in for genai.caching.CachedContent: create/get/update/delete with a TTL."""
+
+    _store = {}
+    _ids = itertools.count()
+
+    def __init__(self, model: str, ttl: datetime.timedelta, contents=None, **kwargs):
+        self.name = f"cachedContents/bench-{next(self._ids)}"
+        self.model = model
+        self.contents = contents
+        self.expire_time = datetime.datetime.utcnow() + ttl
+
+    @classmethod
+    def create(cls, model: str, ttl: datetime.timedelta, **kwargs):
+        time.sleep(FAKE_UPLOAD_LATENCY_MS / 1000)
+        cache = cls(model, ttl, **kwargs)
+        cls._store[cache.name] = cache
+        return cache
+
+    @classmethod
+    def get(cls, name: str):
+        cache = cls._store.get(name)
+        if cache is None or cache.expire_time < datetime.datetime.utcnow():
+            raise LookupError(f"{name} not found")
+        return cache
+
+    def update(self, ttl: datetime.timedelta, **kwargs):
+        self.expire_time = datetime.datetime.utcnow() + ttl
+
+    def delete(self):
+        self._store.pop(self.name, None)
+
+
+def _embed_content(**kwargs):
+    raise RuntimeError("Gemini embeddings are not faked; run benchmarks with EMBEDDER=hashing")
+
+
+def _fake_genai() -> types.ModuleType:
+    genai = types.ModuleType("google.generativeai")
+    genai.configure = lambda **kwargs: None
+    genai.GenerativeModel = FakeGenerativeModel
+    genai.upload_file = _upload_file
+    genai.embed_content = _embed_content
+    genai.caching = types.SimpleNamespace(CachedContent=FakeCachedContent)
+    return genai
+
+
+def _fake_chat_model_module() -> types.ModuleType:
+    from langchain_core.language_models.fake_chat_models import GenericFakeChatModel
+    from langchain_core.messages import AIMessage
+
+    class FakeChatGoogleGenerativeAI(GenericFakeChatModel):
+        """Agent LLM that answers directly, without tool calls; the router path is what benchmarks exercise."""
+
+        def __init__(self, **kwargs):
+            super().__init__(messages=itertools.cycle([AIMessage(content="<p>Agent answer.</p>")]))
+
+        def bind_tools(self, tools, **kwargs):
+            return self
+
+    module = types.ModuleType("langchain_google_genai")
+    module.ChatGoogleGenerativeAI = FakeChatGoogleGenerativeAI
+    return module
+
+
+def install(mongo_uri: str = None) -> None:
+    """
+    Routes pymongo to an in-memory mongomock server (or to `mongo_uri`, e.g. a local mongod) and replaces
+    google.generativeai and langchain_google_genai with the fakes above.
+    """
+    os.environ.setdefault("GOOGLE_API_KEY", "benchmark")
+    os.environ.setdefault("EMBEDDER", "hashing")
+
+    import pymongo
+    if mongo_uri:
+        os.environ["MONGO_URI"] = mongo_uri
+    else:
+        import mongomock
+        os.environ["MONGO_URI"] = "mongodb://localhost/chatbot_platform"
+        shared = mongomock.MongoClient(os.environ["MONGO_URI"])
+        # Every backend module must see the same in-memory data
+        pymongo.MongoClient = lambda *args, **kwargs: shared
+
+    genai = _fake_genai()
+    try:
+        import google  # namespace package shared with protobuf etc.; keep it if present
+    except ImportError:
+        google = types.ModuleType("google")
+        google.__path__ = []
+    google.generativeai = genai
+    sys.modules["google"] = google
+    sys.modules["google.generativeai"] = genai
+    sys.modules["langchain_google_genai"] = _fake_chat_model_module()
@@ -0,0 +1,79 @@
+# Import-time budget for the serving entry points: fails when importing them gets slower than the budget,
+# or when they pull in modules that are meant to load lazily (LLM stack, PDF/HTML parsers).
+# Usage (from backend/): python -m benchmarks.import_time [--modules app asgi_chatbot] [--budget-ms 1500] [--json out.json]
+import os
+import sys
+import json
+import argparse
+import subprocess
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+IMPORT_BUDGET_MS = float(os.getenv("IMPORT_BUDGET_MS", "1500"))
+
+# Loaded on first use (RagEngine, text_cache, web_crawler parse workers), never at import
+LAZY_MODULES = ["langchain", "langchain_core", "langchain_google_genai", "google.generativeai", "fitz", "bs4"]
+
+PROBE = "import sys, json, importlib; importlib.import_module({module!r}); print(json.dumps(sorted(m for m in {lazy!r} if m in sys.modules)))"
+
+
+def _top_level_imports(module: str):
+    out = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", PROBE.format(module=module, lazy=LAZY_MODULES)],
+        cwd=BACKEND_DIR, capture_output=True, text=True,
+    )
+    if out.returncode != 0:
+        sys.stderr.write(out.stderr[-4000:])
+        raise SystemExit(f"importing {module} failed")
+
+    top_level = {}
+    for line in out.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        # importtime indents nested imports by two spaces per level
+        if not name.startswith("  "):
+            top_level[name.strip()] = int(cumulative) / 1000
+    return top_level, json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def profile(module: str, baseline: dict) -> dict:
+    """Imports `module` in a fresh interpreter with -X importtime; interpreter startup (`baseline`) is excluded."""
+    top_level, eager = _top_level_imports(module)
+    own = [(name, ms) for name, ms in top_level.items() if name not in baseline]
+    return {
+        "module": module,
+        "total_ms": round(sum(ms for _, ms in own), 1),
+        "slowest": [{"module": name, "ms": round(ms, 1)} for name, ms in sorted(own, key=lambda t: -t[1])[:10]],
+        "eager_lazy_modules": eager,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Measure and enforce the import-time budget")
+    parser.add_argument("--modules", nargs="+", default=["app", "asgi_chatbot"])
+    parser.add_argument("--budget-ms", type=float, default=IMPORT_BUDGET_MS)
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+
+    baseline, _ = _top_level_imports("sys")
+    results, failed = [], False
+    for module in args.modules:
+        result = profile(module, baseline)
+        result["within_budget"] = result["total_ms"] <= args.budget_ms and not result["eager_lazy_modules"]
+        failed |= not result["within_budget"]
+        results.append(result)
+
+        print(f"{module}: {result['total_ms']:.1f} ms (budget {args.budget_ms:.0f} ms)")
+        for row in result["slowest"][:5]:
+            print(f"    {row['ms']:8.1f} ms  {row['module']}")
+        if result["eager_lazy_modules"]:
+            print(f"    imported eagerly: {', '.join(result['eager_lazy_modules'])}")
+
+    if args.json:
+        Path(args.json).write_text(json.dumps({"budget_ms": args.budget_ms, "results": results}, indent=2))
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -2,19 +2,25 @@ from flask import Blueprint, request, jsonify
 from werkzeug.security import generate_password_hash
 from bson.objectid import ObjectId
 from .middlewares import super_admin_token_required
+from .principal_cache import invalidate_user
+from .pagination import paginated
 from database_connection import college_users_collection
 import datetime
  
 admin_bp = Blueprint('admin', __name__)
+
+# Listing fields only; password hashes and access keys never leave the database
+USER_LIST_PROJECTION = {'name': 1, 'email': 1, 'created_at': 1}
+
+def serialize_user(user):
+    user['_id'] = str(user['_id'])
+    return user
  
+# Paginated: ?limit=50&after=<next cursor of the previous page>
 @admin_bp.route('', methods=['GET'])
 @super_admin_token_required
 def get_college_users():
-    users = list(college_users_collection.find())
-    for user in users:
-        user['_id'] = str(user['_id'])
-        user.pop('password', None)
-    return jsonify(users)
+    return paginated(college_users_collection, {}, USER_LIST_PROJECTION, serialize_user)
  
 @admin_bp.route('', methods=['POST'])
 @super_admin_token_required
@@ -42,11 +48,9 @@ def create_college_user():
 @admin_bp.route('/<user_id>', methods=['GET'])
 @super_admin_token_required
 def get_single_user(user_id):
-    user = college_users_collection.find_one({"_id": ObjectId(user_id)})
+    user = college_users_collection.find_one({"_id": ObjectId(user_id)}, {"password": 0})
     if user:
-        user['_id'] = str(user['_id'])
-        user.pop('password', None)
-        return jsonify(user)
+        return jsonify(serialize_user(user))
     return jsonify({"error": "User not found."}), 404
  
 @admin_bp.route('/<user_id>', methods=['PUT'])
@@ -61,7 +65,10 @@ def update_user(user_id):
         update_data['email'] = data['email']
     if 'password' in data: update_data['password'] = generate_password_hash(data['password'])
  
+    existing = college_users_collection.find_one({"_id": ObjectId(user_id)}, {"email": 1})
     result = college_users_collection.update_one({"_id": ObjectId(user_id)}, {"$set": update_data})
+    if existing:
+        invalidate_user(existing['email'])
     if result.modified_count:
         return jsonify({"message": "User updated."})
     return jsonify({"error": "User not found or no changes made."}), 404
@@ -69,7 +76,10 @@ def update_user(user_id):
 @admin_bp.route('/<user_id>', methods=['DELETE'])
 @super_admin_token_required
 def delete_user(user_id):
+    existing = college_users_collection.find_one({"_id": ObjectId(user_id)}, {"email": 1})
     result = college_users_collection.delete_one({"_id": ObjectId(user_id)})
+    if existing:
+        invalidate_user(existing['email'])
     if result.deleted_count:
         return jsonify({"message": "User deleted."})
     return jsonify({"error": "User not found."}), 404
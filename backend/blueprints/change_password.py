@@ -1,6 +1,7 @@
 from flask import Blueprint, request, jsonify
 from werkzeug.security import check_password_hash, generate_password_hash
 from .middlewares import token_required
+from .principal_cache import invalidate_user
 from database_connection import college_users_collection
  
 change_password_bp = Blueprint('change_password', __name__)
@@ -28,5 +29,6 @@ def _change_password_handler(current_user):
         {'email': current_user['email']},
         {"$set": {'password': hashed_new_password}}
     )
+    invalidate_user(current_user['email'])
  
     return jsonify({"message": "Password updated successfully"}), 200
\ No newline at end of file
@@ -1,33 +1,86 @@
-from flask import Blueprint, request, jsonify, current_app
-from notebook.college_ragv1 import generate_response_from_rag
+from flask import Blueprint, request, jsonify, current_app, g, Response, stream_with_context
+from notebook.college_ragv1 import generate_response_from_rag, stream_response_from_rag
+from .principal_cache import get_user_by_access_key
+from . import rate_limit
+from notebook import metrics
+from notebook.executors import timed
 import traceback
+import json
 
 chatbot_bp = Blueprint('chatbot', __name__, url_prefix='/api/chatbot')
 
-# Validate init_key (UUID)
-def is_valid_init_key(key):
+# Replies shared with the async serving path (asgi_chatbot.py)
+GREETING_REPLY = {"bot": "Hello! How are you today? 👋"}
+NO_DATA_REPLY = {"reply": "No data received."}
+EMPTY_MESSAGE_REPLY = {"reply": "Please enter a valid message."}
+NO_ANSWER_REPLY = {"reply": "Sorry, I couldn’t find an answer for that. Try asking something else!"}
+ERROR_REPLY = {"reply": "Oops, something went wrong on our end. Please try again later. ⚠️"}
+RATE_LIMITED_REPLY = {"reply": "Too many questions right now. Please try again in a moment."}
+
+def build_reply(response, source):
+    if not response.strip() or "Error generating answer" in response:
+        return NO_ANSWER_REPLY
+    return {"reply": response, "source": source}
+
+# Resolve init_key (UUID) to the owning college user
+def find_user_by_init_key(key):
     if not key:
         current_app.logger.error("Error: No key provided.")
-        return False
-    college_users_collection = current_app.college_users
-    user = college_users_collection.find_one({"access_key": key})
+        return None
+    user = get_user_by_access_key(key)
     if not user:
         current_app.logger.error(f"Error: No user found for key {key}.")
-    return user is not None
+    return user
+
+def is_valid_init_key(key):
+    return find_user_by_init_key(key) is not None
 
-# Middleware to check init_key
+# Middleware to check init_key; the key's owner is the tenant whose documents answer the chat
 @chatbot_bp.before_request
 def check_init_key():
     init_key = request.headers.get("Authorization")
-    if not is_valid_init_key(init_key):
+    with timed("auth"):
+        user = find_user_by_init_key(init_key)
+    if not user:
         current_app.logger.warning(f"Unauthorized access attempt with key: {init_key}")
         return jsonify({"error": "Unauthorized"}), 401
+    g.tenant = user["email"]
+    metrics.tenant_label.set(g.tenant)
+
+# Admission control for questions: a token bucket per access_key, then a cap on in-flight requests.
+# Both answer 429 with Retry-After right away rather than queuing behind busy workers.
+RATE_LIMITED_ENDPOINTS = {'chatbot.message', 'chatbot.message_stream'}
+
+def too_many_requests(reason, wait):
+    metrics.inc("rate_limited_total", reason=reason)
+    response = jsonify(RATE_LIMITED_REPLY)
+    response.headers["Retry-After"] = str(rate_limit.retry_after(wait))
+    return response, 429
+
+@chatbot_bp.before_request
+def admit():
+    if request.endpoint not in RATE_LIMITED_ENDPOINTS:
+        return
+    wait = rate_limit.buckets.take(request.headers.get("Authorization"))
+    if wait:
+        return too_many_requests("rate", wait)
+    if not rate_limit.acquire_slot():
+        return too_many_requests("concurrency", rate_limit.CHAT_BUSY_RETRY_AFTER)
+    g.chat_slot = True
+
+# Worker threads are reused across requests; don't let the next one inherit this tenant's label.
+# Runs after a streamed response finishes, so the slot covers the whole stream.
+@chatbot_bp.teardown_request
+def release_request_state(exc):
+    if g.pop('chat_slot', False):
+        rate_limit.release_slot()
+    metrics.tenant_label.set("")
 
 # Greeting route
 @chatbot_bp.route('/greeting', methods=['GET'])
 def greeting():
     current_app.logger.info("Greeting route accessed.")
-    return jsonify({"bot": "Hello! How are you today? 👋"})
+    return jsonify(GREETING_REPLY)
 
 # Chat message route
 @chatbot_bp.route('/message', methods=['POST'])
@@ -38,23 +91,54 @@ def message():
         data = request.get_json()
         if not data:
             current_app.logger.error("Error: No JSON data received.")
-            return jsonify({"reply": "No data received."}), 400
+            return jsonify(NO_DATA_REPLY), 400
 
         user_message = data.get("message", "").strip()
         if not user_message:
             current_app.logger.error("Error: Empty message received.")
-            return jsonify({"reply": "Please enter a valid message."}), 400
+            return jsonify(EMPTY_MESSAGE_REPLY), 400
 
         current_app.logger.info(f"Calling generate_response_from_rag with message: {user_message}")
-        response, source = generate_response_from_rag(user_message)
+        response, source = generate_response_from_rag(user_message, g.tenant, data.get("session_id"))
         current_app.logger.info("RAG Response received.")
 
-        if not response.strip() or "Error generating answer" in response:
-            return jsonify({"reply": "Sorry, I couldn’t find an answer for that. Try asking something else!"})
-
-        return jsonify({"reply": response, "source": source})
+        with timed("serialize"):
+            return jsonify(build_reply(response, source))
 
     except Exception as e:
         current_app.logger.error("❌ Exception occurred in /message endpoint:")
         traceback.print_exc()
-        return jsonify({"reply": "Oops, something went wrong on our end. Please try again later. ⚠️"}), 500
+        return jsonify(ERROR_REPLY), 500
+
+def sse(event, data):
+    """Formats one Server-Sent Events frame; data is JSON-encoded so HTML newlines survive."""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+# Streaming chat message route (Server-Sent Events)
+@chatbot_bp.route('/message/stream', methods=['POST'])
+def message_stream():
+    data = request.get_json(silent=True)
+    user_message = (data or {}).get("message", "").strip()
+    if not user_message:
+        current_app.logger.error("Error: Empty message received.")
+        return jsonify(EMPTY_MESSAGE_REPLY), 400
+
+    tenant, session_id = g.tenant, data.get("session_id")
+    current_app.logger.info(f"Streaming response for message: {user_message}")
+
+    def events():
+        try:
+            for event, payload in stream_response_from_rag(user_message, tenant, session_id):
+                if event == "token":
+                    yield sse("token", {"html": payload})
+                else:
+                    yield sse("done", {"source": payload})
+        except Exception:
+            current_app.logger.error("❌ Exception occurred in /message/stream endpoint:")
+            traceback.print_exc()
+            yield sse("error", ERROR_REPLY)
+
+    return Response(stream_with_context(events()), mimetype="text/event-stream", headers={
+        "Cache-Control": "no-cache",
+        "X-Accel-Buffering": "no"
+    })
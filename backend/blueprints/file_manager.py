@@ -1,10 +1,38 @@
 import os
-from flask import Blueprint, request, jsonify, current_app
+from flask import Blueprint, request, jsonify
 from bson.objectid import ObjectId
+from pymongo.errors import PyMongoError
 from .middlewares import token_required
-from database_connection import KM_documents_collection, KM_URLs_collection
+from .pagination import paginated
+from database_connection import KM_documents_collection, KM_URLs_collection, KM_FAQ_batches_collection
+from notebook import text_cache, ingest, answer_cache, job_queue, faq_table, blob_store
+from notebook.college_ragv1 import FAQ_BATCH_MAX
  
 file_bp = Blueprint('file', __name__)
+
+MAX_UPLOAD_BYTES = int(os.getenv('MAX_UPLOAD_BYTES', str(100 * 1024 * 1024)))
+UPLOAD_CHUNK_BYTES = 1024 * 1024
+
+# Stores an upload under its content hash (streamed to a temp file, then renamed); (sha256, path), or None if over the limit
+def save_upload(file, max_bytes=MAX_UPLOAD_BYTES):
+    staged = blob_store.stage(file.stream, max_bytes, UPLOAD_CHUNK_BYTES)
+    if staged is None:
+        return None
+    sha256, tmp = staged
+    return sha256, blob_store.commit(sha256, tmp)
+
+# Listing fields only; URL records also hold the full page snapshot, which the listing never needs
+STATUS_FIELDS = {'status': 1, 'progress': 1, 'error': 1}
+PDF_LIST_PROJECTION = {'filename': 1, 'description': 1, **STATUS_FIELDS}
+URL_LIST_PROJECTION = {'url': 1, 'description': 1, **STATUS_FIELDS}
+
+# Documents added before the job queue existed have no status; they were ingested at query time
+def ingest_status(record):
+    return {
+        'status': record.get('status', job_queue.INDEXED),
+        'progress': record.get('progress', 100),
+        'error': record.get('error')
+    }
  
 # Upload PDF file with description
 @file_bp.route('/upload-pdf', methods=['POST'])
@@ -17,23 +45,42 @@ def upload_pdf(current_user):
         return jsonify({'error': 'Only PDF files allowed'}), 400
  
     filename = file.filename
-    path = os.path.join(current_app.config['UPLOAD_FOLDER'], filename)
-    file.save(path)
+    saved = save_upload(file)
+    if saved is None:
+        return jsonify({'error': f'PDF exceeds the {MAX_UPLOAD_BYTES // (1024 * 1024)} MB upload limit'}), 413
+    sha256, path = saved
  
-    KM_documents_collection.insert_one({
+    doc_id = KM_documents_collection.insert_one({
         'filename': filename,
         'path': path,
         'description': description,
-        'email': current_user['email']
-    })
+        'email': current_user['email'],
+        'sha256': sha256,
+        'status': job_queue.PENDING
+    }).inserted_id
+    # Cached and precomputed answers came from the tenant's old sources
+    answer_cache.invalidate(current_user['email'])
+    faq_table.clear(current_user['email'])
+    # Content already processed for any record is reused right away
+    try:
+        if ingest.ingest_duplicate(doc_id):
+            KM_documents_collection.update_one({'_id': doc_id}, {'$set': {'status': job_queue.INDEXED, 'progress': 100, 'error': None}})
+            return jsonify({'message': 'PDF uploaded successfully', 'deduplicated': True}), 200
+    except (PyMongoError, OSError) as e:
+        # Storage trouble only; the job queue then processes the upload from scratch
+        print(f"[ERROR] Reusing artifacts for {filename}: {e}")
+    # Extraction (into the text cache) and indexing happen once, in the job queue
+    job_queue.enqueue('pdf', doc_id)
     return jsonify({'message': 'PDF uploaded successfully'}), 200
  
-# List uploaded PDF files
+# List uploaded PDF files, paginated: ?limit=50&after=<next cursor of the previous page>
 @file_bp.route('/pdfs', methods=['GET'])
 @token_required
 def list_pdfs(current_user):
-    files = KM_documents_collection.find({'email': current_user['email']})
-    return jsonify([{'id': str(f['_id']), 'filename': f['filename'], 'description': f.get('description', '')} for f in files])
+    return paginated(
+        KM_documents_collection, {'email': current_user['email']}, PDF_LIST_PROJECTION,
+        lambda f: {'id': str(f['_id']), 'filename': f['filename'], 'description': f.get('description', ''), **ingest_status(f)}
+    )
  
 # Delete a PDF
 @file_bp.route('/delete-pdf/<file_id>', methods=['DELETE'])
@@ -43,11 +90,23 @@ def delete_pdf(current_user, file_id):
     if not record:
         return jsonify({'error': 'Unauthorized or not found'}), 404
  
-    try:
-        os.remove(record['path'])
-    except:
-        pass
     KM_documents_collection.delete_one({'_id': ObjectId(file_id)})
+    ingest.remove_from_index(current_user['email'], file_id)
+    answer_cache.invalidate(current_user['email'])
+    faq_table.clear(current_user['email'])
+
+    # The stored file and its cached text go with the last document referencing the content
+    sha256 = record.get('sha256')
+    released = blob_store.release(sha256) if sha256 else None
+    if released is None:
+        # Uploaded before content-addressed storage, under its own filename
+        try:
+            os.remove(record['path'])
+        except:
+            pass
+        released = sha256 and not KM_documents_collection.find_one({'sha256': sha256})
+    if released:
+        text_cache.invalidate(sha256)
     return jsonify({'message': 'PDF deleted successfully'})
  
 # Add a website URL with description
@@ -61,19 +120,25 @@ def add_url(current_user):
     if not url:
         return jsonify({'error': 'URL is required'}), 400
  
-    KM_URLs_collection.insert_one({
+    url_id = KM_URLs_collection.insert_one({
         'url': url,
         'description': description,
-        'email': current_user['email']
-    })
+        'email': current_user['email'],
+        'status': job_queue.PENDING
+    }).inserted_id
+    answer_cache.invalidate(current_user['email'])
+    faq_table.clear(current_user['email'])
+    job_queue.enqueue('url', url_id)
     return jsonify({'message': 'URL added successfully'}), 200
  
-# List all URLs
+# List URLs, paginated like /pdfs
 @file_bp.route('/urls', methods=['GET'])
 @token_required
 def list_urls(current_user):
-    urls = KM_URLs_collection.find({'email': current_user['email']})
-    return jsonify([{'id': str(u['_id']), 'url': u['url'], 'description': u.get('description', '')} for u in urls])
+    return paginated(
+        KM_URLs_collection, {'email': current_user['email']}, URL_LIST_PROJECTION,
+        lambda u: {'id': str(u['_id']), 'url': u['url'], 'description': u.get('description', ''), **ingest_status(u)}
+    )
  
 # Delete a URL
 @file_bp.route('/delete-url/<url_id>', methods=['DELETE'])
@@ -82,4 +147,52 @@ def delete_url(current_user, url_id):
     result = KM_URLs_collection.delete_one({'_id': ObjectId(url_id), 'email': current_user['email']})
     if result.deleted_count == 0:
         return jsonify({'error': 'URL not found or unauthorized'}), 404
-    return jsonify({'message': 'URL deleted successfully'})
\ No newline at end of file
+    ingest.remove_from_index(current_user['email'], url_id)
+    answer_cache.invalidate(current_user['email'])
+    faq_table.clear(current_user['email'])
+    return jsonify({'message': 'URL deleted successfully'})
+# Batch-answer known questions and store them as the tenant's FAQ table, served before any model call.
+# Lives under /api/chatbot/ next to /message, but writes tenant data, so it takes the admin token, not the init_key.
+# Answering runs in the job queue; poll GET /api/chatbot/batch/<job id> for the answers.
+@file_bp.route('/chatbot/batch', methods=['POST'])
+@token_required
+def batch_answer(current_user):
+    data = request.get_json(silent=True) or {}
+    questions = [q.strip() for q in data.get('questions', []) if isinstance(q, str) and q.strip()]
+    if not questions:
+        return jsonify({'error': 'questions must be a non-empty list'}), 400
+    if len(questions) > FAQ_BATCH_MAX:
+        return jsonify({'error': f'At most {FAQ_BATCH_MAX} questions per batch'}), 400
+
+    batch_id = KM_FAQ_batches_collection.insert_one({
+        'email': current_user['email'],
+        'questions': questions,
+        'store': bool(data.get('store', True)),
+        'status': job_queue.PENDING
+    }).inserted_id
+    job_queue.enqueue('faq_batch', batch_id)
+    return jsonify({'job_id': str(batch_id), 'status': job_queue.PENDING}), 202
+
+# Progress of a batch; the answers once it is done
+@file_bp.route('/chatbot/batch/<job_id>', methods=['GET'])
+@token_required
+def batch_status(current_user, job_id):
+    batch = KM_FAQ_batches_collection.find_one({'_id': ObjectId(job_id), 'email': current_user['email']})
+    if not batch:
+        return jsonify({'error': 'Batch not found or unauthorized'}), 404
+    result = {'job_id': job_id, **ingest_status(batch)}
+    if 'answers' in batch:
+        result.update({'status': 'done', 'answers': batch['answers'], 'stored': batch.get('stored', 0)})
+    return jsonify(result)
+
+# List precomputed FAQs
+@file_bp.route('/faqs', methods=['GET'])
+@token_required
+def list_faqs(current_user):
+    return jsonify(faq_table.list_faqs(current_user['email']))
+
+# Delete all precomputed FAQs
+@file_bp.route('/faqs', methods=['DELETE'])
+@token_required
+def clear_faqs(current_user):
+    return jsonify({'message': 'FAQs deleted successfully', 'deleted': faq_table.clear(current_user['email'])})
@@ -1,7 +1,13 @@
+import os
+import hmac
 from functools import wraps
 from flask import request, jsonify, current_app
-from database_connection import college_users_collection, super_admins_collection
+from .principal_cache import get_principal
+from notebook.executors import timed
 import jwt
+
+# Static bearer token for metrics scrapers, which can't log in; unset, only super admins can read metrics
+METRICS_TOKEN = os.getenv('METRICS_TOKEN')
  
 def token_required(f):
     @wraps(f)
@@ -21,11 +27,8 @@ def token_required(f):
             user_email = data.get('email')
             user_role = data.get('role')
  
-            current_user = None
-            if user_role == 'superAdmin':
-                current_user = super_admins_collection.find_one({'email': user_email})
-            elif user_role == 'collegeUser':
-                current_user = college_users_collection.find_one({'email': user_email})
+            with timed("auth"):
+                current_user = get_principal(user_role, user_email)
             if not current_user:
                 return jsonify({'error': 'User not found!'}), 401
  
@@ -55,7 +58,8 @@ def super_admin_token_required(f):
             if data.get('role') != 'superAdmin':
                 return jsonify({'error': 'Admin access required!'}), 403
  
-            current_user = super_admins_collection.find_one({'email': data['email']})
+            with timed("auth"):
+                current_user = get_principal('superAdmin', data['email'])
             if not current_user:
                 return jsonify({'error': 'Super admin not found!'}), 401
  
@@ -66,4 +70,15 @@ def super_admin_token_required(f):
  
         return f(*args, **kwargs)
     return decorated
- 
\ No newline at end of file
+ 
+
+def metrics_token_required(f):
+    admin_only = super_admin_token_required(f)
+
+    @wraps(f)
+    def decorated(*args, **kwargs):
+        supplied = request.headers.get('Authorization', '')
+        if METRICS_TOKEN and hmac.compare_digest(supplied.encode(), f'Bearer {METRICS_TOKEN}'.encode()):
+            return f(*args, **kwargs)
+        return admin_only(*args, **kwargs)
+    return decorated
@@ -0,0 +1,53 @@
+import os
+import hashlib
+from flask import request, jsonify
+from bson.objectid import ObjectId
+from bson.errors import InvalidId
+
+# -- Config --
+PAGE_SIZE_DEFAULT = int(os.getenv("PAGE_SIZE_DEFAULT", "50"))
+PAGE_SIZE_MAX = int(os.getenv("PAGE_SIZE_MAX", "200"))
+
+
+def page_params():
+    """(limit, after) from the query string; `after` is the `next` cursor of the previous page. ValueError if malformed."""
+    try:
+        limit = int(request.args.get('limit', PAGE_SIZE_DEFAULT))
+        after = request.args.get('after')
+        return max(1, min(limit, PAGE_SIZE_MAX)), ObjectId(after) if after else None
+    except (TypeError, ValueError, InvalidId):
+        raise ValueError("limit must be a number and after a cursor from a previous page")
+
+
+def keyset_page(collection, query, projection, serialize, limit, after=None):
+    """
+    One page in _id order, resumed after the last _id of the previous page instead of skipping rows,
+    so every page costs the same index range scan. Returns {"items": [...], "next": cursor or None}.
+    """
+    if after is not None:
+        query = {**query, '_id': {'$gt': after}}
+    docs = list(collection.find(query, projection).sort('_id', 1).limit(limit + 1))
+    more = len(docs) > limit
+    docs = docs[:limit]
+    return {
+        'items': [serialize(d) for d in docs],
+        'next': str(docs[-1]['_id']) if more else None
+    }
+
+
+def conditional_json(payload):
+    """JSON response with an ETag over its body; a matching If-None-Match gets an empty 304."""
+    response = jsonify(payload)
+    response.set_etag(hashlib.sha1(response.get_data()).hexdigest())
+    # Private data behind a bearer token: browsers may keep it, but must revalidate every time
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response.make_conditional(request)
+
+
+def paginated(collection, query, projection, serialize):
+    """A listing endpoint's response: one keyset page as conditional JSON, or a 400 for a bad cursor."""
+    try:
+        limit, after = page_params()
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return conditional_json(keyset_page(collection, query, projection, serialize, limit, after))
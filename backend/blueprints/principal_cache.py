@@ -0,0 +1,65 @@
+import os
+from database_connection import college_users_collection, super_admins_collection, get_async_db
+from notebook.lru_cache import LRUCache
+from notebook import metrics
+
+# Short TTL bounds how long another worker can serve a stale principal after a change
+PRINCIPAL_CACHE_TTL = float(os.getenv("PRINCIPAL_CACHE_TTL", "60"))
+PRINCIPAL_CACHE_SIZE = int(os.getenv("PRINCIPAL_CACHE_SIZE", "4096"))
+
+_by_access_key = LRUCache(PRINCIPAL_CACHE_SIZE, ttl=PRINCIPAL_CACHE_TTL)
+_by_role_email = LRUCache(PRINCIPAL_CACHE_SIZE, ttl=PRINCIPAL_CACHE_TTL)
+
+_collections = {
+    'superAdmin': super_admins_collection,
+    'collegeUser': college_users_collection,
+}
+
+
+def get_user_by_access_key(access_key):
+    """Returns the college user owning a chatbot access key, or None."""
+    if not access_key:
+        return None
+    user = _by_access_key.get(access_key)
+    metrics.cache_result("principal", user is not None, tenant="")
+    if user is None:
+        user = college_users_collection.find_one({"access_key": access_key})
+        if user:
+            _by_access_key.set(access_key, user)
+    return user
+
+
+async def aget_user_by_access_key(access_key):
+    """get_user_by_access_key for the asyncio path (asgi_chatbot.py): a cache miss awaits motor instead of blocking."""
+    if not access_key:
+        return None
+    user = _by_access_key.get(access_key)
+    metrics.cache_result("principal", user is not None, tenant="")
+    if user is None:
+        user = await get_async_db()["college_users"].find_one({"access_key": access_key})
+        if user:
+            _by_access_key.set(access_key, user)
+    return user
+
+
+def get_principal(role, email):
+    """Returns the super admin or college user for a JWT's role and email, or None."""
+    collection = _collections.get(role)
+    if collection is None or not email:
+        return None
+    user = _by_role_email.get((role, email))
+    metrics.cache_result("principal", user is not None, tenant="")
+    if user is None:
+        user = collection.find_one({'email': email})
+        if user:
+            _by_role_email.set((role, email), user)
+    return user
+
+
+def invalidate_user(email):
+    """Drops every cached entry for a user; call after key regeneration, profile/password changes or deletion."""
+    for role in _collections:
+        _by_role_email.pop((role, email))
+    for access_key, user in _by_access_key.items():
+        if user.get('email') == email:
+            _by_access_key.pop(access_key)
@@ -0,0 +1,117 @@
+import os
+import math
+import time
+import sqlite3
+import threading
+import itertools
+from notebook.lru_cache import LRUCache
+
+# -- Config --
+# Sustained questions per minute per access_key, plus a burst allowance on top
+CHAT_RATE_PER_MINUTE = float(os.getenv("CHAT_RATE_PER_MINUTE", "30"))
+CHAT_BURST = float(os.getenv("CHAT_BURST", "10"))
+# In-flight chat requests per process; beyond this requests get a 429 instead of waiting for a thread
+CHAT_MAX_CONCURRENT = int(os.getenv("CHAT_MAX_CONCURRENT", "32"))
+CHAT_BUSY_RETRY_AFTER = int(os.getenv("CHAT_BUSY_RETRY_AFTER", "2"))
+# "memory" (per process) or "sqlite" (shared by all workers on the host through RATE_LIMIT_DB)
+RATE_LIMIT_STORE = os.getenv("RATE_LIMIT_STORE", "memory")
+RATE_LIMIT_DB = os.getenv("RATE_LIMIT_DB", "cache/rate_limit.sqlite3")
+RATE_LIMIT_MAX_KEYS = int(os.getenv("RATE_LIMIT_MAX_KEYS", "100000"))
+# Every this many takes, a process deletes SQLite rows for keys idle long enough to be full again
+RATE_LIMIT_PRUNE_EVERY = int(os.getenv("RATE_LIMIT_PRUNE_EVERY", "1000"))
+
+
+def _refill(tokens: float, updated: float, now: float, rate: float, burst: float) -> float:
+    return min(burst, tokens + (now - updated) * rate)
+
+
+class MemoryBuckets:
+    """Token buckets in this process; idle keys are evicted once they would be full again anyway."""
+
+    def __init__(self, rate: float, burst: float):
+        self.rate, self.burst = rate, burst
+        self._buckets = LRUCache(RATE_LIMIT_MAX_KEYS, ttl=burst / rate if rate else None)
+        self._lock = threading.Lock()
+
+    def take(self, key: str) -> float:
+        """Spends one token; returns 0 if allowed, else the seconds until a token is available."""
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated = self._buckets.get(key) or (self.burst, now)
+            tokens = _refill(tokens, updated, now, self.rate, self.burst)
+            if tokens < 1:
+                self._buckets.set(key, (tokens, now))
+                return (1 - tokens) / self.rate
+            self._buckets.set(key, (tokens - 1, now))
+            return 0.0
+
+
+class SqliteBuckets:
+    """The same buckets in a local SQLite file, so every worker process on the host shares one budget per key."""
+
+    def __init__(self, rate: float, burst: float, path: str = RATE_LIMIT_DB):
+        self.rate, self.burst, self.path = rate, burst, path
+        self._local = threading.local()
+        self._takes = itertools.count(1)
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("CREATE TABLE IF NOT EXISTS buckets (key TEXT PRIMARY KEY, tokens REAL, updated REAL)")
+            conn.execute("CREATE INDEX IF NOT EXISTS buckets_updated ON buckets (updated)")
+
+    def _connect(self) -> sqlite3.Connection:
+        # One connection per thread, and never one inherited across a fork (gunicorn preloads the app)
+        if getattr(self._local, "pid", None) != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=1.0, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn, self._local.pid = conn, os.getpid()
+        return self._local.conn
+
+    def take(self, key: str) -> float:
+        """
+        Spends one token; returns 0 if allowed, else the seconds until a token is available. If the file stays
+        locked past the connection timeout the host is overloaded, so the request is told to retry later.
+        """
+        # Wall-clock time, since buckets are shared between processes
+        now = time.time()
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute("SELECT tokens, updated FROM buckets WHERE key = ?", (key,)).fetchone()
+            tokens = _refill(*(row or (self.burst, now)), now, self.rate, self.burst)
+            wait = 0.0 if tokens >= 1 else (1 - tokens) / self.rate
+            conn.execute(
+                "INSERT OR REPLACE INTO buckets (key, tokens, updated) VALUES (?, ?, ?)",
+                (key, tokens - 1 if not wait else tokens, now)
+            )
+            if self.rate and next(self._takes) % RATE_LIMIT_PRUNE_EVERY == 0:
+                # A missing row reads as a full bucket, so rows idle that long carry no state
+                conn.execute("DELETE FROM buckets WHERE updated < ?", (now - self.burst / self.rate,))
+            conn.execute("COMMIT")
+            return wait
+        except sqlite3.OperationalError as e:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            print(f"[RATE] Bucket store unavailable, asking the client to retry: {e}")
+            return float(CHAT_BUSY_RETRY_AFTER)
+        except Exception:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            raise
+
+STORES = {"memory": MemoryBuckets, "sqlite": SqliteBuckets}
+buckets = STORES[RATE_LIMIT_STORE](CHAT_RATE_PER_MINUTE / 60, CHAT_BURST)
+
+_slots = threading.BoundedSemaphore(CHAT_MAX_CONCURRENT)
+
+
+def retry_after(wait: float) -> int:
+    return max(1, math.ceil(wait))
+
+
+def acquire_slot() -> bool:
+    """Takes a global in-flight slot without waiting; False when the process is at capacity."""
+    return _slots.acquire(blocking=False)
+
+
+def release_slot() -> None:
+    _slots.release()
@@ -1,5 +1,6 @@
 from flask import Blueprint, jsonify, request,make_response
 from .middlewares import token_required
+from .principal_cache import invalidate_user
 from database_connection import college_users_collection, super_admins_collection  # Importing collections
 import uuid
 import io
@@ -55,6 +56,8 @@ def update_profile(current_user):
         {"$set": update_fields},
         upsert=True
     )
+    invalidate_user(current_user['email'])
+    invalidate_user(data['email'])
  
     return jsonify({
         "message": "Profile updated successfully!",
@@ -76,6 +79,7 @@ def generate_access_key(current_user):
         {"$set": {"access_key": new_key}},
         upsert=True
     )
+    invalidate_user(current_user['email'])
  
     return jsonify({"message": "Access key generated successfully", "access_key": new_key})
  
@@ -19,3 +19,52 @@ college_users_collection = db['college_users']
 super_admins_collection = db['super_admins']
 KM_documents_collection = db['KM_documents']
 KM_URLs_collection = db['KM_URLs']
+KM_jobs_collection = db['KM_jobs']
+KM_FAQs_collection = db['KM_FAQs']
+KM_questions_collection = db['KM_questions']
+KM_context_caches_collection = db['KM_context_caches']
+KM_blobs_collection = db['KM_blobs']
+KM_FAQ_batches_collection = db['KM_FAQ_batches']
+KM_answer_versions_collection = db['KM_answer_versions']
+KM_sessions_collection = db['KM_sessions']
+
+def ensure_indexes():
+    """Creates the indexes hot lookups rely on; safe to call on every startup."""
+    from pymongo import ASCENDING
+    from pymongo.errors import PyMongoError
+    specs = [
+        (college_users_collection, "email", {"unique": True}),
+        # Only users that have generated a key take part in the uniqueness check
+        (college_users_collection, "access_key", {"unique": True, "partialFilterExpression": {"access_key": {"$type": "string"}}}),
+        (super_admins_collection, "email", {"unique": True}),
+        # Per-tenant lookups and the keyset-paginated listings (email, then _id order)
+        (KM_documents_collection, ["email", "_id"], {}),
+        (KM_URLs_collection, ["email", "_id"], {}),
+        # Duplicate uploads look for an already processed record with the same content
+        (KM_documents_collection, "sha256", {}),
+        (KM_jobs_collection, "status", {}),
+        # Chat lookups hit the FAQ table by tenant and normalized question
+        (KM_FAQs_collection, ["email", "key"], {"unique": True}),
+        # Question records are loaded per tenant and replaced per document
+        (KM_questions_collection, ["email", "doc_id"], {}),
+        # One provider-side context cache per tenant and source kind
+        (KM_context_caches_collection, ["email", "kind"], {"unique": True}),
+        # Conversations are forgotten once idle for SESSION_TTL seconds
+        (KM_sessions_collection, "updated_at", {"expireAfterSeconds": int(os.getenv("SESSION_TTL", "1800"))}),
+    ]
+    for collection, field, options in specs:
+        keys = field if isinstance(field, list) else [field]
+        try:
+            collection.create_index([(key, ASCENDING) for key in keys], **options)
+        except PyMongoError as e:
+            print(f"[Init] Could not create index on {collection.name}.{'+'.join(keys)}: {e}")
+
+# Async client for the ASGI chatbot path, created on first use so sync-only processes never load motor
+_async_client = None
+
+def get_async_db():
+    global _async_client
+    if _async_client is None:
+        from motor.motor_asyncio import AsyncIOMotorClient
+        _async_client = AsyncIOMotorClient(MONGO_URI)
+    return _async_client.get_database("chatbot_platform")
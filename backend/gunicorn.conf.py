@@ -0,0 +1,54 @@
+# Production entry point. From backend/: `gunicorn app:app` (gunicorn loads this file automatically).
+# The app is imported once in the master (preload_app), one-time setup and index preloading run there,
+# and each forked worker then starts its own pools, ingestion workers and engine warm-up.
+import os
+import fcntl
+import multiprocessing
+
+CPU_COUNT = multiprocessing.cpu_count()
+
+bind = os.getenv("BIND", "0.0.0.0:5000")
+workers = int(os.getenv("WEB_WORKERS", str(min(4, CPU_COUNT))))
+# Threads per worker; chat requests mostly wait on Mongo and Gemini, and SSE streams hold a thread each
+threads = int(os.getenv("WEB_THREADS", "8"))
+worker_class = "gthread"
+preload_app = True
+# Generation plus streaming can legitimately take a while
+timeout = int(os.getenv("WEB_TIMEOUT", "120"))
+graceful_timeout = int(os.getenv("WEB_GRACEFUL_TIMEOUT", "30"))
+keepalive = 5
+accesslog = os.getenv("WEB_ACCESS_LOG", "-")
+
+# Every worker has its own parse pool; split the cores between workers instead of each taking all of them.
+# Must be set before the app (and notebook.executors) is imported, which preload_app does after reading this file.
+os.environ.setdefault("PARSE_WORKERS", str(max(1, CPU_COUNT // workers)))
+
+# Held by the one worker that runs the website refresher; released by the OS if that worker dies
+REFRESHER_LOCK_PATH = os.getenv("REFRESHER_LOCK_PATH", "cache/website-refresher.lock")
+_refresher_lock = None
+
+
+def when_ready(server):
+    # Master, after the app is loaded and before the first fork: runs once, not per worker
+    from app import init_once
+    init_once()
+
+
+def _claim_refresher() -> bool:
+    global _refresher_lock
+    os.makedirs(os.path.dirname(REFRESHER_LOCK_PATH) or ".", exist_ok=True)
+    handle = open(REFRESHER_LOCK_PATH, "w")
+    try:
+        fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        handle.close()
+        return False
+    _refresher_lock = handle
+    return True
+
+
+def post_fork(server, worker):
+    # Threads and process pools don't survive fork, so they start here. PyMongo resets its
+    # connection pools in the child after a fork.
+    from app import init_worker
+    init_worker(website_refresher=_claim_refresher())
@@ -0,0 +1,101 @@
+import os
+import re
+from typing import Optional, Tuple
+import numpy as np
+from pymongo import ReturnDocument
+from database_connection import KM_answer_versions_collection
+from notebook.lru_cache import LRUCache
+from notebook.vector_index import get_embedder
+from notebook import metrics
+
+# -- Config --
+ANSWER_CACHE_TTL = float(os.getenv("ANSWER_CACHE_TTL", "3600"))
+ANSWER_CACHE_SIZE = int(os.getenv("ANSWER_CACHE_SIZE", "256"))  # entries per tenant
+ANSWER_CACHE_MAX_TENANTS = int(os.getenv("ANSWER_CACHE_MAX_TENANTS", "128"))
+ANSWER_CACHE_SIMILARITY = float(os.getenv("ANSWER_CACHE_SIMILARITY", "0.92"))
+# Each tenant's cache version lives in Mongo so an invalidation in one process reaches every worker;
+# a process re-reads it at most this often, which bounds how long another worker serves stale answers
+ANSWER_CACHE_VERSION_TTL = float(os.getenv("ANSWER_CACHE_VERSION_TTL", "5"))
+
+_PUNCT_RE = re.compile(r"[^a-z0-9 ]+")
+_SPACE_RE = re.compile(r"\s+")
+
+
+def normalize(query: str) -> str:
+    """Lowercases, strips punctuation and collapses whitespace so trivially different phrasings match."""
+    return _SPACE_RE.sub(" ", _PUNCT_RE.sub(" ", query.lower())).strip()
+
+
+class TenantAnswerCache:
+    """One tenant's answers: exact lookup on normalized text, then nearest neighbour by embedding."""
+
+    def __init__(self, version: int = 0):
+        self.version = version
+        self.entries = LRUCache(ANSWER_CACHE_SIZE, ttl=ANSWER_CACHE_TTL)
+
+    def get(self, key: str, vector: np.ndarray) -> Optional[Tuple[str, str]]:
+        hit = self.entries.get(key)
+        if hit is not None:
+            return hit[0]
+
+        live = self.entries.items()
+        if not live:
+            return None
+        vectors = np.stack([v for _, (_, v) in live])
+        scores = vectors @ vector
+        best = int(np.argmax(scores))
+        if scores[best] < ANSWER_CACHE_SIMILARITY:
+            return None
+        key, (answer, _) = live[best]
+        self.entries.get(key)  # refresh LRU position
+        return answer
+
+    def put(self, key: str, vector: np.ndarray, answer: Tuple[str, str]) -> None:
+        self.entries.set(key, (answer, vector))
+
+
+_tenants = LRUCache(ANSWER_CACHE_MAX_TENANTS)
+_versions = LRUCache(ANSWER_CACHE_MAX_TENANTS, ttl=ANSWER_CACHE_VERSION_TTL)
+
+
+def _version(tenant: str) -> int:
+    def load():
+        record = KM_answer_versions_collection.find_one({"_id": tenant})
+        return record["version"] if record else 0
+    return _versions.get_or_create(tenant, load)
+
+
+def _current(tenant: str) -> Optional[TenantAnswerCache]:
+    """The tenant's cache, dropped if another process has invalidated it since it was filled."""
+    cache = _tenants.get(tenant)
+    if cache is not None and cache.version != _version(tenant):
+        _tenants.pop(tenant)
+        return None
+    return cache
+
+
+def lookup(tenant: str, query: str) -> Optional[Tuple[str, str]]:
+    """Returns a cached (answer, source) for this tenant's query, or None."""
+    cache = _current(tenant)
+    if cache is None:
+        metrics.cache_result("answer", False, tenant)
+        return None
+    key = normalize(query)
+    answer = cache.get(key, get_embedder().embed([key])[0])
+    metrics.cache_result("answer", answer is not None, tenant)
+    return answer
+
+
+def store(tenant: str, query: str, answer: Tuple[str, str]) -> None:
+    key = normalize(query)
+    cache = _current(tenant) or _tenants.get_or_create(tenant, lambda: TenantAnswerCache(_version(tenant)))
+    cache.put(key, get_embedder().embed([key])[0], answer)
+
+
+def invalidate(tenant: str) -> None:
+    """Drops every cached answer for a tenant, in all processes; called whenever its documents or URLs change."""
+    record = KM_answer_versions_collection.find_one_and_update(
+        {"_id": tenant}, {"$inc": {"version": 1}}, upsert=True, return_document=ReturnDocument.AFTER
+    )
+    _versions.set(tenant, record["version"])
+    _tenants.pop(tenant)
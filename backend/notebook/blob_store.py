@@ -0,0 +1,71 @@
+import os
+import uuid
+import hashlib
+import datetime
+from typing import Optional, Tuple
+from pymongo import ReturnDocument
+from database_connection import KM_blobs_collection
+
+# -- Config --
+# Uploaded files are stored once per content hash; KM_blobs counts the KM_documents records referencing each
+BLOB_DIR = os.getenv("BLOB_DIR", os.path.join("uploads", "blobs"))
+
+
+def blob_path(sha256: str) -> str:
+    return os.path.join(BLOB_DIR, sha256[:2], f"{sha256}.pdf")
+
+
+def stage(stream, max_bytes: int, chunk_bytes: int = 1024 * 1024) -> Optional[Tuple[str, str]]:
+    """
+    Streams an upload into a temp file next to the blobs, hashing as it goes.
+    Returns (sha256, temp path), or None (and no file) if it exceeds max_bytes.
+    """
+    tmp_dir = os.path.join(BLOB_DIR, "tmp")
+    os.makedirs(tmp_dir, exist_ok=True)
+    tmp = os.path.join(tmp_dir, f"{uuid.uuid4().hex}.part")
+    digest = hashlib.sha256()
+    size = 0
+    with open(tmp, 'wb') as out:
+        for block in iter(lambda: stream.read(chunk_bytes), b''):
+            size += len(block)
+            if size > max_bytes:
+                break
+            digest.update(block)
+            out.write(block)
+    if size > max_bytes:
+        os.remove(tmp)
+        return None
+    return digest.hexdigest(), tmp
+
+
+def commit(sha256: str, tmp: str) -> str:
+    """Takes a reference on the blob and moves the staged file into place. Returns the blob's path."""
+    path = blob_path(sha256)
+    KM_blobs_collection.update_one(
+        {"_id": sha256},
+        {"$inc": {"refs": 1}, "$setOnInsert": {"path": path, "created_at": datetime.datetime.utcnow()}},
+        upsert=True
+    )
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    # Same bytes under the same name, so replacing an existing blob is harmless and keeps the rename atomic
+    os.replace(tmp, path)
+    return path
+
+
+def release(sha256: str) -> Optional[bool]:
+    """
+    Drops a reference; the file goes with the last one. Returns True if it was deleted, False if still
+    referenced, None if the content isn't in the blob store (uploaded before content addressing).
+    """
+    blob = KM_blobs_collection.find_one_and_update(
+        {"_id": sha256}, {"$inc": {"refs": -1}}, return_document=ReturnDocument.AFTER
+    )
+    if blob is None:
+        return None
+    if blob["refs"] > 0 or not KM_blobs_collection.delete_one({"_id": sha256, "refs": {"$lte": 0}}).deleted_count:
+        return False
+    try:
+        os.remove(blob["path"])
+    except FileNotFoundError:
+        pass
+    return True
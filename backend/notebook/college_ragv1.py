@@ -1,28 +1,11 @@
 import os
+import threading
 from pathlib import Path
-from typing import Dict, Any
-from io import BytesIO
-import requests
-from bs4 import BeautifulSoup
-import google.generativeai as genai
-from pymongo import MongoClient
-from langchain.tools import tool
-from langchain.agents import AgentExecutor, create_tool_calling_agent
-from langchain_google_genai import ChatGoogleGenerativeAI
-from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
-from typing import Tuple
-from dotenv import load_dotenv
-# -- API Key and Config --
-# Load API key from .env
-GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY")
-
-# Check if the key is loaded (optional debug)
-if not GOOGLE_API_KEY:
-    raise ValueError("Missing GOOGLE_API_KEY in .env file")
-
-# Configure Gemini
-os.environ["GOOGLE_API_KEY"] = GOOGLE_API_KEY
-genai.configure(api_key=GOOGLE_API_KEY)
+from typing import List, Optional
+from typing import Tuple, Iterator, AsyncIterator
+import asyncio
+from contextvars import ContextVar
+from notebook.lru_cache import LRUCache
  
 SYSTEM_INSTRUCTION = """
 You are a helpful assistant that provides academic and institutional information for college students.
@@ -68,47 +51,34 @@ Do not use internal knowledge or assumptions to answer the queries.
 
 BASE_DIR = Path(os.getcwd()).resolve()
  
-# Load .env file
-load_dotenv()
-
-# Get Mongo URI from environment
-MONGO_URI = os.getenv("MONGO_URI")
-
-# Connect to MongoDB Atlas
-mongo_client = MongoClient(MONGO_URI)
-db = mongo_client.get_default_database()
-KM_documents_collection = db["KM_documents"]
-KM_URLs_collection = db["KM_URLs"]
- 
-CONTEXT = {
-    "loaded_pdfs": None,
-    "loaded_websites": None
-}
+# Warm context per tenant (the owning college user's email); least recently used tenants are evicted
+MAX_WARM_TENANTS = int(os.getenv("MAX_WARM_TENANTS", "64"))
+TENANT_CONTEXTS = LRUCache(MAX_WARM_TENANTS)
+
+# Tenant of the request being answered; tools read it since the agent calls them without arguments
+current_tenant: ContextVar[str] = ContextVar("current_tenant", default=None)
+# Conversation of the request being answered, if the client sent a session id
+current_session: ContextVar["Session"] = ContextVar("current_session", default=None)
+
+def get_context(tenant: str = None) -> dict:
+    tenant = tenant or current_tenant.get()
+    return TENANT_CONTEXTS.get_or_create(tenant, lambda: {"loaded_pdfs": None, "loaded_websites": None})
  
-from concurrent.futures import ThreadPoolExecutor
+from notebook.executors import io_pool, timed
 import traceback
-import fitz  # PyMuPDF
-def extract_text_to_buffer(pdf_path: Path) -> BytesIO:
-    """Extracts clean text from PDF and returns it as a BytesIO buffer."""
-    try:
-        doc = fitz.open(pdf_path)
-        full_text = "\n".join([page.get_text() for page in doc])
-        doc.close()
-
-        if not full_text.strip():
-            print(f"No text extracted from {pdf_path}")
-            return None
-
-        return BytesIO(full_text.encode("utf-8"))
-
-    except Exception as e:
-        print(f"Error extracting text from {pdf_path}: {e}")
-        return None
-
-@tool
-def load_pdfs_data() -> str:
-    """Force-load PDFs from MongoDB and re-upload extracted text to Gemini (no caching)."""
-    print("[TOOL CALL] load_pdfs_from_mongo (no caching)")
+from notebook.text_cache import ensure_pdf_text_cached, has_text
+from notebook.gemini_registry import ensure_uploaded
+from database_connection import KM_documents_collection, KM_URLs_collection, KM_FAQ_batches_collection, get_async_db
+from notebook import answer_cache
+from notebook.vector_index import get_index, format_context
+from notebook.query_router import route, Route, ROUTER_MIN_CONFIDENCE
+from notebook.session_memory import Session, get_session
+from notebook import faq_table, question_index, context_cache
+from concurrent.futures import wait, FIRST_COMPLETED
+
+def load_pdfs(tenant: str) -> dict:
+    """Loads the tenant's PDFs into its warm context, reusing Gemini uploads while content is unchanged and unexpired."""
+    index = get_index(tenant)
 
     def upload_doc(doc):
         try:
@@ -118,25 +88,17 @@ def load_pdfs_data() -> str:
                 print(f"File not found: {file_path}")
                 return None
 
-            # Always extract and upload fresh text buffer
-            buffer = extract_text_to_buffer(file_path)
-            if buffer is None:
-                return None
-
-            print(f"[UPLOAD] Uploading fresh extracted text from {doc['filename']}")
-            file = genai.upload_file(buffer, mime_type="text/plain")
+            # Indexed documents are answered from retrieved chunks, no remote file needed
+            if index.has_document(str(doc["_id"])):
+                return (doc['filename'], {"file": None, "description": doc.get("description", "")})
 
-            # Optionally clear existing gemini_file_id in DB (to avoid confusion)
-            KM_documents_collection.update_one(
-                {"_id": doc["_id"]},
-                {"$set": {
-                    "gemini_file_id": file.name,  # Update with new one
-                    # "cached_text": None  # Optional: remove any cached text if you had it
-                }}
-            )
+            entry = ensure_pdf_text_cached(file_path, doc.get("sha256"))
+            if not has_text(entry):
+                print(f"No text extracted from {file_path}")
+                return None
 
             return (doc['filename'], {
-                "file": file,
+                "file": ensure_uploaded(KM_documents_collection, doc, path=entry),
                 "description": doc.get("description", "")
             })
 
@@ -145,37 +107,40 @@ def load_pdfs_data() -> str:
             traceback.print_exc()
             return None
 
-    docs = list(KM_documents_collection.find())
-    with ThreadPoolExecutor(max_workers=4) as executor:
-        results = list(executor.map(upload_doc, docs))
+    with timed("load_pdfs"):
+        docs = list(KM_documents_collection.find({"email": tenant}))
+        results = list(io_pool().map(upload_doc, docs))
 
-    CONTEXT["loaded_pdfs"] = {
-        filename: data for filename, data in results if data
+    context = get_context(tenant)
+    context["loaded_pdfs"] = {
+        filename: data for filename, data in filter(None, results)
     }
-    return f"{len(CONTEXT['loaded_pdfs'])} PDF(s) loaded (no cache used)."
+    return context["loaded_pdfs"]
 
+def load_pdfs_data() -> str:
+    """Load PDFs from MongoDB, reusing their Gemini uploads while the content is unchanged and unexpired."""
+    print("[TOOL CALL] load_pdfs_from_mongo")
+    return f"{len(load_pdfs(current_tenant.get()))} PDF(s) loaded."
 
 
-@tool
-def load_websites_data() -> str:
-    """Load websites from MongoDB and upload to Gemini. Always downloads fresh content, no caching used."""
-    print("[TOOL CALL] load_websites_from_mongo")
+
+def load_websites(tenant: str) -> dict:
+    """Loads the tenant's website snapshots into its warm context, reusing Gemini uploads while the text is unchanged."""
+    index = get_index(tenant)
 
     def upload_site(doc):
         try:
-            print(f"Downloading and uploading website: {doc['url']}")
-            r = requests.get(doc['url'], timeout=10)
-            soup = BeautifulSoup(r.text, "html.parser")
-            text = " ".join(p.get_text() for p in soup.find_all("p"))
+            if index.has_document(str(doc["_id"])):
+                return (doc['url'], {"file": None, "description": doc.get("description", "")})
 
-            if not text.strip():
+            # Crawling happens only in the job queue and the background refresher; use the stored snapshot.
+            # A URL without one is still queued or failed (e.g. a dead link) and is left to them.
+            text = doc.get("text")
+            if not text or not text.strip():
                 return None
 
-            buffer = BytesIO(text.encode("utf-8"))
-            file = genai.upload_file(buffer, mime_type="text/plain")
-
             return (doc['url'], {
-                "file": file,
+                "file": ensure_uploaded(KM_URLs_collection, doc, text),
                 "description": doc.get("description", ""),
                 "text": text
             })
@@ -185,60 +150,499 @@ def load_websites_data() -> str:
             traceback.print_exc()
             return None
 
-    docs = list(KM_URLs_collection.find())
-    with ThreadPoolExecutor(max_workers=4) as executor:
-        results = list(executor.map(upload_site, docs))
+    with timed("load_websites"):
+        docs = list(KM_URLs_collection.find({"email": tenant}))
+        results = list(io_pool().map(upload_site, docs))
 
-    CONTEXT["loaded_websites"] = {
-        url: data for url, data in results if data
+    context = get_context(tenant)
+    context["loaded_websites"] = {
+        url: data for url, data in filter(None, results)
     }
-    return f"{len(CONTEXT['loaded_websites'])} website(s) loaded."
+    return context["loaded_websites"]
 
+def load_websites_data() -> str:
+    """Load website snapshots from MongoDB, reusing their Gemini uploads while the page text is unchanged."""
+    print("[TOOL CALL] load_websites_from_mongo")
+    return f"{len(load_websites(current_tenant.get()))} website(s) loaded."
 
+
+ 
+# -- Engine --
+# Gemini, LangChain and the agent are heavy to import and build, so they are created on first use
+# instead of at import time; admin-only processes never pay for them.
+class RagEngine:
+    def __init__(self):
+        google_api_key = os.getenv("GOOGLE_API_KEY")
+        if not google_api_key:
+            raise ValueError("Missing GOOGLE_API_KEY in .env file")
+
+        import google.generativeai as genai
+        from langchain.tools import tool
+        from langchain.agents import AgentExecutor, create_tool_calling_agent
+        from langchain_google_genai import ChatGoogleGenerativeAI
+        from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
+
+        genai.configure(api_key=google_api_key)
+        self.genai = genai
+
+        prompt = ChatPromptTemplate.from_messages([
+            ("system", SYSTEM_INSTRUCTION),
+            ("human", "{input}"),
+            MessagesPlaceholder("agent_scratchpad")
+        ])
+        tools = [tool(f) for f in (load_pdfs_data, load_websites_data, query_pdfs, query_websites)]
+        llm = ChatGoogleGenerativeAI(model="gemini-1.5-flash", temperature=0.3, google_api_key=google_api_key)
+        agent = create_tool_calling_agent(llm=llm, tools=tools, prompt=prompt)
+        self.agent_executor = AgentExecutor(agent=agent, tools=tools, verbose=False, return_intermediate_steps=True)
+
+    def model(self):
+        return self.genai.GenerativeModel("gemini-1.5-flash", system_instruction=SYSTEM_INSTRUCTION)
+
+_engine = None
+_engine_lock = threading.Lock()
+
+def get_engine() -> RagEngine:
+    """Returns the process-wide engine, building it on the first call."""
+    global _engine
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                with timed("engine_init"):
+                    _engine = RagEngine()
+    return _engine
+
+def _model():
+    return get_engine().model()
+
+def _build_parts(query: str, kind: str, loaded: dict, tenant: str = None, session: Session = None, include_files: bool = True) -> list:
+    """
+    Prompt parts: top-k indexed chunks (of `kind`, or all kinds if None), plus whole files for any documents
+    not yet indexed (unless they are in the context cache), plus the conversation so far.
+    A follow-up on the same topic reuses the previous turn's chunks.
+    """
+    session = session or current_session.get()
+    if session is not None and session.follow_up and session.last_hits:
+        hits = session.last_hits
+    else:
+        filters = {"kind": kind} if kind else {}
+        with timed("retrieve"):
+            hits = get_index(tenant or current_tenant.get()).hybrid_search(query, **filters)
+        if session is not None:
+            session.last_hits = hits
+    files = [d["file"] for d in loaded.values() if d.get("file")]
+    if not hits and not files:
+        return None
+    parts = [*files] if include_files else []
+    if hits:
+        parts.append(f"Context:\n{format_context(hits)}")
+    history = session.history_text() if session is not None else ""
+    if history:
+        parts.append(f"Conversation so far:\n{history}")
+    return [*parts, query]
+
+def _prepare(query: str, kind: str, loaded: dict, tenant: str = None, session: Session = None):
+    """(model, parts): with a context cache, the system prompt and whole files live provider-side and only the rest is sent."""
+    tenant = tenant or current_tenant.get()
+    files = [d["file"] for d in loaded.values() if d.get("file")]
+    model = context_cache.cached_model(tenant, kind, SYSTEM_INSTRUCTION, files)
+    return model or _model(), _build_parts(query, kind, loaded, tenant, session, include_files=model is None)
+
+def _answer(query: str, kind: str, loaded: dict, session: Session = None) -> str:
+    model, parts = _prepare(query, kind, loaded, session=session)
+    if not parts:
+        return None
+    with timed("generate"):
+        return model.generate_content(parts).text.strip()
  
-@tool
 def query_pdfs(query: str) -> str:
     """Query loaded PDFs for the given question."""
     print("[TOOL CALL] query_pdfs")
-    files = [d["file"] for d in (CONTEXT["loaded_pdfs"] or {}).values()]
-    if not files: return "<p>No PDFs loaded.</p>"
-    return genai.GenerativeModel("gemini-1.5-flash", system_instruction=SYSTEM_INSTRUCTION).generate_content([*files, query]).text.strip()
+    return _answer(query, "pdf", get_context()["loaded_pdfs"] or {}) or "<p>No PDFs loaded.</p>"
  
-@tool
 def query_websites(query: str) -> str:
     """Query loaded websites for the given question."""
     print("[TOOL CALL] query_websites")
-    files = [d["file"] for d in (CONTEXT["loaded_websites"] or {}).values() if d.get("file")]
-    if not files: return "<p>No websites loaded.</p>"
-    return genai.GenerativeModel("gemini-1.5-flash", system_instruction=SYSTEM_INSTRUCTION).generate_content([*files, query]).text.strip()
- 
+    return _answer(query, "website", get_context()["loaded_websites"] or {}) or "<p>No websites loaded.</p>"
  
-prompt = ChatPromptTemplate.from_messages([
-    ("system", SYSTEM_INSTRUCTION),
-    ("human", "{input}"),
-    MessagesPlaceholder("agent_scratchpad")
-])
  
-tools = [load_pdfs_data, load_websites_data, query_pdfs, query_websites]
-llm = ChatGoogleGenerativeAI(model="gemini-1.5-flash", temperature=0.3, google_api_key=os.environ["GOOGLE_API_KEY"])
-agent = create_tool_calling_agent(llm=llm, tools=tools, prompt=prompt)
-agent_executor = AgentExecutor(agent=agent, tools=tools, verbose=False)
+SOURCE_LABELS = {"pdf": "PDF", "website": "Website", "both": "PDF+Website", "questions": "Question papers"}
+NO_INFO_ANSWER = "<p>I do not have the information in the documents.</p>"
+
+def _load_routed(tenant: str, source: str) -> dict:
+    loaded = {}
+    if source in ("pdf", "both"):
+        loaded.update(load_pdfs(tenant))
+    if source in ("website", "both"):
+        loaded.update(load_websites(tenant))
+    return loaded
+
+def answer_routed(query: str, tenant: str, source: str, session: Session = None) -> str:
+    """Loads and queries the routed source(s) directly, skipping the agent's tool-selection LLM calls."""
+    kind = None if source == "both" else source
+    return _answer(query, kind, _load_routed(tenant, source), session) or NO_INFO_ANSWER
+
+def _agent_source(steps) -> str:
+    """Labels an agent answer by the query tools it actually called."""
+    used = {action.tool for action, _ in steps}
+    if {"query_pdfs", "query_websites"} <= used:
+        return SOURCE_LABELS["both"]
+    if "query_pdfs" in used:
+        return SOURCE_LABELS["pdf"]
+    if "query_websites" in used:
+        return SOURCE_LABELS["website"]
+    return "Unknown"
  
-def generate_response_from_rag(query: str) -> Tuple[str, str]:  # ✅ Valid
+def _route(query: str, tenant: str):
+    with timed("route"):
+        return route(
+            query,
+            [f"{d['filename']} {d.get('description', '')}" for d in KM_documents_collection.find({"email": tenant}, {"filename": 1, "description": 1})],
+            [f"{u['url']} {u.get('description', '')}" for u in KM_URLs_collection.find({"email": tenant}, {"url": 1, "description": 1})],
+        )
+
+def _start_turn(query: str, tenant: str, session_id: str):
+    """
+    Resolves the conversation, then checks the precomputed FAQ table and the answer cache.
+    Follow-ups depend on history, so they skip both.
+    """
+    session = get_session(tenant, session_id)
+    follow_up = session.is_follow_up(query) if session is not None else False
+    if follow_up:
+        return session, None
+    cached = faq_table.lookup(tenant, query)
+    if cached is not None:
+        print("[FAQ] Precomputed answer")
+        return session, cached
+    cached = answer_cache.lookup(tenant, query)
+    if cached is not None:
+        print("[CACHE] Answer cache hit")
+    return session, cached
+
+def _finish_turn(query: str, tenant: str, session: Session, answer: Tuple[str, str], cache: bool = True) -> Tuple[str, str]:
+    if cache and not (session is not None and session.follow_up):
+        answer_cache.store(tenant, query, answer)
+    if session is not None:
+        session.add_turn(query, answer[0])
+    return answer
+
+def _followed_route(session: Session):
+    """A follow-up stays on the previous turn's source without consulting the router."""
+    if session is not None and session.follow_up and session.last_route:
+        return Route(session.last_route, 1.0)
+    return None
+
+def _remember_route(session: Session, decision):
+    if session is not None and decision.confidence >= ROUTER_MIN_CONFIDENCE:
+        session.last_route = decision.source
+    return decision
+
+def _record_result(query: str, tenant: str, session: Session):
+    """Marks, distribution and repeat queries are answered from the question index; follow-ups go through retrieval."""
+    if session is not None and session.follow_up:
+        return None
+    with timed("records"):
+        result = question_index.answer_query(tenant, query)
+    if result is not None:
+        print(f"[RECORDS] {result['intent']}: {len(result['items'])} item(s)")
+        _remember_route(session, Route("pdf", 1.0))
+    return result
+
+def _record_answer(query: str, tenant: str, session: Session) -> Optional[Tuple[str, str]]:
+    """The index decides the content; the LLM only formats it."""
+    result = _record_result(query, tenant, session)
+    if result is None:
+        return None
+    if not result["items"]:
+        return NO_INFO_ANSWER, SOURCE_LABELS["questions"]
+    if not question_index.QUESTION_LLM_FORMAT:
+        return question_index.render_html(result), SOURCE_LABELS["questions"]
+    with timed("generate"):
+        text = _model().generate_content([question_index.FORMAT_INSTRUCTION, question_index.render_facts(result), query]).text.strip()
+    return text, SOURCE_LABELS["questions"]
+
+def _agent_answer(query: str, tenant: str, session: Session) -> Tuple[str, str]:
+    tenant_token = current_tenant.set(tenant)
+    session_token = current_session.set(session)
     try:
-        result = agent_executor.invoke({"input": query})
-        output = result["output"]
- 
-        if "query_pdfs" in output:
-            return output, "PDF"
-        elif "query_websites" in output:
-            return output, "Website"
+        result = get_engine().agent_executor.invoke({"input": query})
+        return result["output"], _agent_source(result.get("intermediate_steps", []))
+    finally:
+        current_session.reset(session_token)
+        current_tenant.reset(tenant_token)
+
+def generate_response_from_rag(query: str, tenant: str, session_id: str = None) -> Tuple[str, str]:
+    """
+    Answers a query using only the documents and URLs owned by `tenant` (a college user's email).
+    With a `session_id`, earlier turns of that conversation are part of the prompt.
+    """
+    session, cached = _start_turn(query, tenant, session_id)
+    if cached is not None:
+        return _finish_turn(query, tenant, session, cached, cache=False)
+
+    token = current_tenant.set(tenant)
+    try:
+        answer = _record_answer(query, tenant, session)
+        if answer is not None:
+            return _finish_turn(query, tenant, session, answer)
+        decision = _followed_route(session) or _remember_route(session, _route(query, tenant))
+        if decision.confidence >= ROUTER_MIN_CONFIDENCE:
+            print(f"[ROUTER] {decision.source} (confidence {decision.confidence:.2f})")
+            answer = answer_routed(query, tenant, decision.source, session), SOURCE_LABELS[decision.source]
         else:
-            return output, "Unknown"
+            print(f"[ROUTER] Low confidence ({decision.confidence:.2f}), falling back to agent")
+            answer = _agent_answer(query, tenant, session)
+        return _finish_turn(query, tenant, session, answer)
     except Exception as e:
         print(f"[ERROR] generate_response_from_rag: {e}")
         return "<p>Something went wrong. Please try again.</p>", "Error"
-    
+    finally:
+        current_tenant.reset(token)
+
+def stream_response_from_rag(query: str, tenant: str, session_id: str = None) -> Iterator[Tuple[str, str]]:
+    """
+    Streaming variant of generate_response_from_rag. Yields ("token", html_fragment) events as the
+    model generates them, then a final ("done", source). Agent fallbacks arrive as a single fragment.
+    """
+    session, cached = _start_turn(query, tenant, session_id)
+    if cached is not None:
+        _finish_turn(query, tenant, session, cached, cache=False)
+        yield "token", cached[0]
+        yield "done", cached[1]
+        return
+
+    answer = _record_answer(query, tenant, session)
+    if answer is not None:
+        _finish_turn(query, tenant, session, answer)
+        yield "token", answer[0]
+        yield "done", answer[1]
+        return
+
+    decision = _followed_route(session) or _remember_route(session, _route(query, tenant))
+    if decision.confidence < ROUTER_MIN_CONFIDENCE:
+        answer, source = _finish_turn(query, tenant, session, _agent_answer(query, tenant, session))
+        yield "token", answer
+        yield "done", source
+        return
+
+    print(f"[ROUTER] {decision.source} (confidence {decision.confidence:.2f}), streaming")
+    source = SOURCE_LABELS[decision.source]
+    kind = None if decision.source == "both" else decision.source
+    model, parts = _prepare(query, kind, _load_routed(tenant, decision.source), tenant, session)
+    if not parts:
+        _finish_turn(query, tenant, session, (NO_INFO_ANSWER, source))
+        yield "token", NO_INFO_ANSWER
+        yield "done", source
+        return
+
+    fragments = []
+    with timed("generate"):
+        for chunk in model.generate_content(parts, stream=True):
+            try:
+                text = chunk.text
+            except ValueError:  # chunk without text parts, e.g. a safety-blocked candidate
+                continue
+            if text:
+                fragments.append(text)
+                yield "token", text
+    _finish_turn(query, tenant, session, ("".join(fragments).strip(), source))
+    yield "done", source
+
+
+# -- Async path (used by asgi_chatbot.py) --
+# Generation and Mongo routing lookups are awaited; index/cache work runs in worker threads.
+
+async def _aroute(query: str, tenant: str):
+    db = get_async_db()
+    with timed("route"):
+        pdfs = [f"{d['filename']} {d.get('description', '')}" async for d in db["KM_documents"].find({"email": tenant}, {"filename": 1, "description": 1})]
+        urls = [f"{u['url']} {u.get('description', '')}" async for u in db["KM_URLs"].find({"email": tenant}, {"url": 1, "description": 1})]
+        return route(query, pdfs, urls)
+
+async def _aprepare(query: str, tenant: str, source: str, session: Session = None):
+    kind = None if source == "both" else source
+    loaded = await asyncio.to_thread(_load_routed, tenant, source)
+    return await asyncio.to_thread(_prepare, query, kind, loaded, tenant, session)
+
+async def _arecord_answer(query: str, tenant: str, session: Session) -> Optional[Tuple[str, str]]:
+    """Async variant of _record_answer."""
+    result = await asyncio.to_thread(_record_result, query, tenant, session)
+    if result is None:
+        return None
+    if not result["items"]:
+        return NO_INFO_ANSWER, SOURCE_LABELS["questions"]
+    if not question_index.QUESTION_LLM_FORMAT:
+        return question_index.render_html(result), SOURCE_LABELS["questions"]
+    with timed("generate"):
+        response = await _model().generate_content_async([question_index.FORMAT_INSTRUCTION, question_index.render_facts(result), query])
+    return response.text.strip(), SOURCE_LABELS["questions"]
+
+async def _aagent_answer(query: str, tenant: str, session: Session) -> Tuple[str, str]:
+    tenant_token = current_tenant.set(tenant)
+    session_token = current_session.set(session)
+    try:
+        result = await get_engine().agent_executor.ainvoke({"input": query})
+        return result["output"], _agent_source(result.get("intermediate_steps", []))
+    finally:
+        current_session.reset(session_token)
+        current_tenant.reset(tenant_token)
+
+async def agenerate_response_from_rag(query: str, tenant: str, session_id: str = None) -> Tuple[str, str]:
+    """Async variant of generate_response_from_rag."""
+    session, cached = await asyncio.to_thread(_start_turn, query, tenant, session_id)
+    if cached is not None:
+        return await asyncio.to_thread(_finish_turn, query, tenant, session, cached, cache=False)
+
+    try:
+        answer = await _arecord_answer(query, tenant, session)
+        if answer is not None:
+            return await asyncio.to_thread(_finish_turn, query, tenant, session, answer)
+        decision = _followed_route(session) or _remember_route(session, await _aroute(query, tenant))
+        if decision.confidence >= ROUTER_MIN_CONFIDENCE:
+            print(f"[ROUTER] {decision.source} (confidence {decision.confidence:.2f})")
+            model, parts = await _aprepare(query, tenant, decision.source, session)
+            with timed("generate"):
+                text = (await model.generate_content_async(parts)).text.strip() if parts else NO_INFO_ANSWER
+            answer = text, SOURCE_LABELS[decision.source]
+        else:
+            print(f"[ROUTER] Low confidence ({decision.confidence:.2f}), falling back to agent")
+            answer = await _aagent_answer(query, tenant, session)
+        return await asyncio.to_thread(_finish_turn, query, tenant, session, answer)
+    except Exception as e:
+        print(f"[ERROR] agenerate_response_from_rag: {e}")
+        return "<p>Something went wrong. Please try again.</p>", "Error"
+
+async def astream_response_from_rag(query: str, tenant: str, session_id: str = None) -> AsyncIterator[Tuple[str, str]]:
+    """Async variant of stream_response_from_rag."""
+    session, cached = await asyncio.to_thread(_start_turn, query, tenant, session_id)
+    if cached is not None:
+        await asyncio.to_thread(_finish_turn, query, tenant, session, cached, cache=False)
+        yield "token", cached[0]
+        yield "done", cached[1]
+        return
+
+    answer = await _arecord_answer(query, tenant, session)
+    if answer is not None:
+        await asyncio.to_thread(_finish_turn, query, tenant, session, answer)
+        yield "token", answer[0]
+        yield "done", answer[1]
+        return
+
+    decision = _followed_route(session) or _remember_route(session, await _aroute(query, tenant))
+    if decision.confidence < ROUTER_MIN_CONFIDENCE:
+        answer, source = await asyncio.to_thread(_finish_turn, query, tenant, session, await _aagent_answer(query, tenant, session))
+        yield "token", answer
+        yield "done", source
+        return
+
+    source = SOURCE_LABELS[decision.source]
+    model, parts = await _aprepare(query, tenant, decision.source, session)
+    if not parts:
+        await asyncio.to_thread(_finish_turn, query, tenant, session, (NO_INFO_ANSWER, source))
+        yield "token", NO_INFO_ANSWER
+        yield "done", source
+        return
+
+    fragments = []
+    with timed("generate"):
+        async for chunk in await model.generate_content_async(parts, stream=True):
+            try:
+                text = chunk.text
+            except ValueError:
+                continue
+            if text:
+                fragments.append(text)
+                yield "token", text
+    await asyncio.to_thread(_finish_turn, query, tenant, session, ("".join(fragments).strip(), source))
+    yield "done", source
+
+
+# -- Batch answering (FAQ precomputation) --
+FAQ_BATCH_MAX = int(os.getenv("FAQ_BATCH_MAX", "500"))
+FAQ_GENERATE_CONCURRENCY = int(os.getenv("FAQ_GENERATE_CONCURRENCY", "4"))
+
+def _bounded_map(fn, items: list, limit: int) -> list:
+    """io_pool().map with at most `limit` calls in flight, so a large batch leaves room for live chat traffic."""
+    results = [None] * len(items)
+    queue = iter(enumerate(items))
+    running = {}
+
+    def submit_next():
+        for i, item in queue:
+            running[io_pool().submit(fn, item)] = i
+            return
+
+    for _ in range(max(1, limit)):
+        submit_next()
+    while running:
+        done, _ = wait(running, return_when=FIRST_COMPLETED)
+        for future in done:
+            results[running.pop(future)] = future.result()
+            submit_next()
+    return results
+
+def _hits_source(hits: list) -> str:
+    kinds = {h.get("kind") for h in hits}
+    if {"pdf", "website"} <= kinds:
+        return SOURCE_LABELS["both"]
+    return SOURCE_LABELS.get(next(iter(kinds), None) or "both")
+
+def answer_batch(questions: List[str], tenant: str) -> List[Optional[Tuple[str, str]]]:
+    """
+    Answers many questions for one tenant: one retrieval pass over the index for all of them, each
+    distinct chunk rendered once, and at most FAQ_GENERATE_CONCURRENCY generation calls at a time.
+    Returns (answer, source) per question in order, or None where generation failed.
+    """
+    keys = [answer_cache.normalize(q) for q in questions]
+    unique = list(dict.fromkeys(keys))
+    first = {}
+    for question, key in zip(questions, keys):
+        first.setdefault(key, question)
+
+    loaded = _load_routed(tenant, "both")
+    files = [d["file"] for d in loaded.values() if d.get("file")]
+    model = context_cache.cached_model(tenant, None, SYSTEM_INSTRUCTION, files)
+    with timed("retrieve"):
+        hits_per_question = get_index(tenant).search_many([first[key] for key in unique])
+
+    # Questions on the same topic retrieve mostly the same chunks
+    rendered = {}
+    for hits in hits_per_question:
+        for h in hits:
+            rendered.setdefault((h["doc_id"], h["text"]), format_context([h]))
+
+    def generate(i):
+        hits = hits_per_question[i]
+        if not hits and not files:
+            return NO_INFO_ANSWER, SOURCE_LABELS["both"]
+        parts = [] if model else [*files]
+        if hits:
+            parts.append("Context:\n" + "\n\n".join(rendered[(h["doc_id"], h["text"])] for h in hits))
+        try:
+            with timed("generate"):
+                return (model or _model()).generate_content([*parts, first[unique[i]]]).text.strip(), _hits_source(hits)
+        except Exception as e:
+            print(f"[ERROR] answer_batch: {first[unique[i]]}: {e}")
+            return None
+
+    answers = dict(zip(unique, _bounded_map(generate, list(range(len(unique))), FAQ_GENERATE_CONCURRENCY)))
+    return [answers[key] for key in keys]
+
+def answer_faq_batch(batch_id, progress=lambda percent: None) -> None:
+    """Job queue handler for /api/chatbot/batch: answers the stored questions and fills the tenant's FAQ table."""
+    batch = KM_FAQ_batches_collection.find_one({"_id": batch_id})
+    if not batch:
+        return
+    questions = batch["questions"]
+    answers = answer_batch(questions, batch["email"])
+    progress(90)
+    stored = faq_table.store(batch["email"], [(q, *a) for q, a in zip(questions, answers) if a]) if batch.get("store", True) else 0
+    KM_FAQ_batches_collection.update_one({"_id": batch_id}, {"$set": {
+        "answers": [
+            {"question": q, "reply": a[0], "source": a[1]} if a else {"question": q, "error": "Generation failed"}
+            for q, a in zip(questions, answers)
+        ],
+        "stored": stored,
+    }})
 
 
     #things to try 
@@ -253,4 +657,4 @@ def generate_response_from_rag(query: str) -> Tuple[str, str]:  # ✅ Valid
 #Give me all questions related to "Agents" across the pdfs
 #List the repeated questions from object oriented programming
 #Summarize the key topics covered in the last three OOP question papers.
-#Give me the question distribution by marks for oops pdf
\ No newline at end of file
+#Give me the question distribution by marks for oops pdf
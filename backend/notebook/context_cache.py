@@ -0,0 +1,133 @@
+import os
+import datetime
+import hashlib
+import threading
+from typing import Dict, List, Optional
+from database_connection import KM_context_caches_collection
+from notebook.lru_cache import LRUCache
+from notebook.executors import timed
+from notebook import metrics
+
+# -- Config --
+# Provider-side caching of each tenant's system prompt plus whole-file documents, so queries send only new parts
+CONTEXT_CACHE_ENABLED = os.getenv("CONTEXT_CACHE_ENABLED", "1") == "1"
+# Context caching needs an explicitly versioned model
+CONTEXT_CACHE_MODEL = os.getenv("CONTEXT_CACHE_MODEL", "models/gemini-1.5-flash-001")
+CONTEXT_CACHE_TTL = datetime.timedelta(seconds=int(os.getenv("CONTEXT_CACHE_TTL", "3600")))
+# A cache in use gets its TTL extended once less than this remains
+CONTEXT_CACHE_REFRESH_MARGIN = datetime.timedelta(seconds=int(os.getenv("CONTEXT_CACHE_REFRESH_MARGIN", "600")))
+# A corpus the provider refused to cache (e.g. below its minimum size) is sent inline for this long before retrying
+CONTEXT_CACHE_RETRY_AFTER = float(os.getenv("CONTEXT_CACHE_RETRY_AFTER", "900"))
+CONTEXT_CACHE_MAX_TENANTS = int(os.getenv("CONTEXT_CACHE_MAX_TENANTS", "256"))
+
+# Swappable like gemini_registry's, so the manager can run against a local fake of `genai`
+_client = None
+
+_handles = LRUCache(CONTEXT_CACHE_MAX_TENANTS)  # (tenant, kind) -> (record, CachedContent)
+_refused = LRUCache(CONTEXT_CACHE_MAX_TENANTS, ttl=CONTEXT_CACHE_RETRY_AFTER)  # fingerprint -> True
+
+_locks: Dict[str, threading.Lock] = {}
+_locks_guard = threading.Lock()
+
+
+def set_client(client) -> None:
+    """Replaces the `genai` module used for caching (e.g. with a local fake)."""
+    global _client
+    _client = client
+
+
+def _get_client():
+    global _client
+    if _client is None:
+        import google.generativeai as genai
+        _client = genai
+    return _client
+
+
+def _lock_for(key: str) -> threading.Lock:
+    with _locks_guard:
+        return _locks.setdefault(key, threading.Lock())
+
+
+def _utcnow() -> datetime.datetime:
+    return datetime.datetime.utcnow()
+
+
+def fingerprint(system_instruction: str, files: List[dict]) -> str:
+    """Identifies a cacheable corpus. Uploads are re-done on content change, so file URIs track the content."""
+    digest = hashlib.sha256(f"{CONTEXT_CACHE_MODEL}\n{system_instruction}".encode("utf-8"))
+    for uri in sorted(f["file_data"]["file_uri"] for f in files):
+        digest.update(f"\n{uri}".encode("utf-8"))
+    return digest.hexdigest()
+
+
+def _usable(record: dict, fp: str, margin: datetime.timedelta) -> bool:
+    return record is not None and record.get("fingerprint") == fp and record["expires_at"] - margin > _utcnow()
+
+
+def _delete(name: str) -> None:
+    try:
+        _get_client().caching.CachedContent.get(name).delete()
+    except Exception as e:
+        print(f"[CONTEXT CACHE] Could not delete {name}: {e}")
+
+
+def _ensure(tenant: str, kind: str, fp: str, system_instruction: str, files: List[dict]):
+    """Reuses, refreshes or (re)creates the tenant's cache; the stored record lets every worker share one cache."""
+    key = (tenant, kind)
+    with _lock_for(f"{tenant}:{kind}"):
+        # Another thread or worker may have created or refreshed it while we waited
+        record = KM_context_caches_collection.find_one({"email": tenant, "kind": kind})
+        local = _handles.get(key)
+        caching = _get_client().caching
+
+        if _usable(record, fp, datetime.timedelta(0)):
+            cache = local[1] if local and local[0]["name"] == record["name"] else caching.CachedContent.get(record["name"])
+            if not _usable(record, fp, CONTEXT_CACHE_REFRESH_MARGIN):
+                with timed("context_cache_refresh"):
+                    cache.update(ttl=CONTEXT_CACHE_TTL)
+                record["expires_at"] = _utcnow() + CONTEXT_CACHE_TTL
+                KM_context_caches_collection.update_one({"_id": record["_id"]}, {"$set": {"expires_at": record["expires_at"]}})
+                print(f"[CONTEXT CACHE] Extended {record['name']} for {tenant} ({kind})")
+        else:
+            # The corpus changed (or the cache expired): the old one is of no further use
+            if record is not None:
+                _delete(record["name"])
+            with timed("context_cache_create"):
+                cache = caching.CachedContent.create(
+                    model=CONTEXT_CACHE_MODEL,
+                    display_name=f"{tenant}:{kind}"[:128],
+                    system_instruction=system_instruction,
+                    contents=[{"role": "user", "parts": files}],
+                    ttl=CONTEXT_CACHE_TTL,
+                )
+            record = {"email": tenant, "kind": kind, "name": cache.name, "fingerprint": fp, "expires_at": _utcnow() + CONTEXT_CACHE_TTL}
+            KM_context_caches_collection.update_one({"email": tenant, "kind": kind}, {"$set": record}, upsert=True)
+            print(f"[CONTEXT CACHE] Created {cache.name} for {tenant} ({kind}, {len(files)} file(s))")
+
+        _handles.set(key, (record, cache))
+        return cache
+
+
+def cached_model(tenant: str, kind: Optional[str], system_instruction: str, files: List[dict]):
+    """
+    A GenerativeModel bound to the tenant's cached system instruction and whole-file documents, or None
+    when caching is off, there are no files, or the provider refused the cache; callers then send it all inline.
+    """
+    if not CONTEXT_CACHE_ENABLED or not files:
+        return None
+    fp = fingerprint(system_instruction, files)
+    if _refused.get(fp):
+        return None
+
+    kind = kind or "both"
+    handle = _handles.get((tenant, kind))
+    hit = handle is not None and _usable(handle[0], fp, CONTEXT_CACHE_REFRESH_MARGIN)
+    metrics.cache_result("context_cache", hit, tenant)
+    try:
+        cache = handle[1] if hit else _ensure(tenant, kind, fp, system_instruction, files)
+        return _get_client().GenerativeModel.from_cached_content(cached_content=cache)
+    except Exception as e:
+        print(f"[CONTEXT CACHE] Falling back to inline context for {tenant} ({kind}): {e}")
+        _refused.set(fp, True)
+        return None
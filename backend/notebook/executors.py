@@ -0,0 +1,77 @@
+import os
+import time
+import threading
+import multiprocessing
+from contextlib import contextmanager
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from notebook import metrics
+
+# -- Config --
+# CPU-bound parsing (PyMuPDF, BeautifulSoup) goes to processes; network calls (Gemini, HTTP, Mongo) to threads
+CPU_COUNT = os.cpu_count() or 1
+PARSE_WORKERS = int(os.getenv("PARSE_WORKERS", str(CPU_COUNT)))
+IO_WORKERS = int(os.getenv("IO_WORKERS", str(min(32, CPU_COUNT * 4))))
+
+_lock = threading.Lock()
+_parse_pool = None
+_io_pool = None
+
+
+def start_executors() -> None:
+    """Creates both pools once at startup (the first use would otherwise pay for spawning workers)."""
+    parse_pool()
+    io_pool()
+
+
+def parse_pool() -> ProcessPoolExecutor:
+    global _parse_pool
+    with _lock:
+        if _parse_pool is None:
+            # spawn, not fork: the parent has Mongo clients and worker threads
+            _parse_pool = ProcessPoolExecutor(max_workers=PARSE_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+        return _parse_pool
+
+
+def io_pool() -> ThreadPoolExecutor:
+    global _io_pool
+    with _lock:
+        if _io_pool is None:
+            _io_pool = ThreadPoolExecutor(max_workers=IO_WORKERS, thread_name_prefix="io")
+        return _io_pool
+
+
+def shutdown_executors() -> None:
+    global _parse_pool, _io_pool
+    with _lock:
+        for pool in (_parse_pool, _io_pool):
+            if pool is not None:
+                pool.shutdown(wait=False, cancel_futures=True)
+        _parse_pool = _io_pool = None
+
+
+# -- Per-stage timings --
+_timings = {}
+_timings_lock = threading.Lock()
+
+
+@contextmanager
+def timed(stage: str, tenant: str = None):
+    """Records how long the wrapped block took under `stage`, also as a per-tenant histogram for /metrics."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        with _timings_lock:
+            count, total, worst = _timings.get(stage, (0, 0.0, 0.0))
+            _timings[stage] = (count + 1, total + elapsed, max(worst, elapsed))
+        metrics.observe("stage_seconds", elapsed, tenant=tenant, stage=stage)
+
+
+def stage_timings() -> dict:
+    """Per-stage call count, total, mean and max seconds since startup."""
+    with _timings_lock:
+        return {
+            stage: {"count": count, "total_s": total, "mean_s": total / count, "max_s": worst}
+            for stage, (count, total, worst) in _timings.items()
+        }
@@ -0,0 +1,56 @@
+import os
+import datetime
+from typing import Dict, Iterable, Optional, Tuple
+from pymongo import UpdateOne
+from database_connection import KM_FAQs_collection
+from notebook.lru_cache import LRUCache
+from notebook.answer_cache import normalize
+from notebook import metrics
+
+# -- Config --
+# Each process keeps a tenant's FAQ table in memory; the TTL bounds how long another process's writes go unseen
+FAQ_TABLE_TTL = float(os.getenv("FAQ_TABLE_TTL", "300"))
+FAQ_TABLE_MAX_TENANTS = int(os.getenv("FAQ_TABLE_MAX_TENANTS", "128"))
+
+_tables = LRUCache(FAQ_TABLE_MAX_TENANTS, ttl=FAQ_TABLE_TTL)
+
+
+def _load(tenant: str) -> Dict[str, Tuple[str, str]]:
+    return {
+        f["key"]: (f["answer"], f["source"])
+        for f in KM_FAQs_collection.find({"email": tenant}, {"key": 1, "answer": 1, "source": 1})
+    }
+
+
+def lookup(tenant: str, query: str) -> Optional[Tuple[str, str]]:
+    """Returns the precomputed (answer, source) for a question matching `query` once normalized, or None."""
+    answer = _tables.get_or_create(tenant, lambda: _load(tenant)).get(normalize(query))
+    metrics.cache_result("faq", answer is not None, tenant)
+    return answer
+
+
+def store(tenant: str, answers: Iterable[Tuple[str, str, str]]) -> int:
+    """Upserts (question, answer, source) rows into the tenant's FAQ table; returns how many were written."""
+    now = datetime.datetime.utcnow()
+    ops = [
+        UpdateOne(
+            {"email": tenant, "key": normalize(question)},
+            {"$set": {"question": question, "answer": answer, "source": source, "updated_at": now}},
+            upsert=True
+        )
+        for question, answer, source in answers
+    ]
+    if ops:
+        KM_FAQs_collection.bulk_write(ops, ordered=False)
+    _tables.pop(tenant)
+    return len(ops)
+
+
+def list_faqs(tenant: str) -> list:
+    return list(KM_FAQs_collection.find({"email": tenant}, {"_id": 0, "question": 1, "answer": 1, "source": 1}))
+
+
+def clear(tenant: str) -> int:
+    deleted = KM_FAQs_collection.delete_many({"email": tenant}).deleted_count
+    _tables.pop(tenant)
+    return deleted
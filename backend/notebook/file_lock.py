@@ -0,0 +1,18 @@
+import os
+import fcntl
+from contextlib import contextmanager
+
+
+@contextmanager
+def file_lock(path):
+    """
+    Holds an exclusive flock on `path` (created if missing) for the duration of the block, so a
+    load-modify-write of shared files is serialized across processes, not just threads.
+    """
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "a") as handle:
+        fcntl.flock(handle, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(handle, fcntl.LOCK_UN)
@@ -0,0 +1,108 @@
+import datetime
+import hashlib
+import threading
+from io import BytesIO
+from typing import Dict
+from notebook.executors import timed
+from notebook import metrics
+
+# -- Config --
+# Gemini keeps uploaded files for 48 hours; re-upload a little before that
+GEMINI_FILE_TTL = datetime.timedelta(hours=48)
+EXPIRY_MARGIN = datetime.timedelta(hours=1)
+
+# The client is swappable so the registry can run against a local stub of `genai`; the real one loads on first upload
+_client = None
+
+_locks: Dict[str, threading.Lock] = {}
+_locks_guard = threading.Lock()
+
+
+def set_client(client) -> None:
+    """Replaces the `genai` module used for uploads (e.g. with a local stub)."""
+    global _client
+    _client = client
+
+
+def _get_client():
+    global _client
+    if _client is None:
+        import google.generativeai as genai
+        _client = genai
+    return _client
+
+
+def content_sha256(text: str = None, path=None) -> str:
+    """SHA-256 of a text, or of a file's bytes read in chunks."""
+    digest = hashlib.sha256()
+    if path is None:
+        digest.update(text.encode("utf-8"))
+    else:
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1024 * 1024), b""):
+                digest.update(block)
+    return digest.hexdigest()
+
+
+def _lock_for(key: str) -> threading.Lock:
+    with _locks_guard:
+        return _locks.setdefault(key, threading.Lock())
+
+
+def _utcnow() -> datetime.datetime:
+    return datetime.datetime.utcnow()
+
+
+def is_valid(doc: dict, sha256: str) -> bool:
+    """True if the doc's stored remote file matches this content and has not (nearly) expired."""
+    if not doc.get("gemini_file_uri") or doc.get("gemini_content_sha256") != sha256:
+        return False
+    expires_at = doc.get("gemini_expires_at")
+    return expires_at is not None and expires_at - EXPIRY_MARGIN > _utcnow()
+
+
+def as_part(doc: dict) -> dict:
+    """Builds a generate_content part from a stored handle without a round-trip to Gemini."""
+    return {"file_data": {"file_uri": doc["gemini_file_uri"], "mime_type": doc.get("gemini_mime_type", "text/plain")}}
+
+
+def ensure_uploaded(collection, doc: dict, text: str = None, mime_type: str = "text/plain", path=None) -> dict:
+    """
+    Returns a generate_content part for the doc's text (given as a string, or as a file `path` that is
+    uploaded without loading it), reusing the stored remote file while it is still valid. Uploads (and
+    records the new handle on the doc) only on content change or expiry.
+    """
+    sha256 = content_sha256(text, path)
+    if is_valid(doc, sha256):
+        metrics.cache_result("gemini_file", True)
+        return as_part(doc)
+
+    with _lock_for(str(doc["_id"])):
+        # Another thread may have uploaded while we waited
+        fresh = collection.find_one({"_id": doc["_id"]}) or doc
+        if is_valid(fresh, sha256):
+            metrics.cache_result("gemini_file", True)
+            return as_part(fresh)
+        metrics.cache_result("gemini_file", False)
+
+        source = str(path) if path is not None else BytesIO(text.encode("utf-8"))
+        with timed("gemini_upload"):
+            file = _get_client().upload_file(source, mime_type=mime_type)
+        expires_at = getattr(file, "expiration_time", None)
+        if not isinstance(expires_at, datetime.datetime):
+            expires_at = _utcnow() + GEMINI_FILE_TTL
+        elif expires_at.tzinfo is not None:
+            # Mongo hands back naive UTC datetimes, so store it the same way
+            expires_at = expires_at.astimezone(datetime.timezone.utc).replace(tzinfo=None)
+
+        handle = {
+            "gemini_file_id": file.name,
+            "gemini_file_uri": file.uri,
+            "gemini_mime_type": mime_type,
+            "gemini_content_sha256": sha256,
+            "gemini_expires_at": expires_at,
+        }
+        collection.update_one({"_id": doc["_id"]}, {"$set": handle})
+        print(f"[UPLOAD] Uploaded {doc.get('filename') or doc.get('url')} as {file.name}")
+        return as_part({**doc, **handle})
+
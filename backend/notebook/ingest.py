@@ -0,0 +1,119 @@
+import os
+import time
+import threading
+from database_connection import KM_documents_collection, KM_URLs_collection
+from notebook import text_cache, answer_cache, question_index
+from notebook.vector_index import get_index
+from notebook.web_crawler import crawl
+
+# How often stored website snapshots are re-validated against the live pages
+CRAWL_INTERVAL_SECONDS = int(os.getenv("CRAWL_INTERVAL_SECONDS", "3600"))
+
+
+def _no_progress(percent: int) -> None:
+    pass
+
+
+def ingest_pdf(doc_id, progress=_no_progress) -> None:
+    """
+    Extracts (via the text cache), chunks and indexes a PDF. Indexed documents are answered from
+    retrieved chunks, so nothing is uploaded to Gemini; load_pdfs uploads only unindexed ones.
+    """
+    doc = KM_documents_collection.find_one({"_id": doc_id})
+    if not doc:
+        return
+    # Page text streams into the cache entry, then back out in blocks to the chunker
+    entry = text_cache.ensure_pdf_text_cached(doc["path"], doc.get("sha256"))
+    if not text_cache.has_text(entry):
+        raise ValueError("No text could be extracted from the PDF")
+    progress(40)
+    get_index(doc.get("email")).add_document(str(doc_id), text_cache.iter_cached_text(entry), kind="pdf", source=doc["filename"])
+    try:
+        question_index.index_document(doc, entry.read_text(encoding="utf-8"))
+    except Exception as e:
+        print(f"[ERROR] Parsing questions from {doc['filename']}: {e}")
+    answer_cache.invalidate(doc.get("email"))
+
+
+# Remote file handle fields (see gemini_registry); valid for any record with the same content
+GEMINI_HANDLE_FIELDS = ("gemini_file_id", "gemini_file_uri", "gemini_mime_type", "gemini_content_sha256", "gemini_expires_at")
+
+
+def ingest_duplicate(doc_id) -> bool:
+    """
+    Ingests a PDF whose bytes were already processed for another record (of any tenant) by copying that
+    record's chunks and vectors, question records and Gemini file handle: no extraction, embedding or upload.
+    Returns False when no fully indexed record has the same content.
+    """
+    doc = KM_documents_collection.find_one({"_id": doc_id})
+    if not doc or not doc.get("sha256"):
+        return False
+    for twin in KM_documents_collection.find({"sha256": doc["sha256"], "_id": {"$ne": doc_id}}):
+        twin_index = get_index(twin.get("email"))
+        if not twin_index.has_document(str(twin["_id"])):
+            continue
+        get_index(doc.get("email")).copy_document(twin_index, str(twin["_id"]), str(doc_id), kind="pdf", source=doc["filename"])
+        if twin.get("questions_version") is not None:
+            question_index.copy_document(twin, doc)
+        handle = {field: twin[field] for field in GEMINI_HANDLE_FIELDS if field in twin}
+        if handle:
+            KM_documents_collection.update_one({"_id": doc_id}, {"$set": handle})
+        answer_cache.invalidate(doc.get("email"))
+        print(f"[INGEST] {doc['filename']}: reused the artifacts of identical document {twin['_id']}")
+        return True
+    return False
+
+
+def ingest_url(doc_id, progress=_no_progress) -> bool:
+    """
+    Crawls a website with a conditional GET and stores its paragraph-text snapshot. Only when the
+    text changed is it re-chunked and re-indexed. Returns True if the snapshot changed.
+    """
+    doc = KM_URLs_collection.find_one({"_id": doc_id})
+    if not doc:
+        return False
+    update = crawl(doc)
+    KM_URLs_collection.update_one({"_id": doc_id}, {"$set": update})
+    progress(40)
+    if "text" not in update:
+        return False
+
+    doc.update(update)
+    text = doc["text"]
+    if text.strip():
+        get_index(doc.get("email")).add_document(str(doc_id), text, kind="website", source=doc["url"])
+    else:
+        remove_from_index(doc.get("email"), doc_id)
+    answer_cache.invalidate(doc.get("email"))
+    return True
+
+
+def refresh_websites() -> int:
+    """Re-validates every stored website snapshot. Returns how many pages changed."""
+    changed = 0
+    for doc in KM_URLs_collection.find({}, {"_id": 1}):
+        try:
+            changed += ingest_url(doc["_id"])
+        except Exception as e:
+            print(f"[ERROR] Refreshing website {doc['_id']}: {e}")
+    return changed
+
+
+def start_website_refresher(interval: int = CRAWL_INTERVAL_SECONDS) -> threading.Thread:
+    """Starts a daemon thread that refreshes website snapshots every `interval` seconds."""
+    def loop():
+        while True:
+            time.sleep(interval)
+            started = time.monotonic()
+            changed = refresh_websites()
+            print(f"[CRAWL] Refreshed websites: {changed} changed in {time.monotonic() - started:.1f}s")
+
+    thread = threading.Thread(target=loop, name="website-refresher", daemon=True)
+    thread.start()
+    return thread
+
+
+def remove_from_index(tenant: str, doc_id) -> None:
+    get_index(tenant).remove_document(str(doc_id))
+    question_index.remove_document(tenant, doc_id)
+
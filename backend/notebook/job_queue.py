@@ -0,0 +1,156 @@
+import os
+import socket
+import datetime
+import threading
+import traceback
+from pymongo import ReturnDocument
+from database_connection import KM_documents_collection, KM_URLs_collection, KM_jobs_collection, KM_FAQ_batches_collection
+from notebook.ingest import ingest_pdf, ingest_url
+from notebook import question_index
+from notebook.college_ragv1 import answer_faq_batch
+
+# -- Config --
+INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", "2"))
+INGEST_MAX_ATTEMPTS = int(os.getenv("INGEST_MAX_ATTEMPTS", "3"))
+INGEST_RETRY_BACKOFF = int(os.getenv("INGEST_RETRY_BACKOFF", "30"))  # seconds, doubled per attempt
+INGEST_LEASE_SECONDS = int(os.getenv("INGEST_LEASE_SECONDS", "900"))  # running jobs older than this are reclaimed
+INGEST_POLL_SECONDS = float(os.getenv("INGEST_POLL_SECONDS", "2"))
+
+# Document statuses shown in the /pdfs and /urls listings
+PENDING, INDEXED, FAILED = "pending", "indexed", "failed"
+
+HANDLERS = {
+    "pdf": (ingest_pdf, KM_documents_collection),
+    "url": (ingest_url, KM_URLs_collection),
+    # Answering a batch takes a generation call per question, longer than a request may run
+    "faq_batch": (answer_faq_batch, KM_FAQ_batches_collection),
+    # Maintenance of an already indexed PDF: its status is left alone
+    "questions": (question_index.reindex, None),
+}
+# Called with the doc_id when a job of that kind has used up its attempts
+ON_GIVE_UP = {
+    "questions": question_index.release_stale,
+}
+
+_wakeup = threading.Event()
+_workers = []
+
+
+def _utcnow():
+    return datetime.datetime.utcnow()
+
+
+def enqueue(kind: str, doc_id) -> None:
+    """Queues ingestion of a PDF ("pdf") or website ("url"), or an FAQ batch ("faq_batch"), and marks the record pending."""
+    _, collection = HANDLERS[kind]
+    if collection is not None:
+        collection.update_one({"_id": doc_id}, {"$set": {"status": PENDING, "progress": 0, "error": None}})
+    KM_jobs_collection.insert_one({
+        "kind": kind,
+        "doc_id": doc_id,
+        "status": PENDING,
+        "attempts": 0,
+        "run_after": _utcnow(),
+        "created_at": _utcnow(),
+    })
+    _wakeup.set()
+
+
+def enqueue_question_backfill() -> int:
+    """Queues re-parsing of every PDF whose question records predate the current parser. Returns how many."""
+    queued = 0
+    doc = question_index.claim_stale()
+    while doc is not None:
+        enqueue("questions", doc["_id"])
+        queued += 1
+        doc = question_index.claim_stale()
+    if queued:
+        print(f"[QUESTIONS] Queued {queued} document(s) for question re-parsing")
+    return queued
+
+
+def _give_up(job, error: str) -> None:
+    """Marks a job that has used up its attempts, and its record, as failed."""
+    _, collection = HANDLERS[job["kind"]]
+    KM_jobs_collection.update_one({"_id": job["_id"]}, {"$set": {"status": FAILED, "error": error, "finished_at": _utcnow()}})
+    if collection is not None:
+        collection.update_one({"_id": job["doc_id"]}, {"$set": {"status": FAILED, "error": error}})
+    if job["kind"] in ON_GIVE_UP:
+        ON_GIVE_UP[job["kind"]](job["doc_id"])
+
+
+def _claim(worker: str):
+    """
+    Atomically takes the oldest due job, including ones whose worker died mid-run with attempts left;
+    those that died on their last attempt are marked failed instead.
+    """
+    now = _utcnow()
+    expired = {"status": "running", "started_at": {"$lte": now - datetime.timedelta(seconds=INGEST_LEASE_SECONDS)}}
+    # A job whose worker died on its last attempt (e.g. the PDF crashes the process) is not run again
+    exhausted = {**expired, "attempts": {"$gte": INGEST_MAX_ATTEMPTS}}
+    job = KM_jobs_collection.find_one_and_update(exhausted, {"$set": {"status": FAILED}})
+    while job is not None:
+        print(f"[ERROR] Ingest job {job['_id']} ({job['kind']} {job['doc_id']}) timed out on its last attempt")
+        _give_up(job, "Processing did not finish")
+        job = KM_jobs_collection.find_one_and_update(exhausted, {"$set": {"status": FAILED}})
+    return KM_jobs_collection.find_one_and_update(
+        {"$or": [
+            {"status": PENDING, "run_after": {"$lte": now}},
+            {**expired, "attempts": {"$lt": INGEST_MAX_ATTEMPTS}},
+        ]},
+        {"$set": {"status": "running", "started_at": now, "worker": worker}, "$inc": {"attempts": 1}},
+        sort=[("created_at", 1)],
+        return_document=ReturnDocument.AFTER,
+    )
+
+
+def run_job(job) -> None:
+    handler, collection = HANDLERS[job["kind"]]
+    doc_id = job["doc_id"]
+
+    def progress(percent):
+        if collection is not None:
+            collection.update_one({"_id": doc_id}, {"$set": {"progress": percent}})
+
+    try:
+        handler(doc_id, progress=progress)
+    except Exception as e:
+        print(f"[ERROR] Ingest job {job['_id']} ({job['kind']} {doc_id}), attempt {job['attempts']}: {e}")
+        traceback.print_exc()
+        if job["attempts"] < INGEST_MAX_ATTEMPTS:
+            retry_at = _utcnow() + datetime.timedelta(seconds=INGEST_RETRY_BACKOFF * 2 ** (job["attempts"] - 1))
+            KM_jobs_collection.update_one({"_id": job["_id"]}, {"$set": {"status": PENDING, "run_after": retry_at, "error": str(e)}})
+            if collection is not None:
+                collection.update_one({"_id": doc_id}, {"$set": {"error": str(e)}})
+        else:
+            _give_up(job, str(e))
+        return
+
+    KM_jobs_collection.update_one({"_id": job["_id"]}, {"$set": {"status": "done", "finished_at": _utcnow()}})
+    if collection is not None:
+        collection.update_one({"_id": doc_id}, {"$set": {"status": INDEXED, "progress": 100, "error": None}})
+
+
+def _worker_loop(worker: str) -> None:
+    while True:
+        try:
+            job = _claim(worker)
+        except Exception as e:
+            print(f"[ERROR] Claiming ingest job: {e}")
+            job = None
+        if job is None:
+            _wakeup.wait(INGEST_POLL_SECONDS)
+            _wakeup.clear()
+            continue
+        run_job(job)
+
+
+def start_workers(count: int = INGEST_WORKERS) -> None:
+    """Starts the ingestion worker threads once per process."""
+    if _workers:
+        return
+    for i in range(count):
+        name = f"{socket.gethostname()}:{os.getpid()}:ingest-{i}"
+        thread = threading.Thread(target=_worker_loop, args=(name,), name=f"ingest-{i}", daemon=True)
+        thread.start()
+        _workers.append(thread)
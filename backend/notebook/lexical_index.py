@@ -0,0 +1,199 @@
+import os
+import re
+import json
+import math
+import threading
+from collections import Counter
+from pathlib import Path
+from typing import Dict, List
+import numpy as np
+from notebook.file_lock import file_lock
+
+# -- Config --
+BM25_K1 = float(os.getenv("BM25_K1", "1.2"))
+BM25_B = float(os.getenv("BM25_B", "0.75"))
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+
+def tokenize(text: str) -> List[str]:
+    return _TOKEN_RE.findall(text.lower())
+
+
+class Segment:
+    """
+    One document's postings in CSR form: a sorted term array, offsets into flat chunk-number and
+    term-frequency arrays, and each chunk's length in tokens.
+    """
+
+    def __init__(self, terms: np.ndarray, offsets: np.ndarray, chunks: np.ndarray, tfs: np.ndarray, lengths: np.ndarray):
+        self.terms, self.offsets, self.chunks, self.tfs, self.lengths = terms, offsets, chunks, tfs, lengths
+
+    @classmethod
+    def build(cls, texts: List[str]) -> "Segment":
+        postings: Dict[str, List[tuple]] = {}
+        lengths = []
+        for n, text in enumerate(texts):
+            tokens = tokenize(text)
+            lengths.append(len(tokens))
+            for term, tf in Counter(tokens).items():
+                postings.setdefault(term, []).append((n, tf))
+        terms = sorted(postings)
+        offsets = np.zeros(len(terms) + 1, dtype=np.int64)
+        for i, term in enumerate(terms):
+            offsets[i + 1] = offsets[i] + len(postings[term])
+        flat = [p for term in terms for p in postings[term]]
+        return cls(
+            np.array(terms, dtype=str),
+            offsets,
+            np.array([n for n, _ in flat], dtype=np.int32),
+            np.array([min(tf, 65535) for _, tf in flat], dtype=np.uint16),
+            np.array(lengths, dtype=np.int32),
+        )
+
+    def postings(self, term: str):
+        """(chunk numbers, term frequencies) for a term, or None."""
+        i = int(np.searchsorted(self.terms, term))
+        if i >= len(self.terms) or self.terms[i] != term:
+            return None
+        start, end = self.offsets[i], self.offsets[i + 1]
+        return self.chunks[start:end], self.tfs[start:end]
+
+    def save(self, path: Path) -> None:
+        tmp = path.with_name(f"{path.stem}.{os.getpid()}.tmp.npz")
+        np.savez(tmp, terms=self.terms, offsets=self.offsets, chunks=self.chunks, tfs=self.tfs, lengths=self.lengths)
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path: Path) -> "Segment":
+        with np.load(path, allow_pickle=False) as data:
+            return cls(data["terms"], data["offsets"], data["chunks"], data["tfs"], data["lengths"])
+
+
+class LexicalIndex:
+    """
+    BM25 inverted index with one immutable segment per document, so adding or deleting a document
+    only writes or removes that document's segment. A manifest holds per-document chunk counts,
+    token totals and metadata (kind, source) for corpus statistics and filtering. Manifest updates
+    are read-modify-writes under a lock file shared by all processes.
+    """
+
+    def __init__(self, root: Path):
+        self.root = Path(root)
+        self._lock = threading.RLock()
+        self._manifest: Dict[str, Dict] = {}
+        self._segments: Dict[str, Segment] = {}
+        self._loaded_mtime = None
+        self.refresh()
+
+    @property
+    def _manifest_path(self) -> Path:
+        return self.root / "manifest.json"
+
+    @property
+    def _lock_path(self) -> Path:
+        return self.root / ".lock"
+
+    def _segment_path(self, doc_id: str) -> Path:
+        return self.root / f"{doc_id}.npz"
+
+    def _mtime(self):
+        try:
+            return self._manifest_path.stat().st_mtime_ns
+        except FileNotFoundError:
+            return None
+
+    def refresh(self) -> None:
+        """Reloads the manifest if another process changed it; segments load on first use."""
+        with self._lock:
+            mtime = self._mtime()
+            if mtime == self._loaded_mtime:
+                return
+            self._manifest = json.loads(self._manifest_path.read_text()) if mtime is not None else {}
+            self._segments = {d: s for d, s in self._segments.items() if d in self._manifest}
+            self._loaded_mtime = mtime
+
+    def _write_manifest(self) -> None:
+        tmp = self.root / f"manifest.{os.getpid()}.tmp.json"
+        tmp.write_text(json.dumps(self._manifest))
+        os.replace(tmp, self._manifest_path)
+        self._loaded_mtime = self._mtime()
+
+    def documents(self) -> set:
+        self.refresh()
+        return set(self._manifest)
+
+    def add_document(self, doc_id: str, texts: List[str], **metadata) -> None:
+        """Indexes a document's chunks (in the same order as the vector index), replacing any previous segment."""
+        segment = Segment.build(texts)
+        with self._lock, file_lock(self._lock_path):
+            self.refresh()
+            segment.save(self._segment_path(doc_id))
+            self._segments[doc_id] = segment
+            self._manifest[doc_id] = {"chunks": len(texts), "tokens": int(segment.lengths.sum()), **metadata}
+            self._write_manifest()
+
+    def remove_document(self, doc_id: str) -> None:
+        with self._lock, file_lock(self._lock_path):
+            self.refresh()
+            if self._manifest.pop(doc_id, None) is None:
+                return
+            self._segments.pop(doc_id, None)
+            self._write_manifest()
+            try:
+                self._segment_path(doc_id).unlink()
+            except FileNotFoundError:
+                pass
+
+    def _segment(self, doc_id: str) -> Segment:
+        segment = self._segments.get(doc_id)
+        if segment is None:
+            segment = self._segments[doc_id] = Segment.load(self._segment_path(doc_id))
+        return segment
+
+    def search(self, query: str, k: int, **filters) -> List[Dict]:
+        """Top-k chunks by BM25 as {"doc_id", "chunk", "score"}; filters match manifest metadata (e.g. kind)."""
+        terms = set(tokenize(query))
+        with self._lock:
+            self.refresh()
+            manifest = dict(self._manifest)
+            if not terms or not manifest:
+                return []
+            docs = [d for d, meta in manifest.items() if all(meta.get(key) == value for key, value in filters.items())]
+            try:
+                segments = {d: self._segment(d) for d in docs}
+            except FileNotFoundError:  # a segment removed by another process after our manifest read
+                self._loaded_mtime = None
+                return []
+
+        # Corpus-wide statistics, so scores don't depend on the filter
+        total_chunks = sum(meta["chunks"] for meta in manifest.values())
+        avg_len = sum(meta["tokens"] for meta in manifest.values()) / max(1, total_chunks)
+
+        matches = {term: [] for term in terms}
+        for doc_id, segment in segments.items():
+            for term in terms:
+                found = segment.postings(term)
+                if found is not None:
+                    matches[term].append((doc_id, *found))
+
+        scores: Dict[str, np.ndarray] = {}
+        for term, hits in matches.items():
+            df = sum(len(chunks) for _, chunks, _ in hits)
+            if not df:
+                continue
+            idf = math.log(1 + (total_chunks - df + 0.5) / (df + 0.5))
+            for doc_id, chunks, tfs in hits:
+                lengths = segments[doc_id].lengths[chunks]
+                tf = tfs.astype(np.float32)
+                gain = idf * tf * (BM25_K1 + 1) / (tf + BM25_K1 * (1 - BM25_B + BM25_B * lengths / avg_len))
+                doc_scores = scores.setdefault(doc_id, np.zeros(len(segments[doc_id].lengths), dtype=np.float32))
+                np.add.at(doc_scores, chunks, gain)
+
+        ranked = []
+        for doc_id, doc_scores in scores.items():
+            nonzero = np.flatnonzero(doc_scores)
+            top = nonzero[np.argsort(-doc_scores[nonzero])[:k]]
+            ranked.extend({"doc_id": doc_id, "chunk": int(n), "score": float(doc_scores[n])} for n in top)
+        ranked.sort(key=lambda hit: -hit["score"])
+        return ranked[:k]
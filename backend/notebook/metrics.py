@@ -0,0 +1,113 @@
+import os
+import hashlib
+import threading
+from contextvars import ContextVar
+from typing import Dict, Tuple
+
+# -- Config --
+METRICS_PREFIX = "faqbot_"
+# Label values beyond this many tenants are reported as "other", keeping the series count bounded
+METRICS_MAX_TENANTS = int(os.getenv("METRICS_MAX_TENANTS", "50"))
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+HELP = {
+    "stage_seconds": ("histogram", "Time spent per hot-path stage (auth, route, load, retrieve, generate, serialize, ...)."),
+    "http_request_seconds": ("histogram", "Request latency per endpoint and status."),
+    "cache_requests_total": ("counter", "Cache lookups per cache and result (hit or miss)."),
+    "rate_limited_total": ("counter", "Chat requests rejected with 429, by reason (rate or concurrency)."),
+}
+
+# Tenant of the request being served; set by the chatbot middleware, read when no tenant is passed explicitly
+tenant_label: ContextVar[str] = ContextVar("tenant_label", default="")
+
+_lock = threading.Lock()
+_histograms: Dict[Tuple[str, tuple], list] = {}  # (name, labels) -> [bucket counts..., sum, count]
+_counters: Dict[Tuple[str, tuple], float] = {}
+_tenants = set()
+
+
+def tenant_id(tenant: str) -> str:
+    """The label identifying a tenant: a short hash of its email, so scrapes don't carry user addresses."""
+    return hashlib.sha256(tenant.encode("utf-8")).hexdigest()[:12]
+
+
+def _tenant(tenant: str = None) -> str:
+    tenant = tenant if tenant is not None else tenant_label.get()
+    if not tenant:
+        return ""
+    label = tenant_id(tenant)
+    if label in _tenants:
+        return label
+    with _lock:
+        if len(_tenants) >= METRICS_MAX_TENANTS:
+            return "other"
+        _tenants.add(label)
+    return label
+
+
+def _labels(tenant: str = None, **labels) -> tuple:
+    return tuple(sorted({**labels, "tenant": _tenant(tenant)}.items()))
+
+
+def observe(name: str, seconds: float, tenant: str = None, **labels) -> None:
+    key = (name, _labels(tenant, **labels))
+    with _lock:
+        series = _histograms.get(key)
+        if series is None:
+            series = _histograms[key] = [0] * len(BUCKETS) + [0.0, 0]
+        for i, bound in enumerate(BUCKETS):
+            if seconds <= bound:
+                series[i] += 1
+        series[-2] += seconds
+        series[-1] += 1
+
+
+def inc(name: str, amount: float = 1, tenant: str = None, **labels) -> None:
+    key = (name, _labels(tenant, **labels))
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + amount
+
+
+def cache_result(cache: str, hit: bool, tenant: str = None) -> None:
+    """Counts a cache lookup; hit rate is hits / (hits + misses) per cache."""
+    inc("cache_requests_total", cache=cache, result="hit" if hit else "miss", tenant=tenant)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labels: tuple, **extra) -> str:
+    pairs = [*labels, *extra.items()]
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}" if pairs else ""
+
+
+def render() -> str:
+    """All metrics in the Prometheus text exposition format (version 0.0.4)."""
+    with _lock:
+        histograms = {key: list(series) for key, series in _histograms.items()}
+        counters = dict(_counters)
+
+    lines, described = [], set()
+
+    def describe(name):
+        if name not in described:
+            described.add(name)
+            kind, text = HELP.get(name, ("untyped", name))
+            lines.append(f"# HELP {METRICS_PREFIX}{name} {text}")
+            lines.append(f"# TYPE {METRICS_PREFIX}{name} {kind}")
+
+    for (name, labels), series in sorted(histograms.items()):
+        describe(name)
+        metric = METRICS_PREFIX + name
+        for bound, count in zip(BUCKETS, series):
+            lines.append(f"{metric}_bucket{_format_labels(labels, le=bound)} {count}")
+        lines.append(f"{metric}_bucket{_format_labels(labels, le='+Inf')} {series[-1]}")
+        lines.append(f"{metric}_sum{_format_labels(labels)} {series[-2]}")
+        lines.append(f"{metric}_count{_format_labels(labels)} {series[-1]}")
+
+    for (name, labels), value in sorted(counters.items()):
+        describe(name)
+        lines.append(f"{METRICS_PREFIX}{name}{_format_labels(labels)} {value}")
+
+    return "\n".join(lines) + "\n"
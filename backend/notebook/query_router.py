@@ -0,0 +1,61 @@
+import os
+from dataclasses import dataclass
+from typing import Iterable
+from notebook.vector_index import tokenize
+
+# -- Config --
+# Below this confidence the tool-calling agent decides instead
+ROUTER_MIN_CONFIDENCE = float(os.getenv("ROUTER_MIN_CONFIDENCE", "0.6"))
+
+# Same split as the system prompt: academic material lives in PDFs, institutional info on websites
+PDF_KEYWORDS = {
+    "subject", "subjects", "notes", "note", "exam", "exams", "paper", "papers", "question", "questions",
+    "syllabus", "semester", "sem", "marks", "mark", "module", "modules", "unit", "units", "chapter",
+    "topic", "topics", "pdf", "pdfs", "assignment", "lab", "internal", "previous", "important",
+}
+WEBSITE_KEYWORDS = {
+    "admission", "admissions", "fee", "fees", "placement", "placements", "package", "salary", "campus",
+    "hostel", "college", "facilities", "facility", "contact", "address", "location", "located", "courses",
+    "department", "departments", "faculty", "principal", "scholarship", "scholarships", "recruiters",
+    "transport", "website", "accreditation", "ranking", "about", "history", "eligibility",
+}
+
+
+@dataclass
+class Route:
+    source: str        # "pdf", "website" or "both"
+    confidence: float  # 0..1; how clearly one side won
+
+
+def _overlap(tokens: set, descriptions: Iterable[str]) -> int:
+    vocab = set()
+    for description in descriptions:
+        vocab.update(tokenize(description or ""))
+    return len(tokens & vocab)
+
+
+def route(query: str, pdf_descriptions: Iterable[str] = (), website_descriptions: Iterable[str] = ()) -> Route:
+    """
+    Picks the knowledge source for a query from keyword hits plus word overlap with the tenant's
+    document filenames/descriptions. Confidence is the winning side's share of the total score.
+    """
+    tokens = set(tokenize(query))
+    pdf_descriptions, website_descriptions = list(pdf_descriptions), list(website_descriptions)
+
+    pdf_score = len(tokens & PDF_KEYWORDS) + _overlap(tokens, pdf_descriptions)
+    website_score = len(tokens & WEBSITE_KEYWORDS) + _overlap(tokens, website_descriptions)
+
+    # A tenant with only one kind of content can only be answered from that kind
+    if pdf_descriptions and not website_descriptions:
+        return Route("pdf", 1.0)
+    if website_descriptions and not pdf_descriptions:
+        return Route("website", 1.0)
+
+    total = pdf_score + website_score
+    if total == 0:
+        return Route("both", 0.0)
+    share = max(pdf_score, website_score) / total
+    if share < ROUTER_MIN_CONFIDENCE:
+        # Mixed signals: search both, which is still a confident decision if there were signals at all
+        return Route("both", min(1.0, total / 2))
+    return Route("pdf" if pdf_score > website_score else "website", share)
@@ -0,0 +1,418 @@
+import os
+import re
+import zlib
+import datetime
+from html import escape
+from collections import Counter
+from pathlib import Path
+from typing import Dict, List, Optional
+import numpy as np
+from pymongo import UpdateOne
+from database_connection import KM_documents_collection, KM_questions_collection
+from notebook.lru_cache import LRUCache
+from notebook.lexical_index import tokenize
+from notebook import metrics, text_cache
+
+# -- Config --
+# Records are parsed once per document and parser version; bump the version to re-parse everything
+QUESTION_PARSER_VERSION = 1
+QUESTION_INDEX_TTL = float(os.getenv("QUESTION_INDEX_TTL", "300"))
+QUESTION_INDEX_MAX_TENANTS = int(os.getenv("QUESTION_INDEX_MAX_TENANTS", "128"))
+# A document counts as a question paper when at least this many questions (some with marks) are found
+QUESTION_MIN_PER_PAPER = int(os.getenv("QUESTION_MIN_PER_PAPER", "3"))
+QUESTION_RESULT_LIMIT = int(os.getenv("QUESTION_RESULT_LIMIT", "50"))
+# Set to "0" to render record answers as plain HTML lists instead of having the LLM format them
+QUESTION_LLM_FORMAT = os.getenv("QUESTION_LLM_FORMAT", "1") == "1"
+# MinHash/LSH: QUESTION_LSH_BANDS bands of QUESTION_LSH_ROWS rows; pairs above the estimated Jaccard threshold are repeats
+QUESTION_LSH_BANDS = int(os.getenv("QUESTION_LSH_BANDS", "32"))
+QUESTION_LSH_ROWS = int(os.getenv("QUESTION_LSH_ROWS", "4"))
+QUESTION_DUP_THRESHOLD = float(os.getenv("QUESTION_DUP_THRESHOLD", "0.5"))
+
+_MERSENNE = (1 << 61) - 1
+_rng = np.random.default_rng(1)
+_PERM_A = _rng.integers(1, 1 << 31, QUESTION_LSH_BANDS * QUESTION_LSH_ROWS, dtype=np.uint64)
+_PERM_B = _rng.integers(0, 1 << 31, QUESTION_LSH_BANDS * QUESTION_LSH_ROWS, dtype=np.uint64)
+
+_STOPWORDS = {
+    "a", "an", "the", "of", "in", "on", "to", "and", "or", "for", "with", "is", "are", "what", "its",
+    "be", "by", "as", "at", "it", "this", "that", "any", "your", "give", "from", "me", "all",
+}
+
+_QUESTION_RE = re.compile(r"^\s*(?:q(?:uestion)?\s*(?:no)?\s*\.?\s*)?(\d{1,2})(?:\s*[\.\):]\s*|\s+(?=\(?[a-h]\s*[\.\)]))(?:\(?([a-h])\s*[\.\)]\s*)?(.*)$", re.I)
+_PART_RE = re.compile(r"^\s*\(?([a-h]|i{1,3}|iv|v|vi)\s*\)\s*(.*)$", re.I)
+_MARKS_RE = re.compile(r"[\(\[]?\s*(\d{1,3})\s*(?:marks?|m)\b\s*[\)\]]?", re.I)
+_BRACKET_MARKS_RE = re.compile(r"[\(\[]\s*(\d{1,3})\s*[\)\]]\s*$")
+_BARE_MARKS_RE = re.compile(r"^\s*(\d{1,3})\s*$")
+_DEFAULT_MARKS_RE = re.compile(r"(?:each|every)\s+(?:full\s+)?(?:question|questions)?\s*carr(?:y|ies)\s+(\d{1,3})\s*marks?", re.I)
+_SUBJECT_RE = re.compile(r"^\s*(?:subject|course)\s*(?:name|title)?\s*[:\-–]\s*(.+)$", re.I)
+_CODE_RE = re.compile(r"\(?\b\d{2}[a-z]{2,4}\d{2,3}[a-z]?\b\)?", re.I)
+# Instructions, page furniture and Bloom/CO columns are not part of any question
+_SKIP_RE = re.compile(r"^\s*(?:page\s+\d+|note\s*:|answer\s+any|time\s*:|max(?:imum)?\.?\s+marks|co\d+|l\d|bt\s*l?\d|usn)\b|^\s*or\s*$", re.I)
+
+_tables = LRUCache(QUESTION_INDEX_MAX_TENANTS, ttl=QUESTION_INDEX_TTL)
+
+
+# -- Parsing --
+
+def _subject(lines: List[str], doc: dict) -> str:
+    """The paper's subject from a "Subject:"/"Course:" header line, else its description or filename."""
+    for line in lines[:40]:
+        match = _SUBJECT_RE.match(line)
+        if match:
+            return _CODE_RE.sub("", match.group(1)).strip(" -–:")
+    fallback = doc.get("description") or Path(doc.get("filename", "")).stem
+    return re.sub(r"[_\-]+", " ", _CODE_RE.sub("", fallback)).strip()
+
+
+def _take_marks(text: str):
+    """Splits trailing marks annotations off a line: ("Explain X.", 10)."""
+    match = _BRACKET_MARKS_RE.search(text)
+    marks = None
+    if match:
+        marks, text = int(match.group(1)), text[:match.start()]
+    for match in list(_MARKS_RE.finditer(text))[::-1]:
+        marks = marks or int(match.group(1))
+        text = text[:match.start()] + text[match.end():]
+    return text.strip(), marks
+
+
+def parse_questions(text: str, doc: dict) -> List[Dict]:
+    """
+    Splits a question paper's text into question records: {"number", "text", "marks", "subject"}.
+    Handles "1.", "Q2)", "3 a)" and "(b)" numbering, marks as "(10 Marks)", "[12M]", "[8]" or a bare
+    number on the following line, and a default from "each question carries N marks".
+    """
+    lines = text.splitlines()
+    subject = _subject(lines, doc)
+    default = _DEFAULT_MARKS_RE.search(text)
+    default_marks = int(default.group(1)) if default else None
+
+    records, current, number = [], None, None
+
+    def flush():
+        if current is None:
+            return
+        body = re.sub(r"\s+", " ", " ".join(current["lines"])).strip()
+        if len(tokenize(body)) >= 3:
+            marks = current["marks"] or default_marks
+            records.append({
+                "number": current["number"],
+                "text": body,
+                "marks": marks if marks and 0 < marks <= 100 else None,
+                "subject": subject,
+            })
+
+    for line in lines:
+        if not line.strip() or _SKIP_RE.match(line):
+            if line.strip().lower() == "or":
+                flush()
+                current = None
+            continue
+        start, part = _QUESTION_RE.match(line), _PART_RE.match(line)
+        bare = _BARE_MARKS_RE.match(line)
+        if bare and current is not None and current["marks"] is None:
+            current["marks"] = int(bare.group(1))
+            continue
+        if start:
+            flush()
+            number = start.group(1)
+            body, marks = _take_marks(start.group(3))
+            current = {"number": number + (start.group(2) or "").lower(), "lines": [body], "marks": marks}
+        elif part and number is not None:
+            flush()
+            body, marks = _take_marks(part.group(2))
+            current = {"number": number + part.group(1).lower(), "lines": [body], "marks": marks}
+        elif current is not None:
+            body, marks = _take_marks(line)
+            current["lines"].append(body)
+            current["marks"] = current["marks"] or marks
+    flush()
+    return records
+
+
+def is_question_paper(records: List[Dict]) -> bool:
+    return len(records) >= QUESTION_MIN_PER_PAPER and any(r["marks"] for r in records)
+
+
+# -- MinHash / LSH --
+
+def _shingles(text: str) -> set:
+    words = [w for w in tokenize(text) if w not in _STOPWORDS]
+    return set(words) | {f"{a} {b}" for a, b in zip(words, words[1:])}
+
+
+def signature(text: str) -> List[int]:
+    """MinHash signature over the question's content words and word pairs."""
+    hashes = np.array([zlib.crc32(s.encode("utf-8")) for s in _shingles(text)] or [0], dtype=np.uint64)
+    values = (hashes[:, None] * _PERM_A[None, :] + _PERM_B[None, :]) % _MERSENNE
+    return values.min(axis=0).tolist()
+
+
+def cluster(ids: list, signatures: np.ndarray) -> Dict:
+    """Groups near-duplicates: LSH band collisions, kept when the estimated Jaccard clears the threshold."""
+    parent = list(range(len(ids)))
+
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    for band in range(QUESTION_LSH_BANDS):
+        rows = signatures[:, band * QUESTION_LSH_ROWS:(band + 1) * QUESTION_LSH_ROWS]
+        buckets: Dict[bytes, List[int]] = {}
+        for i, row in enumerate(rows):
+            buckets.setdefault(row.tobytes(), []).append(i)
+        for members in buckets.values():
+            for other in members[1:]:
+                a, b = find(members[0]), find(other)
+                if a != b and np.mean(signatures[members[0]] == signatures[other]) >= QUESTION_DUP_THRESHOLD:
+                    parent[b] = a
+
+    roots = {}
+    for i, record_id in enumerate(ids):
+        roots.setdefault(find(i), []).append(record_id)
+    # Cluster id: the smallest member id, stable while that record exists
+    return {record_id: str(min(members)) for members in roots.values() for record_id in members}
+
+
+def recluster(tenant: str) -> None:
+    rows = list(KM_questions_collection.find({"email": tenant}, {"signature": 1, "cluster": 1}))
+    if not rows:
+        return
+    clusters = cluster([r["_id"] for r in rows], np.array([r["signature"] for r in rows], dtype=np.uint64))
+    ops = [UpdateOne({"_id": r["_id"]}, {"$set": {"cluster": clusters[r["_id"]]}}) for r in rows if r.get("cluster") != clusters[r["_id"]]]
+    if ops:
+        KM_questions_collection.bulk_write(ops, ordered=False)
+
+
+# -- Indexing --
+
+def index_document(doc: dict, text: str) -> int:
+    """Replaces a PDF's question records (none unless it looks like a question paper). Returns how many were stored."""
+    tenant, doc_id = doc.get("email"), str(doc["_id"])
+    records = parse_questions(text, doc)
+    if not is_question_paper(records):
+        records = []
+    KM_questions_collection.delete_many({"email": tenant, "doc_id": doc_id})
+    if records:
+        now = datetime.datetime.utcnow()
+        KM_questions_collection.insert_many([
+            {**r, "email": tenant, "doc_id": doc_id, "source": doc["filename"], "signature": signature(r["text"]), "created_at": now}
+            for r in records
+        ])
+    recluster(tenant)
+    KM_documents_collection.update_one(
+        {"_id": doc["_id"]}, {"$set": {"questions_version": QUESTION_PARSER_VERSION, "questions": len(records)}}
+    )
+    _tables.pop(tenant)
+    print(f"[QUESTIONS] {doc['filename']}: {len(records)} question(s) indexed")
+    return len(records)
+
+
+def copy_document(source: dict, doc: dict) -> int:
+    """Gives `doc` the question records of `source`, a document with identical content, without re-parsing."""
+    tenant, doc_id = doc.get("email"), str(doc["_id"])
+    rows = list(KM_questions_collection.find(
+        {"email": source.get("email"), "doc_id": str(source["_id"])}, {"_id": 0, "cluster": 0, "created_at": 0}
+    ))
+    KM_questions_collection.delete_many({"email": tenant, "doc_id": doc_id})
+    if rows:
+        now = datetime.datetime.utcnow()
+        KM_questions_collection.insert_many([
+            {**r, "email": tenant, "doc_id": doc_id, "source": doc["filename"], "created_at": now} for r in rows
+        ])
+    recluster(tenant)
+    KM_documents_collection.update_one(
+        {"_id": doc["_id"]}, {"$set": {"questions_version": source.get("questions_version"), "questions": len(rows)}}
+    )
+    _tables.pop(tenant)
+    return len(rows)
+
+
+def remove_document(tenant: str, doc_id) -> None:
+    if KM_questions_collection.delete_many({"email": tenant, "doc_id": str(doc_id)}).deleted_count:
+        recluster(tenant)
+        _tables.pop(tenant)
+
+
+def claim_stale():
+    """
+    Marks one indexed PDF parsed by an older parser version (or never) as queued for re-parsing and
+    returns it, or None. Its questions_version is only updated once the new records are written.
+    """
+    return KM_documents_collection.find_one_and_update(
+        {
+            "questions_version": {"$ne": QUESTION_PARSER_VERSION},
+            "questions_queued": {"$ne": QUESTION_PARSER_VERSION},
+            "status": {"$nin": ["pending", "failed"]},
+        },
+        {"$set": {"questions_queued": QUESTION_PARSER_VERSION}},
+        projection={"_id": 1},
+    )
+
+
+def release_stale(doc_id) -> None:
+    """Undoes claim_stale for a document whose re-parse gave up, so the next backfill queues it again."""
+    KM_documents_collection.update_one({"_id": doc_id}, {"$unset": {"questions_queued": ""}})
+
+
+def reindex(doc_id, progress=lambda percent: None) -> None:
+    """Job queue handler: re-parses one PDF's question records from its cached text."""
+    doc = KM_documents_collection.find_one({"_id": doc_id})
+    if not doc:
+        return
+    index_document(doc, text_cache.get_pdf_text(doc["path"], doc.get("sha256")) or "")
+
+
+# -- Queries --
+
+def _load(tenant: str) -> List[Dict]:
+    return list(KM_questions_collection.find(
+        {"email": tenant}, {"_id": 0, "number": 1, "text": 1, "marks": 1, "subject": 1, "source": 1, "doc_id": 1, "cluster": 1}
+    ))
+
+
+def records(tenant: str) -> List[Dict]:
+    table = _tables.get(tenant)
+    metrics.cache_result("questions", table is not None, tenant)
+    if table is None:
+        table = _load(tenant)
+        _tables.set(tenant, table)
+    return table
+
+
+# Words a record-level query may use besides a subject; anything else (a topic, an unknown subject) is left to retrieval
+_QUERY_WORDS = {
+    "question", "qp", "paper", "pdf", "exam", "examination", "test", "mark", "m", "previous", "past", "last",
+    "semester", "sem", "year", "important", "sample", "provide", "list", "show", "get", "want", "need", "please",
+    "subject", "course", "which", "were", "was", "asked", "ask", "most", "many", "how", "much", "count", "number",
+    "wise", "per", "each", "time", "across", "both", "my", "our", "do", "does", "have", "has", "there", "can", "you",
+    "i", "we", "distribution", "breakdown", "weightage", "repeated", "repeat", "repeating", "recurring",
+    "frequently", "frequent", "common",
+}
+# Requests for prose about the papers; records can only be listed or counted
+_SUMMARY_WORDS = {"summarize", "summarise", "summary", "topic", "overview", "explain", "describe", "key", "syllabus"}
+_NUMBER_RE = re.compile(r"^\d+m?$")
+
+
+def _stem(word: str) -> str:
+    """Folds plurals ("oops", "questions", "papers") so they match the singular forms."""
+    return word[:-1] if len(word) > 3 and word.endswith("s") and not word.endswith(("ss", "us", "is")) else word
+
+
+def _subject_words(subject: str) -> List[str]:
+    return [_stem(w) for w in tokenize(subject) if w not in _STOPWORDS]
+
+
+def _match_subject(tokens: set, subjects: set) -> Optional[str]:
+    """The longest subject named in the query, by its content words or its initials ("oop")."""
+    best = None
+    for subject in subjects:
+        words = _subject_words(subject)
+        if not words:
+            continue
+        acronym = "".join(w[0] for w in words)
+        if set(words) <= tokens or (len(acronym) >= 2 and _stem(acronym) in tokens):
+            if best is None or len(subject) > len(best):
+                best = subject
+    return best
+
+
+def parse_query(query: str, subjects: set) -> Optional[Dict]:
+    """
+    Recognizes record-level questions: "12-mark questions", "question distribution by marks",
+    "repeated questions from OOP". None for anything the index can't answer by itself: summaries,
+    topics, or a subject none of the papers is about.
+    """
+    words = tokenize(query)
+    tokens = set(words) | {_stem(w) for w in words}
+    if not tokens & {"question", "qp", "paper"} or tokens & _SUMMARY_WORDS:
+        return None
+    marks = re.search(r"(\d{1,3})\s*-?\s*marks?\b|(\d{1,3})\s*m\b", query, re.I)
+    marks = int(marks.group(1) or marks.group(2)) if marks else None
+
+    subject = _match_subject(tokens, subjects)
+    named = set(_subject_words(subject)) | {_stem("".join(w[0] for w in _subject_words(subject)))} if subject else set()
+    known = _QUERY_WORDS | _STOPWORDS | named
+    if any(w not in known and _stem(w) not in known and not _NUMBER_RE.match(w) for w in words):
+        return None
+
+    if tokens & {"distribution", "breakdown", "weightage"} or ({"how", "many"} <= tokens):
+        intent = "distribution"
+    elif tokens & {"repeated", "repeat", "repeating", "recurring", "frequently", "frequent", "common"} or {"most", "asked"} <= tokens:
+        intent = "repeated"
+    elif marks is not None or subject is not None:
+        intent = "list"
+    else:
+        return None
+    return {"intent": intent, "marks": marks, "subject": subject}
+
+
+def answer_query(tenant: str, query: str) -> Optional[Dict]:
+    """
+    Answers a record-level question from the tenant's question index:
+    {"intent", "subject", "marks", "items"}. None when the query isn't one, or the tenant has no papers.
+    """
+    table = records(tenant)
+    if not table:
+        return None
+    parsed = parse_query(query, {r["subject"] for r in table if r["subject"]})
+    if parsed is None:
+        return None
+
+    rows = [
+        r for r in table
+        if (parsed["subject"] is None or r["subject"] == parsed["subject"])
+        and (parsed["marks"] is None or r["marks"] == parsed["marks"])
+    ]
+    if parsed["intent"] == "distribution":
+        counts = Counter((r["subject"], r["marks"]) for r in rows)
+        items = [{"subject": s, "marks": m, "count": n} for (s, m), n in sorted(counts.items(), key=lambda kv: (kv[0][0], kv[0][1] or 0))]
+    elif parsed["intent"] == "repeated":
+        groups: Dict[str, List[Dict]] = {}
+        for r in rows:
+            groups.setdefault(r["cluster"], []).append(r)
+        items = [
+            {"text": g[0]["text"], "marks": g[0]["marks"], "subject": g[0]["subject"], "times": len(g),
+             "sources": sorted({r["source"] for r in g})}
+            for g in groups.values() if len({r["doc_id"] for r in g}) > 1
+        ]
+        items.sort(key=lambda item: -item["times"])
+    else:
+        # One entry per repeat cluster, so the same question from several papers is listed once
+        seen, items = set(), []
+        for r in rows:
+            if r["cluster"] not in seen:
+                seen.add(r["cluster"])
+                items.append({"text": r["text"], "marks": r["marks"], "subject": r["subject"], "source": r["source"]})
+    return {**parsed, "items": items[:QUESTION_RESULT_LIMIT]}
+
+
+# -- Rendering --
+FORMAT_INSTRUCTION = (
+    "Format the question-paper records below as the answer to the user's question, in HTML using <p>, <ul>, <li> tags only. "
+    "Use only these records: do not add, drop or reword questions, and do not change counts or marks."
+)
+
+
+def render_facts(result: Dict) -> str:
+    """Plain-text records for the LLM to format."""
+    scope = ", ".join(filter(None, [result["subject"], f"{result['marks']} marks" if result["marks"] else None])) or "all papers"
+    lines = [f"Records ({result['intent']}, {scope}):"]
+    for item in result["items"]:
+        marks = f"{item['marks']} marks" if item.get("marks") else "marks not stated"
+        if result["intent"] == "distribution":
+            lines.append(f"- {item['subject']}: {marks}: {item['count']} question(s)")
+        elif result["intent"] == "repeated":
+            lines.append(f"- asked {item['times']} times ({', '.join(item['sources'])}; {marks}): {item['text']}")
+        else:
+            lines.append(f"- [{marks}] {item['text']} (source: {item['source']})")
+    return "\n".join(lines)
+
+
+def render_html(result: Dict) -> str:
+    """The same records as HTML without an LLM call."""
+    title, *lines = render_facts(result).splitlines()
+    items = "".join(f"<li>{escape(line[2:])}</li>" for line in lines)
+    return f"<p>{escape(title)}</p><ul>{items}</ul>"
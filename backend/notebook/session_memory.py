@@ -0,0 +1,180 @@
+import os
+import re
+import uuid
+import datetime
+import threading
+from typing import List, Optional, Tuple
+from database_connection import KM_sessions_collection
+from notebook.vector_index import tokenize
+from notebook.executors import io_pool
+
+# -- Config --
+# Conversations live in KM_sessions, so every worker sees each turn; a TTL index on updated_at
+# (see database_connection.ensure_indexes) forgets them after SESSION_TTL idle seconds
+SESSION_TTL = int(os.getenv("SESSION_TTL", "1800"))
+# A summarization that hasn't finished after this long is assumed dead and may be retried by another turn
+SESSION_COMPACT_LEASE = datetime.timedelta(seconds=60)
+# Only what the prompt and the source label need is kept from the previous turn's retrieval
+HIT_FIELDS = ("doc_id", "text", "source", "kind")
+SESSION_TOKEN_BUDGET = int(os.getenv("SESSION_TOKEN_BUDGET", "1500"))  # summary + verbatim turns
+SESSION_KEEP_TURNS = int(os.getenv("SESSION_KEEP_TURNS", "2"))  # newest turns never summarized
+# Share of a question's content terms that must come from the topic's opening question for it to continue the topic
+SESSION_TOPIC_OVERLAP = float(os.getenv("SESSION_TOPIC_OVERLAP", "0.6"))
+
+# Short questions leaning on these words refer back to the previous turn ("explain the second one")
+FOLLOW_UP_MAX_WORDS = 8
+ANAPHORA = {
+    "it", "its", "this", "that", "these", "those", "they", "them", "their", "above", "previous",
+    "same", "more", "again", "also", "first", "second", "third", "last", "one", "ones", "elaborate", "explain",
+}
+# Question words and function words carry no topic; two questions about the same college share the college's
+# name, so only the remaining terms tell "admission process" apart from "fee structure"
+STOPWORDS = {
+    "a", "an", "the", "of", "in", "on", "at", "to", "and", "or", "for", "with", "by", "from", "about", "as",
+    "is", "are", "was", "were", "be", "do", "does", "did", "can", "could", "will", "would", "should", "has", "have",
+    "what", "which", "who", "whom", "how", "when", "where", "why", "i", "me", "my", "we", "our", "you", "your",
+    "tell", "give", "show", "list", "please", "know", "want", "need", "there", "any", "all", "some",
+}
+
+SUMMARY_PROMPT = """Summarize this conversation between a student and a college assistant in at most 120 words.
+Keep subjects, document names, numbers and open questions; drop greetings and formatting.
+
+Previous summary:
+{summary}
+
+New turns:
+{turns}"""
+
+_TAG_RE = re.compile(r"<[^>]+>")
+
+
+def estimate_tokens(text: str) -> int:
+    return len(text) // 4 + 1
+
+
+def strip_html(html: str) -> str:
+    return _TAG_RE.sub(" ", html)
+
+
+class Session:
+    """
+    One conversation: a rolling summary, the newest turns verbatim, and the last turn's retrieval.
+    Loaded from KM_sessions for each request; add_turn writes the turn and this turn's state back.
+    """
+
+    def __init__(self, key: str = None, tenant: str = None, record: dict = None):
+        record = record or {}
+        self.key = key
+        self.tenant = tenant
+        self.summary = record.get("summary", "")
+        self.turns: List[Tuple[str, str]] = [(t["q"], t["a"]) for t in record.get("turns", [])]
+        self.last_hits: Optional[list] = record.get("last_hits")
+        self.last_route: Optional[str] = record.get("last_route")
+        self.follow_up = False
+        topic = record.get("topic_terms")
+        self._topic_terms = set(topic) if topic is not None else None
+        self._lock = threading.Lock()
+        self._compacting = False
+
+    def is_follow_up(self, query: str) -> bool:
+        """
+        True if the query continues the previous turn's topic: most of its content terms come from the
+        topic's opening question, or it is a short question referring back. A new topic becomes the reference.
+        """
+        tokens = tokenize(query)
+        terms = set(tokens) - STOPWORDS - ANAPHORA
+        follow_up = False
+        if self._topic_terms is not None and self.last_hits is not None:
+            follow_up = (bool(terms) and len(terms & self._topic_terms) / len(terms) >= SESSION_TOPIC_OVERLAP) or (
+                len(tokens) <= FOLLOW_UP_MAX_WORDS and bool(ANAPHORA.intersection(tokens))
+            )
+        if not follow_up:
+            self._topic_terms = terms
+        self.follow_up = follow_up
+        return follow_up
+
+    def history_text(self) -> str:
+        """Conversation context for the prompt; empty for a new session."""
+        with self._lock:
+            lines = [f"Summary of earlier conversation: {self.summary}"] if self.summary else []
+            for question, answer in self.turns:
+                lines.append(f"Student: {question}\nAssistant: {strip_html(answer)}")
+        return "\n".join(lines)
+
+    def _tokens(self) -> int:
+        return estimate_tokens(self.summary) + sum(estimate_tokens(q) + estimate_tokens(strip_html(a)) for q, a in self.turns)
+
+    def add_turn(self, question: str, answer: str) -> None:
+        """Records a turn; if the history is over budget, older turns are summarized in the background."""
+        with self._lock:
+            self.turns.append((question, answer))
+            over_budget = self._tokens() > SESSION_TOKEN_BUDGET and len(self.turns) > SESSION_KEEP_TURNS
+        if self.key is not None:
+            KM_sessions_collection.update_one({"_id": self.key}, {
+                "$push": {"turns": {"id": uuid.uuid4().hex, "q": question, "a": answer}},
+                "$set": {
+                    "email": self.tenant,
+                    "last_hits": [{f: h.get(f) for f in HIT_FIELDS} for h in self.last_hits] if self.last_hits is not None else None,
+                    "last_route": self.last_route,
+                    "topic_terms": sorted(self._topic_terms) if self._topic_terms is not None else None,
+                    "updated_at": datetime.datetime.utcnow(),
+                },
+            }, upsert=True)
+        if not over_budget:
+            return
+        with self._lock:
+            if self._compacting:
+                return
+            self._compacting = True
+        io_pool().submit(self._compact)
+
+    def _claim_compaction(self) -> Optional[dict]:
+        """The stored session, if this process may summarize it now (no other turn is doing so)."""
+        now = datetime.datetime.utcnow()
+        return KM_sessions_collection.find_one_and_update(
+            {"_id": self.key, "$or": [{"compacting_until": None}, {"compacting_until": {"$lt": now}}]},
+            {"$set": {"compacting_until": now + SESSION_COMPACT_LEASE}},
+        )
+
+    def _compact(self) -> None:
+        try:
+            if self.key is not None:
+                record = self._claim_compaction()
+                if record is None:
+                    return
+                stored = record.get("turns", [])
+                old = stored[:-SESSION_KEEP_TURNS]
+                summary = record.get("summary", "")
+                old_turns = [(t["q"], t["a"]) for t in old]
+            else:
+                with self._lock:
+                    old_turns = self.turns[:-SESSION_KEEP_TURNS]
+                    summary = self.summary
+            turns_text = "\n".join(f"Student: {q}\nAssistant: {strip_html(a)}" for q, a in old_turns)
+            try:
+                import google.generativeai as genai
+                prompt = SUMMARY_PROMPT.format(summary=summary or "(none)", turns=turns_text)
+                new_summary = genai.GenerativeModel("gemini-1.5-flash").generate_content(prompt).text.strip()
+            except Exception as e:
+                print(f"[SESSION] Summarization failed, truncating instead: {e}")
+                new_summary = f"{summary} {turns_text}"[-SESSION_TOKEN_BUDGET * 2:]
+            if self.key is not None:
+                # Turns added meanwhile (by any worker) stay verbatim
+                KM_sessions_collection.update_one({"_id": self.key}, {
+                    "$set": {"summary": new_summary},
+                    "$pull": {"turns": {"id": {"$in": [t["id"] for t in old]}}},
+                    "$unset": {"compacting_until": ""},
+                })
+            with self._lock:
+                self.turns = self.turns[len(old_turns):]
+                self.summary = new_summary
+        finally:
+            self._compacting = False
+
+
+def get_session(tenant: str, session_id: Optional[str]) -> Optional[Session]:
+    """Loads the tenant's session for this id (a new one if unknown or expired), or None when the client sent no id."""
+    if not session_id:
+        return None
+    key = f"{tenant}/{session_id}"
+    return Session(key, tenant, KM_sessions_collection.find_one({"_id": key}))
@@ -0,0 +1,169 @@
+import os
+import hashlib
+import threading
+from functools import lru_cache
+from pathlib import Path
+from typing import Iterator, Optional
+from notebook.executors import parse_pool, timed
+from notebook import metrics
+
+# -- Config --
+# Extracted text is stored on disk so a PDF is only parsed once per content/PyMuPDF version.
+TEXT_CACHE_DIR = Path(os.getenv("TEXT_CACHE_DIR", "cache/text")).resolve()
+TEXT_CACHE_MAX_BYTES = int(os.getenv("TEXT_CACHE_MAX_BYTES", str(512 * 1024 * 1024)))
+
+# Extraction limits keep one huge upload from exhausting disk or memory
+PDF_MAX_PAGES = int(os.getenv("PDF_MAX_PAGES", "2000"))
+PDF_MAX_TEXT_BYTES = int(os.getenv("PDF_MAX_TEXT_BYTES", str(64 * 1024 * 1024)))
+
+# "process" runs the CPU-bound parsing in the shared parse pool; "inline" in the calling thread
+PDF_EXTRACT_MODE = os.getenv("PDF_EXTRACT_MODE", "process")
+
+
+@lru_cache(maxsize=1)
+def extractor_version() -> str:
+    """A PyMuPDF upgrade can change extracted text, so its version is part of the cache key."""
+    import fitz  # PyMuPDF; imported on first use so processes that never touch PDFs skip it
+    return f"pymupdf-{fitz.VersionBind}"
+
+
+_lock = threading.Lock()
+
+
+def file_sha256(path, chunk_size: int = 1024 * 1024) -> str:
+    """Returns the SHA-256 hex digest of a file, read in chunks."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(chunk_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _entry_path(sha256: str) -> Path:
+    return TEXT_CACHE_DIR / f"{sha256}-{extractor_version()}.txt"
+
+
+def iter_pdf_pages(pdf_path, max_pages: int = None) -> Iterator[str]:
+    """Yields each page's text in order, holding only one page in memory at a time."""
+    import fitz
+    max_pages = PDF_MAX_PAGES if max_pages is None else max_pages
+    doc = fitz.open(pdf_path)
+    try:
+        for number, page in enumerate(doc):
+            if number >= max_pages:
+                print(f"[EXTRACT] {pdf_path}: stopped at the {max_pages}-page limit")
+                break
+            yield page.get_text()
+    finally:
+        doc.close()
+
+
+def extract_pdf_text(pdf_path) -> str:
+    """Extracts clean text from every page of a PDF."""
+    return "\n".join(iter_pdf_pages(pdf_path))
+
+
+def _write_pdf_text(pdf_path, sha256: str, max_bytes: int) -> int:
+    """Streams page text straight into the cache entry, stopping at max_bytes. Returns bytes written."""
+    TEXT_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    entry = _entry_path(sha256)
+    tmp = entry.with_suffix(f".tmp.{os.getpid()}.{threading.get_ident()}")
+    written = 0
+    try:
+        with open(tmp, "wb") as out:
+            for page_text in iter_pdf_pages(pdf_path):
+                data = (page_text + "\n").encode("utf-8")
+                if written + len(data) > max_bytes:
+                    # Cut on a character boundary so the entry stays valid UTF-8
+                    data = data[:max_bytes - written].decode("utf-8", "ignore").encode("utf-8")
+                    out.write(data)
+                    written += len(data)
+                    print(f"[EXTRACT] {pdf_path}: stopped at the {max_bytes}-byte text limit")
+                    break
+                out.write(data)
+                written += len(data)
+        os.replace(tmp, entry)
+    finally:
+        # A failed extraction (corrupt PDF, full disk) must not leave a partial temp file in the cache dir
+        if tmp.exists():
+            tmp.unlink()
+    return written
+
+
+def ensure_pdf_text_cached(pdf_path, sha256: Optional[str] = None) -> Path:
+    """
+    Returns the cache entry holding the PDF's text, extracting on a miss. With PDF_EXTRACT_MODE=process
+    the extraction runs in the shared parse pool and the worker process writes the entry itself.
+    """
+    sha256 = sha256 or file_sha256(pdf_path)
+    entry = _entry_path(sha256)
+    hit = entry.exists()
+    metrics.cache_result("pdf_text", hit)
+    if hit:
+        try:
+            os.utime(entry, None)  # LRU touch
+        except OSError:
+            pass
+        return entry
+
+    with timed("extract_pdf"):
+        if PDF_EXTRACT_MODE == "process":
+            parse_pool().submit(_write_pdf_text, str(pdf_path), sha256, PDF_MAX_TEXT_BYTES).result()
+        else:
+            _write_pdf_text(pdf_path, sha256, PDF_MAX_TEXT_BYTES)
+    evict_lru()
+    return entry
+
+
+def iter_cached_text(entry: Path, block_size: int = 64 * 1024) -> Iterator[str]:
+    """Reads a cache entry back in fixed-size blocks."""
+    with open(entry, encoding="utf-8") as f:
+        for block in iter(lambda: f.read(block_size), ""):
+            yield block
+
+
+def has_text(entry: Path) -> bool:
+    """True if the entry contains any non-whitespace text; stops reading at the first hit."""
+    return any(block.strip() for block in iter_cached_text(entry))
+
+
+def get_pdf_text(pdf_path, sha256: Optional[str] = None) -> Optional[str]:
+    """Returns the whole text of a PDF via the cache. None if the PDF has no text."""
+    text = ensure_pdf_text_cached(pdf_path, sha256).read_text(encoding="utf-8")
+    return text if text.strip() else None
+
+
+def invalidate(sha256: str) -> None:
+    """Drops every cached entry for a content hash (all extractor versions)."""
+    if not sha256 or not TEXT_CACHE_DIR.exists():
+        return
+    for entry in TEXT_CACHE_DIR.glob(f"{sha256}-*.txt"):
+        try:
+            entry.unlink()
+        except FileNotFoundError:
+            pass
+
+
+def evict_lru(max_bytes: int = None) -> None:
+    """Removes the least recently used entries until the cache fits in max_bytes."""
+    max_bytes = TEXT_CACHE_MAX_BYTES if max_bytes is None else max_bytes
+    with _lock:
+        entries = []
+        total = 0
+        for entry in TEXT_CACHE_DIR.glob("*.txt"):
+            try:
+                stat = entry.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, entry))
+            total += stat.st_size
+
+        # Oldest access time first
+        for _, size, entry in sorted(entries, key=lambda e: e[0]):
+            if total <= max_bytes:
+                break
+            try:
+                entry.unlink()
+                total -= size
+            except FileNotFoundError:
+                pass
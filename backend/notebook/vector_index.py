@@ -0,0 +1,366 @@
+import os
+import json
+import zlib
+import hashlib
+import threading
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Union
+import numpy as np
+from notebook.lru_cache import LRUCache
+from notebook.file_lock import file_lock
+from notebook.lexical_index import LexicalIndex, tokenize
+
+# -- Config --
+INDEX_DIR = Path(os.getenv("VECTOR_INDEX_DIR", "cache/index")).resolve()
+EMBEDDER = os.getenv("EMBEDDER", "hashing")
+CHUNK_WORDS = int(os.getenv("CHUNK_WORDS", "220"))
+CHUNK_OVERLAP_WORDS = int(os.getenv("CHUNK_OVERLAP_WORDS", "40"))
+TOP_K = int(os.getenv("RETRIEVAL_TOP_K", "8"))
+EMBED_BATCH = int(os.getenv("EMBED_BATCH", "64"))
+# Hybrid ranking: weight of the semantic score against BM25, and how many candidates each side contributes per result
+HYBRID_ALPHA = float(os.getenv("HYBRID_ALPHA", "0.5"))
+HYBRID_CANDIDATES = int(os.getenv("HYBRID_CANDIDATES", "3"))
+
+
+def iter_chunks(blocks: Iterable[str], chunk_words: int = CHUNK_WORDS, overlap: int = CHUNK_OVERLAP_WORDS) -> Iterator[str]:
+    """
+    Splits a stream of text blocks into overlapping windows of chunk_words words, holding at most
+    one window plus one block in memory. Words split across block boundaries are rejoined.
+    """
+    step = max(1, chunk_words - overlap)
+    window: List[str] = []
+    fresh = 0  # words in the window not yet emitted in any chunk
+    carry = ""
+    for block in blocks:
+        text = carry + block
+        words = text.split()
+        carry = words.pop() if words and not text[-1].isspace() else ""
+        window.extend(words)
+        fresh += len(words)
+        while len(window) >= chunk_words:
+            yield " ".join(window[:chunk_words])
+            window = window[step:]
+            fresh = max(0, len(window) - overlap)
+    if carry:
+        window.append(carry)
+        fresh += 1
+    if window and fresh:
+        yield " ".join(window)
+
+
+def chunk_text(text: str, chunk_words: int = CHUNK_WORDS, overlap: int = CHUNK_OVERLAP_WORDS) -> List[str]:
+    """Splits text into overlapping windows of roughly chunk_words words."""
+    return list(iter_chunks([text], chunk_words, overlap))
+
+
+# -- Embedders --
+class HashingEmbedder:
+    """Local CPU embedder: signed feature hashing of unigrams and bigrams, L2-normalized."""
+    name = "hashing"
+
+    def __init__(self, dim: int = 1024):
+        self.dim = dim
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        out = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            tokens = tokenize(text)
+            features = tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]
+            for feature in features:
+                h = zlib.crc32(feature.encode("utf-8"))
+                out[row, h % self.dim] += 1.0 if (h >> 31) & 1 else -1.0
+        norms = np.linalg.norm(out, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return out / norms
+
+
+class GeminiEmbedder:
+    """Remote embedder using Gemini's embedding model."""
+    name = "gemini"
+
+    def __init__(self, model: str = "models/text-embedding-004", dim: int = 768):
+        self.model = model
+        self.dim = dim
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        import google.generativeai as genai
+        if not texts:
+            return np.zeros((0, self.dim), dtype=np.float32)
+        result = genai.embed_content(model=self.model, content=texts)
+        vectors = np.asarray(result["embedding"], dtype=np.float32).reshape(len(texts), -1)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return vectors / norms
+
+
+EMBEDDERS = {
+    "hashing": HashingEmbedder,
+    "gemini": GeminiEmbedder,
+}
+
+_embedder = None
+
+
+def get_embedder():
+    """Returns the process-wide embedder selected by the EMBEDDER env var."""
+    global _embedder
+    if _embedder is None:
+        _embedder = EMBEDDERS[EMBEDDER]()
+    return _embedder
+
+
+# -- Index --
+class VectorIndex:
+    """
+    Chunk vectors in a memory-mapped .npy file plus a JSON-lines file of chunk metadata
+    (doc_id, kind, source, text). Writes rewrite both files atomically under a lock file shared by
+    all processes, so concurrent writers merge instead of losing each other's documents; reads use the mmap.
+    A BM25 LexicalIndex over the same chunks lives in the `lexical/` subdirectory.
+    """
+
+    def __init__(self, root: Path, embedder=None):
+        self.root = Path(root)
+        self.embedder = embedder or get_embedder()
+        self._lock = threading.RLock()
+        self._vectors = np.zeros((0, self.embedder.dim), dtype=np.float32)
+        self._chunks: List[Dict] = []
+        self._rows_by_doc: Dict[str, List[int]] = {}
+        self._loaded_mtime = None
+        self.lexical = LexicalIndex(self.root / "lexical")
+        self._load()
+
+    @property
+    def _vectors_path(self) -> Path:
+        return self.root / "vectors.npy"
+
+    @property
+    def _chunks_path(self) -> Path:
+        return self.root / "chunks.jsonl"
+
+    @property
+    def _meta_path(self) -> Path:
+        return self.root / "meta.json"
+
+    @property
+    def _lock_path(self) -> Path:
+        return self.root / ".lock"
+
+    def _mtime(self):
+        try:
+            return self._chunks_path.stat().st_mtime_ns
+        except FileNotFoundError:
+            return None
+
+    def _load(self):
+        if not self._meta_path.exists():
+            return
+        self._loaded_mtime = self._mtime()
+        meta = json.loads(self._meta_path.read_text())
+        if meta.get("embedder") != self.embedder.name or meta.get("dim") != self.embedder.dim:
+            print(f"[INDEX] Embedder changed, ignoring existing index at {self.root}")
+            return
+        self._vectors = np.load(self._vectors_path, mmap_mode="r")
+        with open(self._chunks_path, encoding="utf-8") as f:
+            self._chunks = [json.loads(line) for line in f]
+        self._rows_by_doc = _rows_by_doc(self._chunks)
+
+    def _save(self, vectors: np.ndarray, chunks: List[Dict]):
+        self.root.mkdir(parents=True, exist_ok=True)
+        tmp_vectors = self.root / f"vectors.{os.getpid()}.tmp.npy"
+        tmp_chunks = self.root / f"chunks.{os.getpid()}.tmp.jsonl"
+        np.save(tmp_vectors, vectors.astype(np.float32, copy=False))
+        with open(tmp_chunks, "w", encoding="utf-8") as f:
+            for chunk in chunks:
+                f.write(json.dumps(chunk) + "\n")
+        os.replace(tmp_vectors, self._vectors_path)
+        os.replace(tmp_chunks, self._chunks_path)
+        self._meta_path.write_text(json.dumps({"embedder": self.embedder.name, "dim": self.embedder.dim}))
+        self._vectors = np.load(self._vectors_path, mmap_mode="r")
+        self._chunks = chunks
+        self._rows_by_doc = _rows_by_doc(chunks)
+        self._loaded_mtime = self._mtime()
+
+    def refresh(self):
+        """Reloads the index if another process has rewritten it."""
+        with self._lock:
+            if self._mtime() != self._loaded_mtime:
+                self._load()
+
+    def __len__(self):
+        return len(self._chunks)
+
+    def has_document(self, doc_id: str) -> bool:
+        # Another process (a job queue worker, another gunicorn worker) may have indexed it; one stat when unchanged
+        self.refresh()
+        return doc_id in self._rows_by_doc
+
+    def add_document(self, doc_id: str, text: Union[str, Iterable[str]], **metadata) -> int:
+        """
+        Chunks, embeds and stores a document, replacing any previous chunks for it. `text` may be a
+        string or an iterable of text blocks (e.g. a cache file read in blocks); chunks are embedded
+        in batches of EMBED_BATCH so the whole document text is never held at once.
+        """
+        blocks = [text] if isinstance(text, str) else text
+        chunks, batches, batch = [], [], []
+        for chunk in iter_chunks(blocks):
+            batch.append(chunk)
+            if len(batch) == EMBED_BATCH:
+                batches.append(self.embedder.embed(batch))
+                chunks += batch
+                batch = []
+        if batch:
+            batches.append(self.embedder.embed(batch))
+            chunks += batch
+        return self._replace(doc_id, chunks, batches, metadata)
+
+    def copy_document(self, source_index: "VectorIndex", source_doc_id: str, doc_id: str, **metadata) -> int:
+        """Adds the chunks and vectors `source_index` holds for identical content under a new doc_id, without re-embedding."""
+        source_index.refresh()
+        with source_index._lock:
+            rows = source_index._rows_by_doc.get(source_doc_id, [])
+            vectors = np.asarray(source_index._vectors[rows]) if rows else None
+            chunks = [source_index._chunks[r]["text"] for r in rows]
+        return self._replace(doc_id, chunks, [vectors] if rows else [], metadata)
+
+    def _replace(self, doc_id: str, chunks: List[str], batches: List[np.ndarray], metadata: Dict) -> int:
+        with self._lock, file_lock(self._lock_path):
+            self.refresh()
+            keep = [i for i, c in enumerate(self._chunks) if c["doc_id"] != doc_id]
+            all_vectors = np.asarray(self._vectors)[keep]
+            all_chunks = [self._chunks[i] for i in keep]
+            if chunks:
+                all_vectors = np.vstack([all_vectors, *batches])
+                all_chunks += [{"doc_id": doc_id, "text": c, **metadata} for c in chunks]
+            self._save(all_vectors, all_chunks)
+            if chunks:
+                self.lexical.add_document(doc_id, chunks, **metadata)
+            else:
+                self.lexical.remove_document(doc_id)
+        return len(chunks)
+
+    def remove_document(self, doc_id: str) -> None:
+        with self._lock, file_lock(self._lock_path):
+            self.refresh()
+            keep = [i for i, c in enumerate(self._chunks) if c["doc_id"] != doc_id]
+            if len(keep) != len(self._chunks):
+                self._save(np.asarray(self._vectors)[keep], [self._chunks[i] for i in keep])
+            self.lexical.remove_document(doc_id)
+
+    def search(self, query: str, k: int = TOP_K, **filters) -> List[Dict]:
+        """Returns the top-k chunks by cosine similarity, optionally filtered on metadata fields."""
+        return self.search_many([query], k, **filters)[0]
+
+    def search_many(self, queries: List[str], k: int = TOP_K, **filters) -> List[List[Dict]]:
+        """search() for several queries at once: one embedding batch and one matrix product for all of them."""
+        self.refresh()
+        with self._lock:
+            vectors, chunks = self._vectors, self._chunks
+        if not chunks or not queries:
+            return [[] for _ in queries]
+
+        candidates = _filter_rows(chunks, filters)
+        if candidates is not None and not len(candidates):
+            return [[] for _ in queries]
+
+        q = self.embedder.embed(list(queries))
+        scores = (vectors @ q.T) if candidates is None else (vectors[candidates] @ q.T)  # chunks x queries
+        k = min(k, len(scores))
+        top = np.argpartition(-scores, k - 1, axis=0)[:k]
+        results = []
+        for column in range(len(queries)):
+            rows = top[:, column]
+            rows = rows[np.argsort(-scores[rows, column])]
+            ids = rows if candidates is None else candidates[rows]
+            results.append([{**chunks[i], "score": float(scores[j, column])} for i, j in zip(ids, rows)])
+        return results
+
+    def _sync_lexical(self, chunks: List[Dict], rows_by_doc: Dict[str, List[int]]) -> None:
+        """Builds BM25 segments for documents indexed before the lexical index existed, and drops stale ones."""
+        indexed = self.lexical.documents()
+        for doc_id in rows_by_doc.keys() - indexed:
+            rows = rows_by_doc[doc_id]
+            metadata = {key: value for key, value in chunks[rows[0]].items() if key not in ("doc_id", "text")}
+            self.lexical.add_document(doc_id, [chunks[r]["text"] for r in rows], **metadata)
+        for doc_id in indexed - rows_by_doc.keys():
+            self.lexical.remove_document(doc_id)
+
+    def hybrid_search(self, query: str, k: int = TOP_K, **filters) -> List[Dict]:
+        """
+        Top-k chunks by a blend of cosine similarity and BM25, each scaled to its best candidate:
+        HYBRID_ALPHA * semantic + (1 - HYBRID_ALPHA) * lexical. Exact-term queries ("questions on
+        Agents", "fee structure") are carried by BM25, paraphrases by the vectors.
+        """
+        self.refresh()
+        with self._lock:
+            vectors, chunks, rows_by_doc = self._vectors, self._chunks, self._rows_by_doc
+        if not chunks:
+            return []
+        self._sync_lexical(chunks, rows_by_doc)
+
+        rows = _filter_rows(chunks, filters)
+        if rows is not None and not len(rows):
+            return []
+        rows = np.arange(len(chunks)) if rows is None else rows
+        pool = min(len(rows), k * HYBRID_CANDIDATES)
+
+        q = self.embedder.embed([query])[0]
+        cosine = np.asarray(vectors[rows] @ q)
+        top = np.argpartition(-cosine, pool - 1)[:pool]
+        semantic = {int(rows[j]): float(cosine[j]) for j in top}
+
+        lexical = {}
+        for hit in self.lexical.search(query, pool, **filters):
+            doc_rows = rows_by_doc.get(hit["doc_id"], [])
+            if hit["chunk"] < len(doc_rows):
+                lexical[doc_rows[hit["chunk"]]] = hit["score"]
+        for row in lexical.keys() - semantic.keys():
+            semantic[row] = float(vectors[row] @ q)
+
+        best_semantic = max(max(semantic.values()), 1e-9)
+        best_lexical = max(lexical.values(), default=0.0) or 1.0
+        scored = [
+            (HYBRID_ALPHA * max(0.0, cos) / best_semantic + (1 - HYBRID_ALPHA) * lexical.get(row, 0.0) / best_lexical, row)
+            for row, cos in semantic.items()
+        ]
+        scored.sort(reverse=True)
+        return [
+            {**chunks[row], "score": score, "cosine": semantic[row], "bm25": lexical.get(row, 0.0)}
+            for score, row in scored[:k]
+        ]
+
+def _rows_by_doc(chunks: List[Dict]) -> Dict[str, List[int]]:
+    """Row numbers of each document's chunks, in chunk order (chunk n of a document is rows[n])."""
+    rows: Dict[str, List[int]] = {}
+    for i, chunk in enumerate(chunks):
+        rows.setdefault(chunk["doc_id"], []).append(i)
+    return rows
+
+
+def _filter_rows(chunks: List[Dict], filters: Dict):
+    """Rows whose metadata matches every filter, or None when there are no filters."""
+    if not filters:
+        return None
+    return np.array([
+        i for i, c in enumerate(chunks) if all(c.get(key) == value for key, value in filters.items())
+    ], dtype=np.int64)
+
+
+# Each tenant (college user email) has its own index directory; only recently used ones stay open
+MAX_OPEN_INDEXES = int(os.getenv("MAX_OPEN_INDEXES", "32"))
+_indexes = LRUCache(MAX_OPEN_INDEXES)
+
+
+def tenant_key(tenant: str) -> str:
+    """Filesystem-safe, stable key for a tenant's email."""
+    return hashlib.sha1((tenant or "").lower().encode("utf-8")).hexdigest()
+
+
+def get_index(tenant: str) -> VectorIndex:
+    """Returns the tenant's index, opening it on first use."""
+    key = tenant_key(tenant)
+    return _indexes.get_or_create(key, lambda: VectorIndex(INDEX_DIR / key))
+
+
+def format_context(hits: List[Dict]) -> str:
+    """Renders retrieved chunks as a prompt context block."""
+    return "\n\n".join(f"[Source: {h.get('source', '')}]\n{h['text']}" for h in hits)
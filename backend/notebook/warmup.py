@@ -0,0 +1,58 @@
+import os
+import time
+import threading
+from database_connection import college_users_collection
+from notebook.vector_index import get_embedder, get_index, MAX_OPEN_INDEXES
+
+# -- Config --
+# Set to "0" to report ready before the Gemini/LangChain engine is built (the first chat then builds it)
+READY_REQUIRES_ENGINE = os.getenv("READY_REQUIRES_ENGINE", "1") == "1"
+
+_state = {"indexes": False, "engine": False, "tenants": 0, "preload_s": None, "engine_error": None}
+_lock = threading.Lock()
+
+
+def preload() -> None:
+    """
+    Opens the vector indexes of tenants with a chatbot key (up to MAX_OPEN_INDEXES) and the embedder.
+    Run before forking workers: the memory-mapped vectors are then shared pages across all of them.
+    """
+    started = time.monotonic()
+    tenants = [u["email"] for u in college_users_collection.find(
+        {"access_key": {"$type": "string"}}, {"email": 1}
+    ).limit(MAX_OPEN_INDEXES)]
+    get_embedder()
+    for tenant in tenants:
+        try:
+            get_index(tenant).refresh()
+        except Exception as e:
+            print(f"[WARMUP] Could not open index for {tenant}: {e}")
+    with _lock:
+        _state.update(indexes=True, tenants=len(tenants), preload_s=round(time.monotonic() - started, 3))
+    print(f"[WARMUP] Opened {len(tenants)} tenant index(es) in {_state['preload_s']}s")
+
+
+def warm_engine() -> threading.Thread:
+    """Builds the RAG engine in the background; not before forking, since Gemini's gRPC channels are not fork-safe."""
+    def build():
+        from notebook.college_ragv1 import get_engine
+        try:
+            get_engine()
+            with _lock:
+                _state["engine"] = True
+        except Exception as e:
+            print(f"[WARMUP] Engine failed to initialize: {e}")
+            with _lock:
+                _state["engine_error"] = str(e)
+
+    thread = threading.Thread(target=build, name="engine-warmup", daemon=True)
+    thread.start()
+    return thread
+
+
+def readiness() -> dict:
+    """Warm-state flags for the readiness probe; `ready` once the indexes (and the engine, if required) are loaded."""
+    with _lock:
+        state = dict(_state)
+    state["ready"] = state["indexes"] and (state["engine"] or not READY_REQUIRES_ENGINE)
+    return state
@@ -0,0 +1,92 @@
+import os
+import hashlib
+import datetime
+from urllib.parse import urlsplit
+from urllib.robotparser import RobotFileParser
+import requests
+from requests.adapters import HTTPAdapter
+from notebook.executors import parse_pool, timed
+from notebook.lru_cache import LRUCache
+
+# -- Config --
+CRAWL_TIMEOUT = int(os.getenv("CRAWL_TIMEOUT", "10"))
+CRAWL_POOL_SIZE = int(os.getenv("CRAWL_POOL_SIZE", "8"))
+CRAWL_USER_AGENT = os.getenv("CRAWL_USER_AGENT", "CollegeFAQBot/1.0")
+ROBOTS_TTL = float(os.getenv("ROBOTS_TTL", "3600"))  # seconds a site's robots.txt is trusted
+
+# One pooled session so repeated crawls reuse connections (keep-alive) per host
+_session = requests.Session()
+_session.mount("http://", HTTPAdapter(pool_connections=CRAWL_POOL_SIZE, pool_maxsize=CRAWL_POOL_SIZE))
+_session.mount("https://", HTTPAdapter(pool_connections=CRAWL_POOL_SIZE, pool_maxsize=CRAWL_POOL_SIZE))
+_session.headers["User-Agent"] = CRAWL_USER_AGENT
+
+_robots = LRUCache(1024, ttl=ROBOTS_TTL)  # scheme://host -> RobotFileParser
+
+
+class DisallowedByRobots(Exception):
+    pass
+
+
+def _fetch_robots(origin: str, timeout: int) -> RobotFileParser:
+    parser = RobotFileParser(f"{origin}/robots.txt")
+    try:
+        r = _session.get(parser.url, timeout=timeout)
+    except requests.RequestException:
+        # Unreachable site: the page fetch fails on its own
+        parser.allow_all = True
+        return parser
+    if r.status_code in (401, 403):
+        parser.disallow_all = True
+    elif r.status_code >= 400:
+        parser.allow_all = True
+    else:
+        parser.parse(r.text.splitlines())
+    return parser
+
+
+def allowed_by_robots(url: str, timeout: int = CRAWL_TIMEOUT) -> bool:
+    """Whether the site's robots.txt (fetched once per ROBOTS_TTL) lets our user agent fetch `url`."""
+    parts = urlsplit(url)
+    origin = f"{parts.scheme}://{parts.netloc}"
+    return _robots.get_or_create(origin, lambda: _fetch_robots(origin, timeout)).can_fetch(CRAWL_USER_AGENT, url)
+
+
+def extract_paragraph_text(html: str) -> str:
+    """Returns the text of every <p> tag in an HTML page, space-joined."""
+    from bs4 import BeautifulSoup  # only parse-pool workers need it
+    soup = BeautifulSoup(html, "html.parser")
+    return " ".join(p.get_text() for p in soup.find_all("p"))
+
+
+def crawl(doc: dict, timeout: int = CRAWL_TIMEOUT) -> dict:
+    """
+    Conditionally re-fetches a KM_URLs record using its stored ETag / Last-Modified validators.
+    Returns the fields to $set on the record; `text` and `content_sha256` are only included when
+    the page's paragraph text actually changed, so an unchanged page costs one 304 and no re-parse.
+    Raises DisallowedByRobots if the site's robots.txt excludes the page.
+    """
+    if not allowed_by_robots(doc["url"], timeout):
+        raise DisallowedByRobots(f"{doc['url']} is disallowed by robots.txt")
+    headers = {}
+    if doc.get("etag"):
+        headers["If-None-Match"] = doc["etag"]
+    if doc.get("last_modified"):
+        headers["If-Modified-Since"] = doc["last_modified"]
+
+    with timed("crawl_fetch"):
+        r = _session.get(doc["url"], headers=headers, timeout=timeout)
+    update = {"fetched_at": datetime.datetime.utcnow()}
+    if r.status_code == 304:
+        return update
+    r.raise_for_status()
+
+    update["etag"] = r.headers.get("ETag")
+    update["last_modified"] = r.headers.get("Last-Modified")
+    with timed("parse_html"):
+        # BeautifulSoup parsing is CPU-bound, so it runs in the shared parse pool
+        text = parse_pool().submit(extract_paragraph_text, r.text).result()
+    sha256 = hashlib.sha256(text.encode("utf-8")).hexdigest()
+    if sha256 != doc.get("content_sha256"):
+        update["text"] = text
+        update["content_sha256"] = sha256
+    return update
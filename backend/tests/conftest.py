@@ -0,0 +1,68 @@
+# Tests run from backend/ (`python -m pytest tests`) against the offline stand-ins in benchmarks/fakes.py:
+# in-memory Mongo (mongomock), fake Gemini and the hashing embedder. uploads/ and cache/ default to paths
+# relative to the working directory, so the session runs in a scratch directory.
+import os
+import sys
+import tempfile
+import datetime
+from pathlib import Path
+import pytest
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+os.chdir(tempfile.mkdtemp(prefix="faqbot-tests-"))
+os.environ.setdefault("PDF_EXTRACT_MODE", "inline")
+os.environ.setdefault("FAKE_LLM_LATENCY_MS", "0")
+os.environ.setdefault("FAKE_LLM_CHUNK_MS", "0")
+os.environ.setdefault("FAKE_UPLOAD_LATENCY_MS", "0")
+
+from benchmarks import fakes
+
+try:
+    fakes.install()
+except ImportError:
+    # Test modules skip themselves via pytest.importorskip when the backend's dependencies are missing
+    pass
+
+
+@pytest.fixture
+def db():
+    """The shared in-memory database, emptied after each test."""
+    from database_connection import db as database
+    yield database
+    for name in database.list_collection_names():
+        database.drop_collection(name)
+
+
+@pytest.fixture
+def app(db):
+    from app import app as flask_app
+    flask_app.config["TESTING"] = True
+    return flask_app
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+def auth_header(email: str, role: str = "collegeUser") -> dict:
+    import jwt
+    from app import app as flask_app
+    token = jwt.encode({
+        "email": email,
+        "role": role,
+        "exp": datetime.datetime.utcnow() + datetime.timedelta(hours=1)
+    }, flask_app.config["SECRET_KEY"], algorithm="HS256")
+    return {"Authorization": f"Bearer {token}"}
+
+
+@pytest.fixture
+def college_user(db):
+    """Creates college users on demand; returns (user document, Authorization header)."""
+    def create(email: str, **fields):
+        from database_connection import college_users_collection
+        user = {"name": email.split("@")[0], "email": email, "role": "collegeUser", **fields}
+        user["_id"] = college_users_collection.insert_one(dict(user)).inserted_id
+        return user, auth_header(email)
+    return create
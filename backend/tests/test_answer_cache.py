@@ -0,0 +1,37 @@
+import pytest
+
+pytest.importorskip("mongomock")
+pytest.importorskip("numpy")
+
+ANSWER = ("<p>The tuition fee is 1 lakh.</p>", "Website")
+
+
+def test_exact_and_similar_queries_hit(db):
+    from notebook import answer_cache
+    answer_cache.store("hit@college.edu", "What is the fee structure?", ANSWER)
+    assert answer_cache.lookup("hit@college.edu", "what is the FEE structure") == ANSWER
+    assert answer_cache.lookup("other@college.edu", "What is the fee structure?") is None
+
+
+def test_invalidation_in_another_process_reaches_this_one(db):
+    from database_connection import KM_answer_versions_collection
+    from notebook import answer_cache
+    answer_cache.store("shared@college.edu", "What is the fee structure?", ANSWER)
+
+    # Another worker handled an upload: it bumped the version in Mongo, not our in-memory cache
+    KM_answer_versions_collection.update_one({"_id": "shared@college.edu"}, {"$inc": {"version": 1}}, upsert=True)
+    assert answer_cache.lookup("shared@college.edu", "What is the fee structure?") == ANSWER
+    answer_cache._versions.clear()  # ANSWER_CACHE_VERSION_TTL has passed
+    assert answer_cache.lookup("shared@college.edu", "What is the fee structure?") is None
+
+    # Answers stored afterwards belong to the new version
+    answer_cache.store("shared@college.edu", "What is the fee structure?", ANSWER)
+    answer_cache._versions.clear()
+    assert answer_cache.lookup("shared@college.edu", "What is the fee structure?") == ANSWER
+
+
+def test_local_invalidation_is_immediate(db):
+    from notebook import answer_cache
+    answer_cache.store("local@college.edu", "Where is the campus?", ANSWER)
+    answer_cache.invalidate("local@college.edu")
+    assert answer_cache.lookup("local@college.edu", "Where is the campus?") is None
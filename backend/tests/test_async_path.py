@@ -0,0 +1,45 @@
+import asyncio
+import threading
+import pytest
+
+pytest.importorskip("mongomock")
+pytest.importorskip("numpy")
+
+
+def test_turn_bookkeeping_runs_off_the_event_loop(db, monkeypatch):
+    from notebook import college_ragv1
+    threads = []
+
+    def start_turn(query, tenant, session_id):
+        threads.append(threading.current_thread())
+        return None, ("<p>Precomputed.</p>", "FAQ")
+
+    def finish_turn(query, tenant, session, answer, cache=True):
+        threads.append(threading.current_thread())
+        return answer
+
+    monkeypatch.setattr(college_ragv1, "_start_turn", start_turn)
+    monkeypatch.setattr(college_ragv1, "_finish_turn", finish_turn)
+
+    async def ask():
+        loop_thread = threading.current_thread()
+        answer = await college_ragv1.agenerate_response_from_rag("What is the fee?", "async@college.edu")
+        events = [e async for e in college_ragv1.astream_response_from_rag("What is the fee?", "async@college.edu")]
+        return loop_thread, answer, events
+
+    loop_thread, answer, events = asyncio.run(ask())
+    assert answer == ("<p>Precomputed.</p>", "FAQ")
+    assert events == [("token", "<p>Precomputed.</p>"), ("done", "FAQ")]
+    assert len(threads) == 4 and loop_thread not in threads
+
+
+def test_async_auth_shares_the_principal_cache(db):
+    from database_connection import college_users_collection
+    from blueprints import principal_cache
+    college_users_collection.insert_one({"email": "key@college.edu", "access_key": "k-123"})
+
+    # Warmed by the sync path; the async lookup is then served without a database round-trip
+    assert principal_cache.get_user_by_access_key("k-123")["email"] == "key@college.edu"
+    assert asyncio.run(principal_cache.aget_user_by_access_key("k-123"))["email"] == "key@college.edu"
+    assert asyncio.run(principal_cache.aget_user_by_access_key(None)) is None
+    principal_cache.invalidate_user("key@college.edu")
@@ -0,0 +1,88 @@
+import datetime
+import pytest
+
+pytest.importorskip("mongomock")
+
+from benchmarks import fakes
+
+SYSTEM = "You answer questions about the college."
+FILES = [{"file_data": {"file_uri": "https://fake.invalid/files/fees", "mime_type": "text/plain"}}]
+
+
+class CountingCachedContent(fakes.FakeCachedContent):
+    _store = {}
+    created, updated = [], []
+    reject = False
+
+    @classmethod
+    def create(cls, model, ttl, **kwargs):
+        if cls.reject:
+            raise ValueError("Cached content is too small")
+        cache = super().create(model, ttl, **kwargs)
+        cls.created.append(cache.name)
+        return cache
+
+    def update(self, ttl, **kwargs):
+        super().update(ttl, **kwargs)
+        self.updated.append(self.name)
+
+
+@pytest.fixture
+def context_cache(db, monkeypatch):
+    from notebook import context_cache as module
+    from notebook.lru_cache import LRUCache
+    genai = fakes._fake_genai()
+    genai.caching.CachedContent = CountingCachedContent
+    monkeypatch.setattr(CountingCachedContent, "_store", {})
+    monkeypatch.setattr(CountingCachedContent, "created", [])
+    monkeypatch.setattr(CountingCachedContent, "updated", [])
+    monkeypatch.setattr(CountingCachedContent, "reject", False)
+    monkeypatch.setattr(module, "_handles", LRUCache(16))
+    monkeypatch.setattr(module, "_refused", LRUCache(16, ttl=60))
+    monkeypatch.setattr(module, "_client", None)
+    module.set_client(genai)
+    return module
+
+
+def test_cache_is_created_once_and_reused(context_cache):
+    from database_connection import KM_context_caches_collection
+    model = context_cache.cached_model("cc@college.edu", "pdf", SYSTEM, FILES)
+    assert model.cached_content.name == CountingCachedContent.created[0]
+    assert context_cache.cached_model("cc@college.edu", "pdf", SYSTEM, FILES).cached_content is model.cached_content
+    assert len(CountingCachedContent.created) == 1
+
+    record = KM_context_caches_collection.find_one({"email": "cc@college.edu", "kind": "pdf"})
+    assert record["name"] == model.cached_content.name
+
+    # A changed corpus gets a new cache and the old one is deleted
+    other = [{"file_data": {"file_uri": "https://fake.invalid/files/hostel", "mime_type": "text/plain"}}]
+    assert context_cache.cached_model("cc@college.edu", "pdf", SYSTEM, other).cached_content.name != record["name"]
+    assert record["name"] not in CountingCachedContent._store
+
+
+def test_cache_near_expiry_gets_its_ttl_extended(context_cache):
+    from database_connection import KM_context_caches_collection
+    name = context_cache.cached_model("ttl@college.edu", "website", SYSTEM, FILES).cached_content.name
+
+    soon = datetime.datetime.utcnow() + context_cache.CONTEXT_CACHE_REFRESH_MARGIN / 2
+    KM_context_caches_collection.update_one({"email": "ttl@college.edu"}, {"$set": {"expires_at": soon}})
+    context_cache._handles.get(("ttl@college.edu", "website"))[0]["expires_at"] = soon
+
+    assert context_cache.cached_model("ttl@college.edu", "website", SYSTEM, FILES).cached_content.name == name
+    assert CountingCachedContent.updated == [name]
+    assert len(CountingCachedContent.created) == 1
+    assert KM_context_caches_collection.find_one({"email": "ttl@college.edu"})["expires_at"] > soon
+
+
+def test_rejected_cache_falls_back_to_inline_context(context_cache):
+    CountingCachedContent.reject = True
+    assert context_cache.cached_model("small@college.edu", "pdf", SYSTEM, FILES) is None
+    # Not retried until CONTEXT_CACHE_RETRY_AFTER has passed
+    CountingCachedContent.reject = False
+    assert context_cache.cached_model("small@college.edu", "pdf", SYSTEM, FILES) is None
+    assert CountingCachedContent.created == []
+
+
+def test_no_files_means_no_cache(context_cache):
+    assert context_cache.cached_model("empty@college.edu", "pdf", SYSTEM, []) is None
+    assert CountingCachedContent.created == []
@@ -0,0 +1,44 @@
+import pytest
+
+pytest.importorskip("mongomock")
+pytest.importorskip("numpy")
+pytest.importorskip("flask")
+
+
+def run_pending_jobs():
+    from notebook import job_queue
+    while (job := job_queue._claim("test")) is not None:
+        job_queue.run_job(job)
+
+
+def test_batch_is_answered_in_the_job_queue(client, college_user):
+    from notebook import faq_table
+    _, headers = college_user("faq@college.edu")
+    questions = ["What is the fee structure?", "Where is the campus?"]
+
+    response = client.post("/api/chatbot/batch", headers=headers, json={"questions": questions})
+    assert response.status_code == 202
+    job_id = response.get_json()["job_id"]
+    assert client.get(f"/api/chatbot/batch/{job_id}", headers=headers).get_json()["status"] == "pending"
+
+    run_pending_jobs()
+    status = client.get(f"/api/chatbot/batch/{job_id}", headers=headers).get_json()
+    assert status["status"] == "done"
+    assert [a["question"] for a in status["answers"]] == questions
+    assert status["stored"] == 2
+    assert faq_table.lookup("faq@college.edu", "what is the FEE structure") is not None
+
+    # Other tenants can't read the batch
+    _, other = college_user("other@college.edu")
+    assert client.get(f"/api/chatbot/batch/{job_id}", headers=other).status_code == 404
+
+
+def test_source_changes_clear_the_faq_table(client, college_user):
+    from notebook import faq_table
+    _, headers = college_user("stale@college.edu")
+    faq_table.store("stale@college.edu", [("What is the fee structure?", "1 lakh", "Website")])
+    assert faq_table.lookup("stale@college.edu", "What is the fee structure?") is not None
+
+    assert client.post("/api/add-url", headers=headers, json={"url": "http://127.0.0.1:9/"}).status_code == 200
+    assert faq_table.lookup("stale@college.edu", "What is the fee structure?") is None
+    assert faq_table.list_faqs("stale@college.edu") == []
@@ -0,0 +1,60 @@
+import datetime
+import pytest
+
+pytest.importorskip("mongomock")
+
+from benchmarks import fakes
+
+
+@pytest.fixture
+def uploads(monkeypatch):
+    """Routes the registry to the fake genai and records every upload."""
+    from notebook import gemini_registry
+    calls = []
+    genai = fakes._fake_genai()
+
+    def upload_file(source, mime_type="text/plain", **kwargs):
+        calls.append(source)
+        return fakes._upload_file(source, mime_type)
+    genai.upload_file = upload_file
+    monkeypatch.setattr(gemini_registry, "_client", None)
+    gemini_registry.set_client(genai)
+    return calls
+
+
+def stored(collection, text):
+    return collection.find_one({"_id": collection.insert_one({"url": "https://college.example", "text": text}).inserted_id})
+
+
+def test_unchanged_content_reuses_the_upload(db, uploads):
+    from database_connection import KM_URLs_collection
+    from notebook.gemini_registry import ensure_uploaded
+    doc = stored(KM_URLs_collection, "Fees are 1 lakh.")
+
+    part = ensure_uploaded(KM_URLs_collection, doc, doc["text"])
+    assert len(uploads) == 1
+    doc = KM_URLs_collection.find_one({"_id": doc["_id"]})
+    assert ensure_uploaded(KM_URLs_collection, doc, doc["text"]) == part
+    # A stale in-memory record still finds the handle another thread stored
+    assert ensure_uploaded(KM_URLs_collection, {"_id": doc["_id"]}, doc["text"]) == part
+    assert len(uploads) == 1
+
+    ensure_uploaded(KM_URLs_collection, doc, "Fees are 2 lakh.")
+    assert len(uploads) == 2
+
+
+def test_expiring_upload_is_refreshed(db, uploads):
+    from database_connection import KM_URLs_collection
+    from notebook.gemini_registry import ensure_uploaded, EXPIRY_MARGIN
+    doc = stored(KM_URLs_collection, "Hostel fees are 60,000.")
+    first = ensure_uploaded(KM_URLs_collection, doc, doc["text"])
+
+    # Within the expiry margin the file may vanish mid-request, so it is uploaded again
+    soon = datetime.datetime.utcnow() + EXPIRY_MARGIN / 2
+    KM_URLs_collection.update_one({"_id": doc["_id"]}, {"$set": {"gemini_expires_at": soon}})
+    doc = KM_URLs_collection.find_one({"_id": doc["_id"]})
+    second = ensure_uploaded(KM_URLs_collection, doc, doc["text"])
+
+    assert len(uploads) == 2
+    assert second != first
+    assert KM_URLs_collection.find_one({"_id": doc["_id"]})["gemini_expires_at"] > soon
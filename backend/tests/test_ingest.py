@@ -0,0 +1,36 @@
+import io
+import random
+import types
+import pytest
+
+pytest.importorskip("mongomock")
+pytest.importorskip("numpy")
+pytest.importorskip("fitz")
+
+
+def test_pdf_is_indexed_without_a_gemini_upload(client, college_user, tmp_path, monkeypatch):
+    from benchmarks.corpus import make_question_paper
+    from database_connection import KM_documents_collection
+    from notebook import gemini_registry, job_queue
+    from notebook.vector_index import get_index
+
+    def unavailable(*args, **kwargs):
+        raise ConnectionError("Gemini is unreachable")
+    monkeypatch.setattr(gemini_registry, "_client", types.SimpleNamespace(upload_file=unavailable))
+
+    path = tmp_path / "dbms.pdf"
+    make_question_paper(path, "Database Management Systems", random.Random(3), pages=1)
+    _, headers = college_user("ingest@college.edu")
+    response = client.post(
+        "/api/upload-pdf", headers=headers, content_type="multipart/form-data",
+        data={"file": (io.BytesIO(path.read_bytes()), "dbms.pdf")}
+    )
+    assert response.status_code == 200
+
+    while (job := job_queue._claim("test")) is not None:
+        job_queue.run_job(job)
+
+    doc = KM_documents_collection.find_one({"email": "ingest@college.edu"})
+    assert doc["status"] == job_queue.INDEXED
+    assert "gemini_file_uri" not in doc
+    assert get_index("ingest@college.edu").has_document(str(doc["_id"]))
@@ -0,0 +1,34 @@
+import pytest
+
+pytest.importorskip("mongomock")
+pytest.importorskip("flask")
+
+from conftest import auth_header
+
+
+def test_metrics_need_a_super_admin_or_the_scrape_token(client, db, monkeypatch):
+    from database_connection import super_admins_collection
+    from blueprints import middlewares
+    super_admins_collection.insert_one({"email": "ops@platform.com"})
+
+    for path in ("/metrics", "/stage-timings"):
+        assert client.get(path).status_code == 401
+        assert client.get(path, headers=auth_header("user@college.edu")).status_code == 403
+        assert client.get(path, headers=auth_header("ops@platform.com", role="superAdmin")).status_code == 200
+
+    monkeypatch.setattr(middlewares, "METRICS_TOKEN", "scrape-secret")
+    assert client.get("/metrics", headers={"Authorization": "Bearer scrape-secret"}).status_code == 200
+    assert client.get("/metrics", headers={"Authorization": "Bearer wrong"}).status_code == 401
+
+
+def test_tenants_are_labelled_by_hash_and_capped(monkeypatch):
+    from notebook import metrics
+    monkeypatch.setattr(metrics, "_tenants", set())
+    monkeypatch.setattr(metrics, "METRICS_MAX_TENANTS", 2)
+    for tenant in ("a@college.edu", "b@college.edu", "c@college.edu"):
+        metrics.cache_result("faq", True, tenant)
+
+    text = metrics.render()
+    assert "@college.edu" not in text
+    assert f'tenant="{metrics.tenant_id("a@college.edu")}"' in text
+    assert 'tenant="other"' in text
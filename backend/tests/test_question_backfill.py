@@ -0,0 +1,83 @@
+import pytest
+
+pytest.importorskip("mongomock")
+pytest.importorskip("numpy")
+
+PAPER = """Data Structures - Semester Examination
+1. a) Explain stacks with an example. (10 marks)
+b) Define a queue. (5 marks)
+2. Explain binary search trees. (10 marks)
+3. Write a note on hashing. (6 marks)
+"""
+
+
+def run_pending_jobs():
+    from notebook import job_queue
+    job = job_queue._claim("test")
+    while job is not None:
+        job_queue.run_job(job)
+        job = job_queue._claim("test")
+
+
+def legacy_pdf(db, tenant):
+    from database_connection import KM_documents_collection
+    # Indexed before question records existed: no status, no questions_version
+    return KM_documents_collection.insert_one({"email": tenant, "filename": "ds.pdf", "path": "ds.pdf"}).inserted_id
+
+
+def test_backfill_runs_in_the_job_queue_not_on_the_chat_path(db, monkeypatch):
+    from database_connection import KM_documents_collection
+    from notebook import question_index, text_cache, job_queue
+    monkeypatch.setattr(text_cache, "get_pdf_text", lambda path, sha256=None: PAPER)
+    doc_id = legacy_pdf(db, "backfill@college.edu")
+
+    assert question_index.records("backfill@college.edu") == []
+    assert job_queue.enqueue_question_backfill() == 1
+    assert job_queue.enqueue_question_backfill() == 0
+    assert "questions_version" not in KM_documents_collection.find_one({"_id": doc_id})
+
+    run_pending_jobs()
+    doc = KM_documents_collection.find_one({"_id": doc_id})
+    assert doc["questions_version"] == question_index.QUESTION_PARSER_VERSION
+    assert "status" not in doc
+    assert len(question_index.records("backfill@college.edu")) == doc["questions"] > 0
+
+
+def test_failed_parse_leaves_the_document_stale(db, monkeypatch):
+    from database_connection import KM_documents_collection, KM_jobs_collection
+    from notebook import question_index, text_cache, job_queue
+
+    def unreadable(path, sha256=None):
+        raise OSError("file is gone")
+    monkeypatch.setattr(text_cache, "get_pdf_text", unreadable)
+    monkeypatch.setattr(job_queue, "INGEST_MAX_ATTEMPTS", 1)
+    doc_id = legacy_pdf(db, "broken@college.edu")
+
+    job_queue.enqueue_question_backfill()
+    run_pending_jobs()
+    doc = KM_documents_collection.find_one({"_id": doc_id})
+    assert "questions_version" not in doc and "status" not in doc
+    assert "questions_queued" not in doc
+    assert KM_jobs_collection.find_one({"doc_id": doc_id})["status"] == job_queue.FAILED
+
+    # The next backfill (e.g. after a restart) tries again, and succeeds once the text is readable
+    monkeypatch.setattr(text_cache, "get_pdf_text", lambda path, sha256=None: PAPER)
+    assert job_queue.enqueue_question_backfill() == 1
+    run_pending_jobs()
+    assert KM_documents_collection.find_one({"_id": doc_id})["questions_version"] == question_index.QUESTION_PARSER_VERSION
+
+
+def test_job_whose_worker_died_on_its_last_attempt_is_failed_not_rerun(db, monkeypatch):
+    import datetime
+    from database_connection import KM_documents_collection, KM_jobs_collection
+    from notebook import job_queue
+    doc_id = legacy_pdf(db, "crash@college.edu")
+    job_queue.enqueue_question_backfill()
+    started = datetime.datetime.utcnow() - datetime.timedelta(seconds=job_queue.INGEST_LEASE_SECONDS + 1)
+    KM_jobs_collection.update_one({"doc_id": doc_id}, {"$set": {
+        "status": "running", "started_at": started, "attempts": job_queue.INGEST_MAX_ATTEMPTS,
+    }})
+
+    assert job_queue._claim("test") is None
+    assert KM_jobs_collection.find_one({"doc_id": doc_id})["status"] == job_queue.FAILED
+    assert "questions_queued" not in KM_documents_collection.find_one({"_id": doc_id})
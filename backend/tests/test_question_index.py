@@ -0,0 +1,37 @@
+import pytest
+
+pytest.importorskip("numpy")
+pytest.importorskip("pymongo")
+
+from notebook.question_index import parse_query
+
+SUBJECTS = {"Object Oriented Programming", "Artificial Intelligence"}
+
+
+@pytest.mark.parametrize("query, expected", [
+    ("Give me the question distribution by marks for oops pdf", ("distribution", None, "Object Oriented Programming")),
+    ("Provide important 12-mark questions from previous semester exams", ("list", 12, None)),
+    ("Give me sample questions from the Artificial Intelligence subject", ("list", None, "Artificial Intelligence")),
+    ("List the repeated questions from object oriented programming", ("repeated", None, "Object Oriented Programming")),
+    ("Which questions were asked most times in OOP papers?", ("repeated", None, "Object Oriented Programming")),
+    ("Give me 12m questions from OOPS", ("list", 12, "Object Oriented Programming")),
+])
+def test_record_queries(query, expected):
+    parsed = parse_query(query, SUBJECTS)
+    assert (parsed["intent"], parsed["marks"], parsed["subject"]) == expected
+
+
+@pytest.mark.parametrize("query", [
+    # Prose about the papers: records can only be listed or counted
+    "Summarize the key topics covered in the last three OOP question papers.",
+    # A subject no paper is about must not fall back to every subject's questions
+    "Provide 10-mark questions from the Data Structures exam paper",
+    # Marks that aren't a question's marks
+    "What are the passing marks? Is it 35 marks?",
+    "Is the passing mark for the OOP question paper 35 marks?",
+    # Topics are for retrieval
+    'Give me all questions related to "Agents" across the pdfs',
+    "What is the fee structure?",
+])
+def test_queries_left_to_retrieval(query):
+    assert parse_query(query, SUBJECTS) is None
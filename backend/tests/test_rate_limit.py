@@ -0,0 +1,25 @@
+import sqlite3
+
+from blueprints import rate_limit
+
+
+def test_locked_store_asks_the_client_to_retry(tmp_path):
+    buckets = rate_limit.SqliteBuckets(1.0, 2.0, str(tmp_path / "buckets.sqlite3"))
+    holder = sqlite3.connect(str(tmp_path / "buckets.sqlite3"), isolation_level=None)
+    holder.execute("BEGIN IMMEDIATE")
+    try:
+        assert buckets.take("key") == rate_limit.CHAT_BUSY_RETRY_AFTER
+    finally:
+        holder.execute("ROLLBACK")
+    assert buckets.take("key") == 0.0
+
+
+def test_idle_keys_are_pruned(tmp_path, monkeypatch):
+    monkeypatch.setattr(rate_limit, "RATE_LIMIT_PRUNE_EVERY", 1)
+    path = str(tmp_path / "buckets.sqlite3")
+    buckets = rate_limit.SqliteBuckets(1.0, 2.0, path)
+    assert buckets.take("idle") == 0.0
+    conn = sqlite3.connect(path, isolation_level=None)
+    conn.execute("UPDATE buckets SET updated = updated - 60 WHERE key = 'idle'")
+    assert buckets.take("active") == 0.0
+    assert [key for key, in conn.execute("SELECT key FROM buckets")] == ["active"]
@@ -0,0 +1,51 @@
+import pytest
+
+pytest.importorskip("mongomock")
+pytest.importorskip("numpy")
+
+from notebook.session_memory import Session
+
+
+def started(question: str) -> Session:
+    session = Session()
+    assert not session.is_follow_up(question)
+    session.last_hits = [{"doc_id": "1", "text": "..."}]
+    return session
+
+
+def test_distinct_questions_about_the_same_college_are_new_topics():
+    session = started("What is the admission process at Sahyadri College?")
+    assert not session.is_follow_up("What is the fee structure of Sahyadri College of Engineering?")
+    assert not session.is_follow_up("What are the hostel facilities at Sahyadri College?")
+
+
+def test_questions_continuing_the_topic_are_follow_ups():
+    session = started("What is the admission process at Sahyadri College?")
+    assert session.is_follow_up("Sahyadri College admission process documents")
+    assert session.is_follow_up("What is its last date?")
+
+
+def test_a_new_topic_becomes_the_reference():
+    session = started("Give important questions on inheritance in OOPS")
+    assert not session.is_follow_up("What is the highest placement package?")
+    assert session.is_follow_up("Highest placement package this year")
+    assert not session.is_follow_up("Important questions on inheritance")
+
+
+def test_first_question_is_never_a_follow_up():
+    assert not Session().is_follow_up("Explain the second one")
+
+
+def test_sessions_are_shared_between_workers(db):
+    from notebook.session_memory import get_session
+    first = get_session("shared@college.edu", "abc")
+    assert not first.is_follow_up("What is the admission process at Sahyadri College?")
+    first.last_hits = [{"doc_id": "1", "text": "Apply online.", "source": "Website", "kind": "url", "score": 0.9}]
+    first.add_turn("What is the admission process at Sahyadri College?", "<p>Apply online.</p>")
+
+    # The next request may land on another worker, which only has what was stored
+    second = get_session("shared@college.edu", "abc")
+    assert second.turns == [("What is the admission process at Sahyadri College?", "<p>Apply online.</p>")]
+    assert second.last_hits == [{"doc_id": "1", "text": "Apply online.", "source": "Website", "kind": "url"}]
+    assert second.is_follow_up("What is its last date?")
+    assert get_session("other@college.edu", "abc").turns == []
@@ -0,0 +1,25 @@
+import pytest
+
+from notebook import text_cache
+
+
+def test_failed_extraction_leaves_no_temp_file(tmp_path, monkeypatch):
+    def broken_pages(pdf_path):
+        yield "first page"
+        raise RuntimeError("corrupt xref table")
+
+    monkeypatch.setattr(text_cache, "TEXT_CACHE_DIR", tmp_path)
+    monkeypatch.setattr(text_cache, "extractor_version", lambda: "test")
+    monkeypatch.setattr(text_cache, "iter_pdf_pages", broken_pages)
+    with pytest.raises(RuntimeError):
+        text_cache._write_pdf_text("broken.pdf", "abc", 1024)
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_extraction_stops_at_the_text_limit(tmp_path, monkeypatch):
+    monkeypatch.setattr(text_cache, "TEXT_CACHE_DIR", tmp_path)
+    monkeypatch.setattr(text_cache, "extractor_version", lambda: "test")
+    monkeypatch.setattr(text_cache, "iter_pdf_pages", lambda pdf_path: iter(["é" * 10, "more"]))
+    assert text_cache._write_pdf_text("big.pdf", "abc", 5) == 4
+    assert [p.name for p in tmp_path.iterdir()] == ["abc-test.txt"]
+    assert (tmp_path / "abc-test.txt").read_text(encoding="utf-8") == "éé"
@@ -0,0 +1,74 @@
+import io
+import random
+import pytest
+
+pytest.importorskip("mongomock")
+pytest.importorskip("numpy")
+pytest.importorskip("fitz")
+
+
+def make_pdf(tmp_path) -> bytes:
+    from benchmarks.corpus import make_question_paper
+    path = tmp_path / "syllabus.pdf"
+    make_question_paper(path, "Object Oriented Programming", random.Random(1), pages=2)
+    return path.read_bytes()
+
+
+def upload(client, headers, data: bytes):
+    return client.post(
+        "/api/upload-pdf", headers=headers, content_type="multipart/form-data",
+        data={"file": (io.BytesIO(data), "syllabus.pdf"), "description": "OOP question paper"}
+    )
+
+
+def test_same_pdf_for_two_tenants_is_processed_once(client, college_user, tmp_path):
+    from database_connection import KM_documents_collection, KM_blobs_collection, KM_jobs_collection
+    from notebook import ingest
+    from notebook.vector_index import get_index
+
+    data = make_pdf(tmp_path)
+    _, first_headers = college_user("first@college.edu")
+    _, second_headers = college_user("second@college.edu")
+
+    assert upload(client, first_headers, data).status_code == 200
+    first = KM_documents_collection.find_one({"email": "first@college.edu"})
+    ingest.ingest_pdf(first["_id"])
+
+    response = upload(client, second_headers, data)
+    assert response.status_code == 200
+    assert response.get_json().get("deduplicated") is True
+
+    second = KM_documents_collection.find_one({"email": "second@college.edu"})
+    assert second["status"] == "indexed"
+    assert second["path"] == first["path"]
+    assert KM_blobs_collection.find_one({"_id": first["sha256"]})["refs"] == 2
+    # Only the first upload went through the job queue
+    assert KM_jobs_collection.count_documents({"doc_id": second["_id"]}) == 0
+
+    for tenant, doc in (("first@college.edu", first), ("second@college.edu", second)):
+        hits = get_index(tenant).search("Explain inheritance in Object Oriented Programming")
+        assert hits and all(h["doc_id"] == str(doc["_id"]) for h in hits)
+        assert hits[0]["source"] == "syllabus.pdf"
+
+
+def test_deleting_one_copy_keeps_the_blob(client, college_user, tmp_path):
+    import os
+    from database_connection import KM_documents_collection, KM_blobs_collection
+    from notebook import ingest
+
+    data = make_pdf(tmp_path)
+    _, first_headers = college_user("keep-a@college.edu")
+    _, second_headers = college_user("keep-b@college.edu")
+    upload(client, first_headers, data)
+    first = KM_documents_collection.find_one({"email": "keep-a@college.edu"})
+    ingest.ingest_pdf(first["_id"])
+    upload(client, second_headers, data)
+
+    assert client.delete(f"/api/delete-pdf/{first['_id']}", headers=first_headers).status_code == 200
+    assert os.path.exists(first["path"])
+    assert KM_blobs_collection.find_one({"_id": first["sha256"]})["refs"] == 1
+
+    second = KM_documents_collection.find_one({"email": "keep-b@college.edu"})
+    assert client.delete(f"/api/delete-pdf/{second['_id']}", headers=second_headers).status_code == 200
+    assert not os.path.exists(first["path"])
+    assert KM_blobs_collection.find_one({"_id": first["sha256"]}) is None
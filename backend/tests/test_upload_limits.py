@@ -0,0 +1,19 @@
+import io
+import pytest
+
+pytest.importorskip("mongomock")
+pytest.importorskip("flask")
+
+
+def test_oversized_request_is_rejected_before_parsing(app, client, college_user, monkeypatch):
+    from blueprints.file_manager import MAX_UPLOAD_BYTES
+    assert app.config["MAX_CONTENT_LENGTH"] > MAX_UPLOAD_BYTES
+
+    monkeypatch.setitem(app.config, "MAX_CONTENT_LENGTH", 64 * 1024)
+    _, headers = college_user("big@college.edu")
+    response = client.post(
+        "/api/upload-pdf", headers=headers, content_type="multipart/form-data",
+        data={"file": (io.BytesIO(b"%PDF-1.4" + b"0" * 128 * 1024), "big.pdf")}
+    )
+    assert response.status_code == 413
+    assert "upload limit" in response.get_json()["error"]
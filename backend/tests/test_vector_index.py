@@ -0,0 +1,42 @@
+import multiprocessing
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from notebook.vector_index import VectorIndex, HashingEmbedder
+
+
+def add(root, doc_id):
+    VectorIndex(root, HashingEmbedder()).add_document(doc_id, f"Syllabus of course {doc_id}: data structures and algorithms.")
+
+
+def test_add_search_and_remove(tmp_path):
+    index = VectorIndex(tmp_path, HashingEmbedder())
+    index.add_document("fees", "The tuition fee is one lakh per year.", kind="website")
+    index.add_document("oop", "Explain inheritance and polymorphism with examples.", kind="pdf")
+    assert index.has_document("fees") and not index.has_document("missing")
+    assert index.search("inheritance polymorphism")[0]["doc_id"] == "oop"
+    assert [h["doc_id"] for h in index.search("fee", kind="website")] == ["fees"]
+
+    index.remove_document("fees")
+    assert not index.has_document("fees")
+    # Another process's view picks the change up from disk
+    assert not VectorIndex(tmp_path, HashingEmbedder()).has_document("fees")
+
+
+def test_concurrent_writers_in_separate_processes_keep_every_document(tmp_path):
+    context = multiprocessing.get_context("spawn")
+    doc_ids = [f"doc-{i}" for i in range(8)]
+    with context.Pool(4) as pool:
+        pool.starmap(add, [(tmp_path, doc_id) for doc_id in doc_ids])
+
+    index = VectorIndex(tmp_path, HashingEmbedder())
+    assert all(index.has_document(doc_id) for doc_id in doc_ids)
+    assert len(index) == len(doc_ids)
+    assert {hit["doc_id"] for hit in index.lexical.search("data structures", k=len(doc_ids))} == set(doc_ids)
+
+
+def test_documents_added_by_another_instance_are_seen_without_an_explicit_refresh(tmp_path):
+    reader = VectorIndex(tmp_path, HashingEmbedder())
+    VectorIndex(tmp_path, HashingEmbedder()).add_document("late", "Added by the ingest worker in another process.")
+    assert reader.has_document("late")
@@ -0,0 +1,63 @@
+import os
+import time
+import pytest
+
+pytest.importorskip("requests")
+pytest.importorskip("bs4")
+
+from benchmarks.corpus import serve_site
+from notebook.web_crawler import crawl, DisallowedByRobots
+
+
+@pytest.fixture(scope="module")
+def site(tmp_path_factory):
+    root = tmp_path_factory.mktemp("site")
+    (root / "robots.txt").write_text("User-agent: *\nDisallow: /private/\n")
+    (root / "fees.html").write_text("<html><body><h1>Fees</h1><p>Tuition is 1 lakh.</p></body></html>")
+    (root / "about").mkdir()
+    (root / "about" / "index.html").write_text("<html><body><p>Founded in 2007.</p></body></html>")
+    (root / "private").mkdir()
+    (root / "private" / "staff.html").write_text("<html><body><p>Staff only.</p></body></html>")
+    server, base_url = serve_site(root)
+    yield root, base_url
+    server.shutdown()
+
+
+def test_unchanged_page_costs_one_304(site):
+    root, base_url = site
+    doc = {"url": f"{base_url}/fees.html"}
+    update = crawl(doc)
+    assert update["text"] == "Tuition is 1 lakh."
+    assert update["last_modified"]
+
+    doc.update(update)
+    assert set(crawl(doc)) == {"fetched_at"}
+
+    # A changed page is fetched and re-hashed
+    (root / "fees.html").write_text("<html><body><p>Tuition is 2 lakh.</p></body></html>")
+    later = time.time() + 5
+    os.utime(root / "fees.html", (later, later))
+    update = crawl(doc)
+    assert update["text"] == "Tuition is 2 lakh."
+    assert update["content_sha256"] != doc["content_sha256"]
+
+
+def test_same_text_after_a_full_fetch_is_not_a_change(site):
+    _, base_url = site
+    doc = {"url": f"{base_url}/fees.html"}
+    doc.update(crawl(doc))
+    # Validators lost (e.g. the server stopped sending them): a 200 with the same text keeps the snapshot
+    doc.pop("last_modified")
+    assert "text" not in crawl(doc)
+
+
+def test_redirects_are_followed(site):
+    _, base_url = site
+    # The directory URL without a trailing slash answers with a 301 to /about/
+    assert crawl({"url": f"{base_url}/about"})["text"] == "Founded in 2007."
+
+
+def test_robots_txt_is_respected(site):
+    _, base_url = site
+    with pytest.raises(DisallowedByRobots):
+        crawl({"url": f"{base_url}/private/staff.html"})
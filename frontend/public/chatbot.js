@@ -8,6 +8,13 @@ function showChatbot() {
   }
  
   const API_BASE = "http://localhost:5000/api/chatbot";
+
+  // One conversation per browser tab, so follow-up questions keep their context
+  let sessionId = sessionStorage.getItem('chatbot_session_id');
+  if (!sessionId) {
+    sessionId = crypto.randomUUID();
+    sessionStorage.setItem('chatbot_session_id', sessionId);
+  }
  
   const chatButton = document.createElement('button');
   chatButton.textContent = '💬';
@@ -126,6 +133,17 @@ function showChatbot() {
     wrapper.appendChild(msgContainer);
     chatMessages.appendChild(wrapper);
     chatMessages.scrollTop = chatMessages.scrollHeight;
+    return msg;
+  }
+ 
+  function parseSseFrame(frame) {
+    let event = 'message';
+    let data = '';
+    frame.split('\n').forEach(line => {
+      if (line.startsWith('event:')) event = line.slice(6).trim();
+      else if (line.startsWith('data:')) data += line.slice(5).trim();
+    });
+    return { event, data: data ? JSON.parse(data) : {} };
   }
  
   async function sendUserMessage() {
@@ -186,29 +204,59 @@ function showChatbot() {
     chatMessages.scrollTop = chatMessages.scrollHeight;
  
     try {
-      const response = await fetch(`${API_BASE}/message`, {
+      const response = await fetch(`${API_BASE}/message/stream`, {
         method: 'POST',
         headers: {
           'Content-Type': 'application/json',
           'Authorization': initKey
         },
-        body: JSON.stringify({ message: text })
+        body: JSON.stringify({ message: text, session_id: sessionId })
       });
  
-      loaderWrapper.remove();
- 
       if (!response.ok) {
+        loaderWrapper.remove();
+        const retryAfter = response.headers.get('Retry-After');
         const errorText = response.status === 401
           ? "Chatbot is disabled or access denied. 😢"
-          : "Something went wrong. 😢";
+          : response.status === 429
+            ? `Too many questions right now. Please try again in ${retryAfter || 'a few'} seconds. ⏳`
+            : "Something went wrong. 😢";
         addMessage(errorText, 'bot');
         return;
       }
  
-      const data = await response.json();
-      let reply = data?.reply?.replaceAll('```html','') || '';
-      //reply+="<br> <strong>("+data.source+")</strong>";
-      addMessage(reply, 'bot');
+      // Render the answer as HTML fragments arrive over Server-Sent Events
+      const reader = response.body.getReader();
+      const decoder = new TextDecoder();
+      let buffer = '';
+      let reply = '';
+      let msg = null;
+      while (true) {
+        const { value, done } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+        const frames = buffer.split('\n\n');
+        buffer = frames.pop();
+        for (const frame of frames) {
+          const { event, data } = parseSseFrame(frame);
+          if (event === 'token') {
+            reply += data.html || '';
+            if (!msg) {
+              loaderWrapper.remove();
+              msg = addMessage('', 'bot');
+            }
+            msg.innerHTML = parseEmojis(reply.replaceAll('```html', ''));
+            chatMessages.scrollTop = chatMessages.scrollHeight;
+          } else if (event === 'error') {
+            loaderWrapper.remove();
+            msg = addMessage(data.reply || "Something went wrong. 😢", 'bot');
+          }
+        }
+      }
+      loaderWrapper.remove();
+      if (!msg && !reply) {
+        addMessage("Sorry, I couldn’t find an answer for that. Try asking something else!", 'bot');
+      }
     } catch (err) {
       loaderWrapper.remove();
       console.error(err);
@@ -2,6 +2,12 @@ import { Component, OnInit } from '@angular/core';
 import { HttpService } from '../../service/http.service';
 import { CommonModule } from '@angular/common';
 import { FormsModule } from '@angular/forms'; // ✅ Add this
+// One page of a keyset-paginated listing; `next` is the cursor for the following page
+interface Page<T> {
+  items: T[];
+  next: string | null;
+}
+ 
 @Component({
   selector: 'app-knowledge-management',
   standalone: true,
@@ -16,6 +22,8 @@ export class KnowledgeManagementComponent implements OnInit {
   urlDescription: string = '';
   files: any[] = [];
   urls: any[] = [];
+  filesNext: string | null = null;
+  urlsNext: string | null = null;
   activeTab: string = 'pdf';
  
   constructor(private httpService: HttpService) {}
@@ -61,13 +69,21 @@ export class KnowledgeManagementComponent implements OnInit {
     });
   }
  
-  fetchFiles(): void {
-    this.httpService.get<any[]>('api/pdfs').subscribe({
-      next: (res) => this.files = res,
+  // Without a cursor the list restarts from the first page; with one, the next page is appended
+  fetchFiles(after: string | null = null): void {
+    this.httpService.get<Page<any>>(this.pageUrl('api/pdfs', after)).subscribe({
+      next: (res) => {
+        this.files = after ? [...this.files, ...res.items] : res.items;
+        this.filesNext = res.next;
+      },
       error: (err) => console.error('Failed to load files:', err)
     });
   }
  
+  private pageUrl(url: string, after: string | null): string {
+    return after ? `${url}?after=${encodeURIComponent(after)}` : url;
+  }
+ 
   deletePdf(id: string): void {
     this.httpService.delete(`api/delete-pdf/${id}`).subscribe({
       next: () => {
@@ -104,9 +120,12 @@ export class KnowledgeManagementComponent implements OnInit {
     });
   }
  
-  fetchUrls(): void {
-    this.httpService.get<any[]>('api/urls').subscribe({
-      next: (res) => this.urls = res,
+  fetchUrls(after: string | null = null): void {
+    this.httpService.get<Page<any>>(this.pageUrl('api/urls', after)).subscribe({
+      next: (res) => {
+        this.urls = after ? [...this.urls, ...res.items] : res.items;
+        this.urlsNext = res.next;
+      },
       error: (err) => console.error('Failed to load URLs:', err)
     });
   }
@@ -7,6 +7,12 @@ import $ from 'jquery';
 import 'datatables.net';
 import * as bootstrap from 'bootstrap';
  
+// One page of a keyset-paginated listing; `next` is the cursor for the following page
+interface Page<T> {
+  items: T[];
+  next: string | null;
+}
+ 
 @Component({
   selector: 'app-users',
   standalone: true,
@@ -16,6 +22,8 @@ import * as bootstrap from 'bootstrap';
 })
 export class UsersComponent implements OnInit, AfterViewInit {
   dataSource: any[] = [];
+  nextCursor: string | null = null;
+  loadingMore = false;
   newUser = { name: '', email: '', password: '' };
   selectedUser: any = null;
   editUserData: any = { _id: '', name: '', email: '', password: '' };
@@ -39,15 +47,30 @@ export class UsersComponent implements OnInit, AfterViewInit {
   }
  
   loadUsers(): void {
-    // Destroy existing DataTable if present
-    const table = $('#usersTable');
-    if ($.fn.DataTable.isDataTable(table)) {
-      table.DataTable().clear().destroy();
+    this.fetchPage(null);
+  }
+ 
+  // Appends the next page of users; the server pages by cursor, so each page costs the same
+  loadMoreUsers(): void {
+    if (this.nextCursor && !this.loadingMore) {
+      this.fetchPage(this.nextCursor);
     }
+  }
+ 
+  private fetchPage(after: string | null): void {
+    const url = after ? `api/college-users?after=${encodeURIComponent(after)}` : 'api/college-users';
+    this.loadingMore = true;
+    this.httpService.get<Page<any>>(url).subscribe({
+      next: (page) => {
+        // Destroy existing DataTable if present
+        const table = $('#usersTable');
+        if ($.fn.DataTable.isDataTable(table)) {
+          table.DataTable().clear().destroy();
+        }
  
-    this.httpService.get<any[]>('api/college-users').subscribe({
-      next: (users) => {
-        this.dataSource = users;
+        this.dataSource = after ? [...this.dataSource, ...page.items] : page.items;
+        this.nextCursor = page.next;
+        this.loadingMore = false;
         this.shouldInitializeTable = false;
  
         setTimeout(() => {
@@ -62,6 +85,7 @@ export class UsersComponent implements OnInit, AfterViewInit {
         }, 0);
       },
       error: (error) => {
+        this.loadingMore = false;
         console.error('Error loading users:', error);
         alert('Failed to load users.');
       }